@@ -5,306 +5,704 @@ LITV_TWTV_AutoUpdate_Optimized.py
 --------------------------------------------
 Windows + PyCharm 版本 (優化版)
 自動抓取 LITV (ofiii) 串流，智能等待，自動合併並推送 GitHub。
+
+用法 (import 本模組沒有副作用；瀏覽器相關模組與 ChromeDriver 檢查在第一次抓取時才載入)：
+    python LITV_TWTV_AutoUpdate.py [--coordinator | --worker]   常駐服務 (預設，同 run)
+    python LITV_TWTV_AutoUpdate.py capture [頻道 ...]             抓取到期 (或指定) 的頻道一次，不合併
+    python LITV_TWTV_AutoUpdate.py merge [--no-probe]            以 m3u-files 現有結果合併 TWTV.m3u
+    python LITV_TWTV_AutoUpdate.py publish                       git 發布輸出檔案
+    python LITV_TWTV_AutoUpdate.py probe                         檢測 TWTV.m3u 線路並寫出報告
+    python LITV_TWTV_AutoUpdate.py history [--window 24h]        各頻道成功率與 p50 / p95 抓取耗時
 """
 
 import os
+import argparse
 import time
 import glob
-import subprocess
-import requests
-import chromedriver_autoinstaller
+import socket
+import sqlite3
+import threading
 from datetime import datetime
-from apscheduler.schedulers.background import BackgroundScheduler
-
-# Selenium 相關模組
-from seleniumwire import webdriver  # 需安裝 selenium-wire
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from urllib.parse import urlparse, quote
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from browser_pool import BrowserPool
+from browser_supervisor import SUPERVISOR
+from fast_resolver import TierStats, resolve_tiered
+from m3u8_watch import M3U8Collector
+from hls_ranker import rank_streams, rank_and_verify
+from stream_probe import probe_playlist, optimize_playlist
+from capture_cache import CaptureCache
+from m3u_model import M3UPlaylist
+from upstream_fetcher import UpstreamFetcher
+from publisher import Publisher
+from atomic_io import SnapshotBackups, atomic_open
+from adaptive_scheduler import AdaptiveScheduler, TICK_SECONDS
+from channel_registry import Channel, load_channels
+from job_queue import JobQueue, RemoteQueue, start_queue_server
+from run_history import RunHistory, WINDOWS
+from run_coordinator import RunCoordinator, SingleFlight, FileLock
+from site_plugins import plugin_for
+import playlist_server
+import metrics
 
 # ====== 配置設定 ======
-CHANNEL_GROUPS = {
-    "台灣頻道": {
-        "龍華電影": "https://www.ofiii.com/channel/watch/litv-longturn03",
-        "龍華偶像": "https://www.ofiii.com/channel/watch/litv-longturn12",
-        "龙华洋片": "https://www.ofiii.com/channel/watch/litv-longturn02",
-        "龙华日韩": "https://www.ofiii.com/channel/watch/litv-longturn11",
-        "龙华卡通": "https://www.ofiii.com/channel/watch/litv-longturn01",
-        "龍華戲劇": "https://www.ofiii.com/channel/watch/litv-longturn18",
-        "龍華經典": "https://www.ofiii.com/channel/watch/litv-longturn21"
-    }
-}
+CHANNELS_PATH = "channels.json"  # 頻道清單 (channel_registry.py)，每輪重新讀取，修改後不需重啟
+CHANNEL_SHARD = None  # 設為 "0/2"、"1/2"... 時只處理部分頻道 (多台主機分工請用協調者 / 工作者模式，由協調者統一合併與發布)
 
 GITHUB_TWTV_RAW_URL = "https://raw.githubusercontent.com/15682116618/ML-MO-GOT-IPTV/main/TWTV.m3u"
 LOCAL_TWTV_PATH = "TWTV.m3u"
 OUTPUT_DIR = "m3u-files"
 BACKUP_DIR = "backups"
+BACKUP_RETENTION = 5  # TWTV.m3u 保留的快照數量 (以硬連結建立、內容相同不重複保存)
 GIT_BRANCH = "main"  # 請確認你的 GitHub 分支名稱
+PUSH_DEBOUNCE_SECONDS = 0  # 兩次 push 的最短間隔 (秒)，>0 時多輪更新合併成一次推送
+MAX_WORKERS = 3  # 同時抓取的瀏覽器數量 (依主機 CPU / 記憶體調整)
+HOST_MIN_INTERVAL = 2.0  # 同一網站兩次開始抓取之間的最小間隔 (秒)，避免被封鎖
+METRICS_ENABLED = True  # 啟動本機 /metrics 端點 (Prometheus 格式)，分段計時另寫入 logs/metrics.jsonl
+PROBE_ENABLED = True  # 合併後檢測所有線路 (stream_probe.py)，失效的降級並依延遲排序
+MERGE_INTERVAL_MINUTES = 15  # 沒有頻道到期時，至少每隔此分鐘數仍重新合併一次 (取得遠端 TWTV 的更新)
+CAPTURE_BACKEND = "seleniumwire"  # seleniumwire: 常駐瀏覽器 + MITM 代理 / cdp: asyncio 直連 DevTools (cdp_capture.py，需 websockets)
+PLAYLIST_SERVER_ENABLED = False  # 啟動本機播放清單伺服器 (playlist_server.py)，播放器可直接連線取得最新清單
+ON_DEMAND = False  # 隨選模式：發布的清單指向本機 /ch/<頻道>，播放器要求時才抓取 (會一併啟動播放清單伺服器)
+PUBLIC_BASE_URL = None  # 播放器連線本機伺服器的位址，例如 "http://192.168.1.10:8088"；None 則以本機區網 IP 自動組成
+RUN_MODE = "standalone"  # standalone: 單機抓取 / coordinator: 只派工、合併與發布 / worker: 只抓取 (可用 --coordinator / --worker 覆寫)
+JOB_WAIT_SECONDS = 300  # 協調者每輪等待工作者回報的最長時間，逾時的頻道沿用上次結果
+JOB_QUEUE_PATH = os.path.join("cache", "jobs.sqlite3")  # 協調者本機磁碟上的佇列檔 (同一台主機的工作者直接開啟)
+COORDINATOR_URL = None  # 其他主機上的工作者設為協調者的佇列端點，例如 "http://192.168.1.10:8089"
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+class HostRateLimiter:
+    """依主機節流：同一網站的抓取至少間隔 min_interval 秒，不同網站互不影響"""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url):
+        host = urlparse(url).hostname or ""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+RATE_LIMITER = HostRateLimiter(HOST_MIN_INTERVAL)
+BROWSER_POOL = BrowserPool(MAX_WORKERS)  # 常駐瀏覽器，跨頻道與排程重複使用
+TIER_STATS = TierStats()  # 各頻道使用的解析層級與耗時 (logs/resolver_stats.json)
+CAPTURE_CACHE = CaptureCache()  # 各頻道線路與到期時間 (cache/capture_cache.json)
+UPSTREAM = UpstreamFetcher(GITHUB_TWTV_RAW_URL)  # 遠端 TWTV 條件式下載 (cache/)
+PUBLISHER = Publisher(branch=GIT_BRANCH, debounce=PUSH_DEBOUNCE_SECONDS)
+BACKUPS = SnapshotBackups(BACKUP_DIR, BACKUP_RETENTION)
+SCHEDULER = AdaptiveScheduler()  # 各頻道的下次更新時間 (cache/schedule_state.json)
+HISTORY = RunHistory()  # 抓取歷史與滾動統計 (cache/history.sqlite3，第一次寫入時建立)
+CDP_ENGINE = None  # CAPTURE_BACKEND = "cdp" 時於第一次抓取建立
+_cdp_lock = threading.Lock()
+PLAYLIST_STORE = playlist_server.PlaylistStore()  # 記憶體內的播放清單索引，每次合併後替換
+IN_FLIGHT = SingleFlight()  # 同一頻道同時被要求抓取時只抓一次
+JOB_QUEUE = None  # 協調者 / 工作者模式才建立 (job_queue.py，JOB_QUEUE_PATH 或 COORDINATOR_URL)
+_last_merge = 0.0
+
+
+def write_channel_file(group_name, channel_name, candidates):
+    """寫入 m3u-files/<group>/<channel>.m3u"""
+    if RUN_MODE == "worker":
+        return  # 工作者的結果只經由佇列回報，線路檔由協調者寫入
+    group_dir = os.path.join(OUTPUT_DIR, group_name)
+    os.makedirs(group_dir, exist_ok=True)
+    output_file = os.path.join(group_dir, f"{channel_name}.m3u")
+
+    with atomic_open(output_file) as f:
+        f.write("#EXTM3U\n")
+        for line in channel_lines(group_name, channel_name, candidates):
+            f.write(line + "\n")
+        f.write(f"# Updated: {datetime.now():%Y-%m-%d %H:%M:%S}\n")
+
+    print(f"    💾 已儲存 {len(candidates)} 條線路 -> {channel_name}.m3u")
+
+
+def fetch_stream_cdp(group_name, channel_name, url, plugin):
+    """CDP 後端：不經代理，多個分頁共用一個無頭 Chrome"""
+    global CDP_ENGINE
+    from cdp_capture import CDPCaptureEngine, click_script
+    with _cdp_lock:
+        if CDP_ENGINE is None:
+            CDP_ENGINE = CDPCaptureEngine()
+
+    print(f"[{channel_name}] 🧭 以 CDP 抓取中...")
+    try:
+        with metrics.span("cdp_capture"):
+            candidates = CDP_ENGINE.capture(url, match=plugin.manifest_filter, timeout=45,
+                                            click_js=click_script(plugin.consent_texts, plugin.play_selectors))
+    except Exception as e:
+        print(f"    ❌ 發生錯誤: {e}")
+        return []
+    if not candidates:
+        print(f"    ❌ 逾時：未偵測到有效 m3u8")
+        return []
+
+    print(f"    ✅ 捕捉到串流！")
+    with metrics.span("collect_candidates"):
+        candidates = rank_streams(candidates)
+    write_channel_file(group_name, channel_name, candidates)
+    return candidates
+
+
+def fetch_stream(group_name, channel_name, url, plugin=None):
+    """使用 SeleniumWire 抓取 .m3u8，成功回傳線路列表 (主線路在前)，失敗回傳空列表
+
+    瀏覽器由 BROWSER_POOL 常駐管理，每次抓取只開新分頁，不再重新啟動 Chrome。
+    同意條款、播放按鈕與 m3u8 過濾由網站外掛 (site_plugins.py) 提供，未指定時依網址判斷。
+    CAPTURE_BACKEND = "cdp" 時改走 fetch_stream_cdp。
+    """
+    plugin = plugin or plugin_for(url=url)
+    if CAPTURE_BACKEND == "cdp":
+        return fetch_stream_cdp(group_name, channel_name, url, plugin)
+
+    print(f"[{channel_name}] 🚀 借用常駐瀏覽器抓取中...")
+
+    with BROWSER_POOL.session() as session:
+        collector = M3U8Collector(match=plugin.manifest_filter)
+        driver = None
+        try:
+            load_start = time.monotonic()
+            driver = session.open(url, before_load=collector.attach)
+
+            # 自動化點擊流程 (同意條款每個瀏覽器、每個網站只需一次)
+            if plugin.name not in session.consented:
+                with metrics.span("consent"):
+                    plugin.consent(driver)
+                session.consented.add(plugin.name)
+
+            # 嘗試尋找並點擊播放 (各網站的選擇器由外掛提供)
+            play_start = time.perf_counter()
+            plugin.play(driver)
+            metrics.record("play_click", time.perf_counter() - play_start)
+
+            # 事件驅動等待 m3u8：回應一到就被推送，master 與畫質列表齊全即結束
+            print(f"    ⏳ 等待串流封包...")
+            if collector.wait(45):  # 最多等待 45 秒
+                print(f"    ✅ 捕捉到串流！")
+                metrics.record("first_m3u8", collector.first_match_at - load_start)
+                # 讀取 master playlist，依實際頻寬 / 解析度排序 (可連線的最高畫質在前)
+                with metrics.span("collect_candidates"):
+                    candidates = rank_streams(collector.candidates())
+
+                write_channel_file(group_name, channel_name, candidates)
+                return candidates
+            else:
+                print(f"    ❌ 逾時：未偵測到有效 m3u8")
+                metrics.record("first_m3u8", time.monotonic() - load_start, ok=False)
+                return []
 
-# ====== 初始化環境 ======
-print("🔧 正在檢查 ChromeDriver...")
-chromedriver_autoinstaller.install()
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-os.makedirs(BACKUP_DIR, exist_ok=True)
+        except Exception as e:
+            print(f"    ❌ 發生錯誤: {e}")
+            session.broken = True  # 異常後的瀏覽器狀態不可信，歸還時回收
+            return []
+        finally:
+            if driver is not None:
+                collector.detach(driver)
 
 
-def click_if_exists(driver, text, timeout=3):
-    """嘗試點擊按鈕，若不存在則忽略"""
-    try:
-        xpath = f"//*[contains(text(), '{text}')]"
-        btn = WebDriverWait(driver, timeout).until(EC.element_to_be_clickable((By.XPATH, xpath)))
-        btn.click()
-        print(f"    🖱️ 點擊：{text}")
-        time.sleep(1)
-        return True
-    except TimeoutException:
-        return False
-    except Exception as e:
-        print(f"    ⚠️ 點擊 {text} 異常: {e}")
-        return False
+def published_files():
+    """需要發布的輸出檔案：合併後的 TWTV.m3u 與各頻道 m3u"""
+    return [LOCAL_TWTV_PATH] + sorted(glob.glob(os.path.join(OUTPUT_DIR, "**", "*.m3u"), recursive=True))
 
 
-def fetch_stream(group_name, channel_name, url):
-    """使用 SeleniumWire 抓取 .m3u8"""
-    print(f"[{channel_name}] 🚀 啟動瀏覽器抓取中...")
+def git_operations():
+    """執行 Git 推送流程 (只提交內容實際變更的檔案，push 依 PUSH_DEBOUNCE_SECONDS 合併)"""
+    print("\n📡 正在執行 Git 同步...")
+    PUBLISHER.publish(published_files())
+    print("✅ Git 操作完成")
 
-    options = webdriver.ChromeOptions()
-    # 隱匿模式與效能設定
-    options.add_argument("--headless=new")  # 新版無頭模式
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--mute-audio")
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument("--ignore-certificate-errors")  # 忽略 SSL 錯誤 (重要)
-    options.add_argument("--allow-running-insecure-content")
 
-    # 偽裝 User-Agent
-    options.add_argument(
-        "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+def download_upstream():
+    """取得遠端 TWTV (條件式下載，304 / 失敗時使用本地副本)，回傳 M3UPlaylist，皆不可用時回傳 None"""
+    playlist = UPSTREAM.playlist()
+    if playlist is None:
+        print("    ❌ 無法取得遠端 TWTV.m3u (也沒有本地副本)")
+    return playlist
 
-    driver = None
+
+def channel_lines(group_name, channel_name, candidates):
+    """將線路列表轉為 #EXTINF / URL 行 (與 m3u-files 內的格式一致)"""
+    lines = []
+    for i, u in enumerate(candidates):
+        tag = "主線路" if i == 0 else f"備用線路{i}"
+        lines.append(f"#EXTINF:-1 group-title=\"{group_name}\" tvg-name=\"{channel_name}\",{channel_name} [{tag}]")
+        lines.append(u)
+    return lines
+
+
+def public_base_url():
+    """隨選模式發布的網址前綴 (播放器必須連得到，因此不能用 0.0.0.0 / 127.0.0.1)"""
+    if PUBLIC_BASE_URL:
+        return PUBLIC_BASE_URL.rstrip("/")
     try:
-        # Selenium Wire 特定設定：排除圖片與不必要的請求以加速
-        seleniumwire_options = {
-            'exclude_hosts': ['google-analytics.com', 'facebook.com', 'doubleclick.net'],
-            'disable_capture': False  # 確保開啟抓包
-        }
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(("10.255.255.255", 1))  # UDP connect 不送出封包，只用來取得對外網卡的 IP
+            host = s.getsockname()[0]
+    except OSError:
+        host = "127.0.0.1"
+    return f"http://{host}:{playlist_server.PLAYLIST_PORT}"
+
+
+def merge_m3u(base_playlist=None, fresh_results=None):
+    """合併邏輯
+
+    base_playlist: 已取得的遠端 TWTV (M3UPlaylist，None 則於此下載)
+    fresh_results: {(group, channel): candidates}，本輪各 worker 完成後即時收集的結果；
+                   未在其中 (或抓取失敗) 的頻道沿用 m3u-files 內上次的檔案
+    ON_DEMAND 時頻道清單內的頻道一律發布為本機 /ch/<頻道> 網址，不使用 m3u-files
+    """
+    print("\n📑 開始合併列表...")
 
-        driver = webdriver.Chrome(options=options, seleniumwire_options=seleniumwire_options)
-        driver.set_page_load_timeout(30)
+    # 1. 下載最新 TWTV
+    if base_playlist is None:
+        base_playlist = download_upstream()
+    if base_playlist is None:
+        return
+    fresh_results = fresh_results or {}
 
-        driver.get(url)
+    # 2. 快照備份 (硬連結，內容未變不重複保存；舊檔保持原位直到新檔原子取代)
+    # 3. 超過 BACKUP_RETENTION 的舊快照由 snapshot() 一併清理
+    BACKUPS.snapshot(LOCAL_TWTV_PATH)
 
-        # 自動化點擊流程
-        click_if_exists(driver, "我同意", timeout=5)
-        click_if_exists(driver, "確定", timeout=3)
+    # 4. 讀取新抓取的頻道 (本輪結果直接使用記憶體內容，不再回讀檔案)
+    new_entries = {}  # group -> [M3UEntry]
+    for (group, name), candidates in fresh_results.items():
+        entries = M3UPlaylist.parse(channel_lines(group, name, candidates)).entries()
+        new_entries.setdefault(group, []).extend(entries)
 
-        # 嘗試尋找並點擊播放 (處理不同的 HTML 結構)
-        try:
-            play_btn = WebDriverWait(driver, 10).until(
-                EC.any_of(
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, "button.vjs-big-play-button")),
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, ".play-icon")),
-                    EC.element_to_be_clickable((By.XPATH, "//button[contains(@class, 'play')]"))
-                )
-            )
-            play_btn.click()
-            print(f"    ▶️ 觸發播放按鈕")
-        except TimeoutException:
-            print(f"    ℹ️ 無需點擊播放或自動播放中")
-
-        # 智能等待 m3u8
-        target_m3u8 = None
-        start_time = time.time()
-        print(f"    ⏳ 等待串流封包...")
-
-        while time.time() - start_time < 45:  # 最多等待 45 秒
-            # 檢查 requests
-            for request in list(driver.requests):  # 轉 list 避免迭代時變動
-                if request.response and ".m3u8" in request.url:
-                    # 過濾掉廣告或非主要串流 (簡單過濾)
-                    if "litv" in request.url or "hls" in request.url or "manifest" in request.url:
-                        target_m3u8 = request.url
-                        print(f"    ✅ 捕捉到串流！")
-                        break
-            if target_m3u8:
-                break
-            time.sleep(1)
-
-        if target_m3u8:
-            # 再多等 3 秒收集其他可能的畫質選項
-            time.sleep(3)
-            candidates = [
-                r.url for r in driver.requests
-                if r.response and ".m3u8" in r.url
-            ]
-            # 去重並排序 (高畫質優先邏輯：通常 URL 越長或包含特定關鍵字越精細，這裡簡單用 set 去重)
-            candidates = sorted(list(set(candidates)), key=len, reverse=True)
-
-            # 寫入檔案
-            group_dir = os.path.join(OUTPUT_DIR, group_name)
-            os.makedirs(group_dir, exist_ok=True)
-            output_file = os.path.join(group_dir, f"{channel_name}.m3u")
-
-            with open(output_file, "w", encoding="utf-8") as f:
-                f.write("#EXTM3U\n")
-                for i, u in enumerate(candidates):
-                    # 簡單標記
-                    tag = "主線路" if i == 0 else f"備用線路{i}"
-                    f.write(
-                        f"#EXTINF:-1 group-title=\"{group_name}\" tvg-name=\"{channel_name}\",{channel_name} [{tag}]\n{u}\n")
-                f.write(f"# Updated: {datetime.now():%Y-%m-%d %H:%M:%S}\n")
-
-            print(f"    💾 已儲存 {len(candidates)} 條線路 -> {channel_name}.m3u")
-            return True
+    fresh_files = {
+        os.path.normpath(os.path.join(OUTPUT_DIR, g, f"{n}.m3u"))
+        for (g, n), c in fresh_results.items() if c
+    }
+    # 只讀 <group>/<channel>.m3u；根目錄的 all.m3u 與 auto_commit.py 的單頻道檔是另一套輸出，讀入會重複
+    m3u_files = glob.glob(os.path.join(OUTPUT_DIR, "*", "*.m3u"))
+
+    stale_files = [f for f in m3u_files if os.path.normpath(f) not in fresh_files]
+
+    on_demand_prefix = None
+    if ON_DEMAND:
+        on_demand_prefix = f"{public_base_url()}/ch/"
+        registry = load_channels(CHANNELS_PATH, shard=CHANNEL_SHARD)
+        for channel in registry:
+            lines = channel_lines(channel.group, channel.name, [on_demand_prefix + quote(channel.name)])
+            new_entries.setdefault(channel.group, []).extend(M3UPlaylist.parse(lines).entries())
+        registry_files = {os.path.normpath(os.path.join(OUTPUT_DIR, c.group, f"{c.name}.m3u")) for c in registry}
+        stale_files = [f for f in stale_files if os.path.normpath(f) not in registry_files]
+
+    for f in stale_files:
+        for entry in M3UPlaylist.from_file(f).entries():
+            if entry.group:  # 沒有 group-title 的舊檔無法判斷要取代哪個群組，略過
+                new_entries.setdefault(entry.group, []).append(entry)
+
+    # 5. 以群組為單位取代 (upsert)：舊的同群組線路與歷次自動更新區塊一併移除，重複執行結果相同
+    playlist = base_playlist
+    for group, entries in new_entries.items():
+        playlist.upsert_group(group, entries, banner=f"{group} (自動更新)",
+                              notes=[f"更新時間: {datetime.now():%Y-%m-%d %H:%M:%S}"])
+
+    # 6. 檢測線路：失效的降級 (自動更新群組已依畫質排序，不依延遲重排)；自家頻道主線路失效則排入下一輪提早更新
+    if PROBE_ENABLED:
+        with metrics.span("probe"):
+            results = probe_playlist(playlist, skip_prefixes=[on_demand_prefix] if on_demand_prefix else ())
+            optimize_playlist(playlist, results, keep_order_groups=new_entries.keys())
+        mark_dead_channels(results)
+
+    # 7. 逐行串流寫入，並替換播放清單伺服器的記憶體索引
+    playlist.write(LOCAL_TWTV_PATH)
+    PLAYLIST_STORE.update(playlist)
+
+    print(f"✅ 合併完成！新增了 {len(fresh_files) + len(stale_files)} 個頻道資訊")
+
+
+def mark_dead_channels(results):
+    """依檢測結果，將主線路已失效的頻道作廢快取並排入下一輪重抓；仍可用的累積網址壽命"""
+    for channel in load_channels(CHANNELS_PATH, shard=CHANNEL_SHARD):
+        entry = CAPTURE_CACHE.get(channel.group, channel.name)
+        if not entry or not entry["urls"]:
+            continue
+        primary = entry["urls"][0]
+        result = results.get(primary)
+        if not result:
+            continue
+        if result["alive"]:
+            SCHEDULER.mark_alive(channel.group, channel.name, primary)
+            continue
+        if entry.get("dead"):
+            continue  # 已作廢、尚未重抓 (例如退避中)，不重複處理
+        print(f"    🩹 [{channel.name}] 主線路失效，下一輪重新抓取")
+        CAPTURE_CACHE.invalidate(channel.group, channel.name)
+        SCHEDULER.mark_dead(channel.group, channel.name, primary)
+
+
+def schedule_next(channel, candidates):
+    """依本次結果決定該頻道的下次更新時間：成功依網址壽命，失敗指數退避"""
+    if candidates:
+        entry = CAPTURE_CACHE.get(channel.group, channel.name) or {}
+        expires_at = entry.get("expires_at") if entry.get("expiry_source") == "url" else None
+        delay = SCHEDULER.record_success(channel.group, channel.name, candidates[0], expires_at,
+                                         min_interval=channel.min_interval, max_interval=channel.max_interval)
+    else:
+        delay = SCHEDULER.record_failure(channel.group, channel.name)
+    print(f"    🗓️ [{channel.name}] {delay / 60:.0f} 分鐘後再更新")
+
+
+def resolve_channel(channel):
+    """依頻道設定的抓取策略與網站外掛解析，回傳 (tier, candidates)
+
+    tiered 策略從外掛宣告的最便宜層級開始：http 優先、失敗才開瀏覽器；外掛宣告 browser 時直接開瀏覽器
+    """
+    group, name, url = channel.group, channel.name, channel.url
+    plugin = plugin_for(channel.site, url)
+    if channel.strategy == "browser" or (channel.strategy == "tiered" and plugin.cheapest_tier == "browser"):
+        return "selenium", fetch_stream(group, name, url, plugin)
+    if channel.strategy == "http":
+        t0 = time.perf_counter()
+        with metrics.span("collect_candidates"):
+            candidates, verified = rank_and_verify(plugin.resolve_http(url))
+        if not verified:
+            candidates = []  # 頁面內的 m3u8 都讀不到 #EXTM3U，視為失敗
+        TIER_STATS.record(name, "http", time.perf_counter() - t0, verified)
+        return "http", candidates
+    return resolve_tiered(name, url, lambda: fetch_stream(group, name, url, plugin), TIER_STATS,
+                          http_resolve=plugin.resolve_http)
+
+
+def capture_task(channel, recapture=False):
+    """單一 worker 任務；同一頻道已在抓取中時等待並共用其結果，不重複開瀏覽器"""
+    return IN_FLIGHT.do(channel.key, lambda: _capture_channel(channel, recapture))
+
+
+def _capture_channel(channel, recapture=False):
+    """快取仍有效則直接沿用；否則依主機節流後按頻道策略解析 (預設 HTTP 優先，失敗才啟用瀏覽器)
+
+    recapture=True (工作者領到的工作) 一律重新抓取：是否需要更新已由協調者依它的快取與排程判斷
+    """
+    group, name = channel.group, channel.name
+    with metrics.context(channel=name, group=group), metrics.span("capture"):
+        if not recapture and not CAPTURE_CACHE.needs_refresh(group, name):
+            print(f"[{name}] 💤 快取仍有效，略過抓取")
+            return CAPTURE_CACHE.get(group, name)["urls"]
+
+        RATE_LIMITER.wait(channel.url)
+        t0 = time.perf_counter()
+        tier, candidates = resolve_channel(channel)
+        if tier == "http" and candidates:  # 已於解析時確認可讀並依畫質排序
+            write_channel_file(group, name, candidates)
+
+        if candidates:
+            CAPTURE_CACHE.put(group, name, candidates, tier)
         else:
-            print(f"    ❌ 逾時：未偵測到有效 m3u8")
-            return False
+            CAPTURE_CACHE.mark_failed(group, name)
+        record_history(channel, tier, candidates, time.perf_counter() - t0)
+        return candidates
 
-    except Exception as e:
-        print(f"    ❌ 發生錯誤: {e}")
-        return False
-    finally:
-        if driver:
-            driver.quit()
 
+def record_history(channel, tier, candidates, elapsed):
+    """寫入抓取歷史；網址壽命只在網址本身帶有到期時間時記錄"""
+    lifetime = None
+    entry = CAPTURE_CACHE.get(channel.group, channel.name) or {}
+    if candidates and entry.get("expiry_source") == "url":
+        lifetime = max(0.0, entry["expires_at"] - time.time())
+    try:
+        HISTORY.record(channel.key, bool(candidates), tier, elapsed, candidates[0] if candidates else None, lifetime)
+    except sqlite3.Error as e:  # 歷史紀錄失敗不影響抓取
+        print(f"    ⚠️ 寫入抓取歷史失敗: {e}")
 
-def git_operations():
-    """執行 Git 推送流程"""
-    print("\n📡 正在執行 Git 同步...")
 
-    # 檢查是否為 Git 倉庫
-    if not os.path.exists(".git"):
-        print("⚠️ 當前目錄不是 Git 倉庫，跳過 Git 操作")
-        return
+def resolve_on_demand(name):
+    """播放清單伺服器 /ch/<頻道> 的隨選解析：快取仍有效直接回傳，否則立即抓取 (同頻道並行請求共用一次)
 
-    cmds = [
-        ["git", "pull", "origin", GIT_BRANCH, "--no-rebase"],  # 先拉取避免衝突
-        ["git", "add", "."],
-        ["git", "commit", "-m", f"📺 Auto Update {datetime.now():%Y-%m-%d %H:%M}"],
-        ["git", "push", "origin", GIT_BRANCH]
-    ]
+    不在頻道清單內的頻道擲出 LookupError (伺服器改用合併結果中的線路)；抓取失敗回傳 None。
+    """
+    channel = next((c for c in load_channels(CHANNELS_PATH, shard=CHANNEL_SHARD) if c.name == name), None)
+    if channel is None:
+        raise LookupError(name)
 
-    for cmd in cmds:
-        try:
-            # capture_output=True 讓它不要把 git 的廢話都印出來，除非出錯
-            subprocess.run(cmd, check=True, capture_output=True, text=True)
-        except subprocess.CalledProcessError as e:
-            # 允許 commit 失敗 (例如沒有檔案變更時)
-            if "nothing to commit" in e.stderr:
-                print("    ℹ️ 沒有變更需要提交")
-            elif "non-fast-forward" in e.stderr:
-                print("    ⚠️ Git Push 衝突，嘗試強制拉取...")
-                # 簡單的衝突解決策略：再次 pull
-                subprocess.run(["git", "pull", "origin", GIT_BRANCH, "--rebase"], check=False)
-                subprocess.run(["git", "push", "origin", GIT_BRANCH], check=False)
+    if SCHEDULER.in_backoff(channel.group, channel.name):
+        print(f"    ⏸️ [{name}] 上次抓取失敗，退避中")  # 播放器重試時不反覆開瀏覽器
+        return None
+
+    print(f"\n📺 [{name}] 播放器要求，解析中...")
+    try:
+        candidates = capture_task(channel)
+    except Exception as e:
+        print(f"    ❌ [{name}] 隨選抓取異常: {e}")
+        candidates = []
+    if candidates:
+        SCHEDULER.record_success(channel.group, channel.name, candidates[0],
+                                 min_interval=channel.min_interval, max_interval=channel.max_interval)
+    else:
+        SCHEDULER.record_failure(channel.group, channel.name)
+    CAPTURE_CACHE.save()
+    SCHEDULER.save()
+    return candidates[0] if candidates else None
+
+
+def capture_local(tasks, on_result):
+    """單機模式：本機 worker 執行緒並行抓取，哪個先完成就先回報"""
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="capture") as pool:
+        futures = {pool.submit(capture_task, channel): channel for channel in tasks}
+        for future in as_completed(futures):
+            channel = futures[future]
+            try:
+                candidates = future.result()
+            except Exception as e:
+                print(f"    ❌ [{channel.name}] worker 異常: {e}")
+                candidates = []
+            on_result(channel, candidates)
+
+
+def capture_distributed(tasks, on_result):
+    """協調者模式：到期頻道放入工作佇列，由各工作者領取；逾時未完成的頻道視為失敗"""
+    run_id = f"{INSTANCE_ID}:{time.time():.0f}"
+    pending = {channel.key: channel for channel in tasks}
+    for channel in tasks:
+        payload = {field: getattr(channel, field) for field in Channel.__slots__}
+        JOB_QUEUE.enqueue(run_id, channel.key, payload, channel.priority)
+    print(f"    📤 已派送 {len(tasks)} 個抓取工作")
+
+    deadline = time.time() + JOB_WAIT_SECONDS
+    while pending and time.time() < deadline:
+        done, _ = JOB_QUEUE.results(run_id)
+        for key in [k for k in pending if k in done]:
+            channel = pending.pop(key)
+            candidates = done[key] or []
+            if candidates:  # 線路檔與快取以協調者本機為準
+                write_channel_file(channel.group, channel.name, candidates)
+                CAPTURE_CACHE.put(channel.group, channel.name, candidates, "worker")
             else:
-                print(f"    ❌ Git 指令錯誤 [{cmd[1]}]: {e.stderr}")
+                CAPTURE_CACHE.mark_failed(channel.group, channel.name)
+            on_result(channel, candidates)
+        if pending:
+            JOB_QUEUE.acquire_role("coordinator", INSTANCE_ID, TICK_SECONDS * 3)
+            time.sleep(2)
 
-    print("✅ Git 操作完成")
+    for channel in pending.values():
+        print(f"    ⌛ [{channel.name}] 工作者逾時未回報")
+        on_result(channel, [])
 
 
-def merge_m3u():
-    """合併邏輯"""
-    print("\n📑 開始合併列表...")
+def worker_loop():
+    """工作者模式：持續領取工作並抓取，抓取期間定期續約；結果只經由佇列回報給協調者 (不寫本機快取檔)"""
+    def run():
+        while True:
+            job = JOB_QUEUE.claim(INSTANCE_ID)
+            if job is None:
+                SUPERVISOR.reap_orphans()
+                time.sleep(5)
+                continue
+            key, payload = job
+            channel = Channel(**payload)
+            done = threading.Event()
+
+            def keep_lease():
+                while not done.wait(JOB_QUEUE.lease_seconds / 3):
+                    if not JOB_QUEUE.renew(key, INSTANCE_ID):
+                        return
+
+            threading.Thread(target=keep_lease, daemon=True).start()
+            try:
+                candidates = capture_task(channel, recapture=True)
+            except Exception as e:
+                print(f"    ❌ [{channel.name}] worker 異常: {e}")
+                candidates = []
+            finally:
+                done.set()
+            JOB_QUEUE.complete(key, INSTANCE_ID, candidates, ok=bool(candidates))
+
+    print(f"👷 工作者 {INSTANCE_ID} 啟動，{MAX_WORKERS} 個抓取執行緒")
+    threads = [threading.Thread(target=run, name=f"worker-{i}", daemon=True) for i in range(MAX_WORKERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
 
-    # 1. 下載最新 TWTV
-    try:
-        r = requests.get(GITHUB_TWTV_RAW_URL, timeout=15)
-        if r.status_code != 200:
-            print("    ❌ 無法下載遠端 TWTV.m3u")
-            return
-        original_content = r.text
-    except Exception as e:
-        print(f"    ❌ 下載失敗: {e}")
+
+def job_wrapper():
+    """排程任務主入口 (每分鐘執行)：只抓取已到期的頻道；沒有頻道到期且未到合併間隔時直接返回"""
+    global _last_merge
+    SUPERVISOR.reap_orphans()
+    if RUN_MODE == "coordinator" and not JOB_QUEUE.acquire_role("coordinator", INSTANCE_ID, TICK_SECONDS * 3):
+        return  # 另一個協調者仍在運作，避免兩邊同時合併與 git push
+    # 已持有鎖檔：重新讀取快取與排程狀態，納入單次指令 (capture 等) 寫入的結果，避免以舊的記憶體內容覆寫
+    CAPTURE_CACHE.load()
+    SCHEDULER.load()
+    channels = load_channels(CHANNELS_PATH, shard=CHANNEL_SHARD)
+    tasks = [] if ON_DEMAND else SCHEDULER.due(channels)  # 隨選模式不定時巡檢，只在播放器要求時抓取
+    if not tasks and time.time() - _last_merge < MERGE_INTERVAL_MINUTES * 60:
         return
 
-    # 2. 備份
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    if os.path.exists(LOCAL_TWTV_PATH):
-        os.rename(LOCAL_TWTV_PATH, os.path.join(BACKUP_DIR, f"TWTV_backup_{ts}.m3u"))
-
-    # 3. 清理舊備份 (保留最近 5 個)
-    backups = sorted(glob.glob(os.path.join(BACKUP_DIR, "*.m3u")), key=os.path.getmtime)
-    for b in backups[:-5]:
-        os.remove(b)
-
-    # 4. 過濾掉舊的「台灣頻道」
-    lines = original_content.splitlines()
-    clean_lines = []
-    skip = False
-    for line in lines:
-        # 假設我們的台灣頻道都有這個 group-title
-        if 'group-title="台灣頻道"' in line:
-            skip = True
-            continue
-        if skip and (line.startswith("http") or line.strip() == ""):
-            skip = False  # 網址行結束後，下一行恢復
-            continue
-        if not skip:
-            clean_lines.append(line)
+    print(f"\n⏰ 排程啟動: {datetime.now():%Y-%m-%d %H:%M:%S} (到期頻道 {len(tasks)}/{len(channels)})")
+    total_tasks = len(tasks)
+    fresh_results = {}
+
+    def on_result(channel, candidates):
+        fresh_results[(channel.group, channel.name)] = candidates
+        if candidates:  # 播放清單伺服器的 /ch/<頻道> 立即導向新線路
+            PLAYLIST_STORE.set_best(channel.name, candidates[0])
+        print(f"--- 進度 {len(fresh_results)}/{total_tasks} --- {channel.name} {'✅' if candidates else '❌'}")
+        schedule_next(channel, candidates)
+
+    # 遠端 TWTV 的下載與抓取同時進行
+    with ThreadPoolExecutor(max_workers=1) as io_pool:
+        upstream_future = io_pool.submit(download_upstream)
+        if RUN_MODE == "coordinator":
+            capture_distributed(tasks, on_result)
+        else:
+            capture_local(tasks, on_result)
+        base_playlist = upstream_future.result()
 
-    # 5. 讀取新抓取的頻道
-    new_channels = []
-    m3u_files = glob.glob(os.path.join(OUTPUT_DIR, "**", "*.m3u"), recursive=True)
+    TIER_STATS.save()
+    CAPTURE_CACHE.save()
+    if total_tasks:
+        try:
+            HISTORY.record_run("auto_update", sum(1 for c in fresh_results.values() if c), total_tasks)
+            HISTORY.maybe_compact()  # 每小時最多一次：過期原始紀錄刪除、舊統計併入累計值
+        except sqlite3.Error as e:
+            print(f"    ⚠️ 寫入更新紀錄失敗: {e}")
+    with metrics.span("merge_m3u"):
+        merge_m3u(base_playlist, fresh_results)
+    _last_merge = time.time()
+    CAPTURE_CACHE.save()  # 檢測失效的頻道已在合併時作廢快取
+    SCHEDULER.save()
+    if RUN_MODE == "coordinator" and not JOB_QUEUE.acquire_role("coordinator", INSTANCE_ID, TICK_SECONDS * 3):
+        print("⚠️ 協調者角色已被其他實例接手，本輪不發布")
+        return
+    with metrics.span("git_operations"):
+        git_operations()
+    print(f"🏁 排程結束: {datetime.now():%Y-%m-%d %H:%M:%S}\n")
+    wait = None if ON_DEMAND else SCHEDULER.next_due_in(channels)
+    if wait is not None:
+        print(f"⏳ 下一個頻道約 {wait / 60:.0f} 分鐘後到期...")
 
-    for f in m3u_files:
-        with open(f, "r", encoding="utf-8") as mfile:
-            c_lines = mfile.readlines()
-            # 跳過 #EXTM3U 頭部，只抓內容
-            for cl in c_lines:
-                if cl.startswith("#EXTINF") or cl.startswith("http"):
-                    new_channels.append(cl.strip())
 
-    # 6. 組合
-    final_content = "#EXTM3U\n"
-    # 加入原始內容 (去掉第一行 #EXTM3U 避免重複)
-    for l in clean_lines:
-        if "#EXTM3U" not in l:
-            final_content += l + "\n"
+def shutdown():
+    """關閉常駐瀏覽器與 CDP 引擎"""
+    BROWSER_POOL.close_all()
+    if CDP_ENGINE is not None:
+        CDP_ENGINE.close()
 
-    final_content += f"\n\n# ========== 自動更新台灣頻道 ==========\n"
-    final_content += f"# 更新時間: {datetime.now():%Y-%m-%d %H:%M:%S}\n"
-    final_content += "\n".join(new_channels)
 
-    with open(LOCAL_TWTV_PATH, "w", encoding="utf-8") as f:
-        f.write(final_content)
+def run_once(job, name):
+    """單次指令：與常駐服務共用鎖檔，避免同時改寫輸出或 git push"""
+    lock = FileLock()
+    if not lock.acquire():
+        print(f"🔒 另一個程序正在更新 ({lock.holder()})，請稍後再試")
+        return False
+    t0 = time.perf_counter()
+    try:
+        job()
+    finally:
+        lock.release()
+    print(f"🏁 {name}完成，耗時 {time.perf_counter() - t0:.2f} 秒")
+    return True
+
+
+def cmd_capture(names):
+    """抓取一次：指定頻道名稱時只抓這些頻道，否則抓取已到期的頻道；結果寫入 m3u-files 與快取"""
+    channels = load_channels(CHANNELS_PATH, shard=CHANNEL_SHARD)
+    if names:
+        unknown = set(names) - {c.name for c in channels}
+        if unknown:
+            print(f"⚠️ 頻道清單中沒有：{'、'.join(sorted(unknown))}")
+        tasks = [c for c in channels if c.name in names]
+    else:
+        tasks = SCHEDULER.due(channels)
+    print(f"🎯 抓取 {len(tasks)} 個頻道")
+
+    def on_result(channel, candidates):
+        print(f"--- {channel.name} {'✅' if candidates else '❌'}")
+        schedule_next(channel, candidates)
 
-    print(f"✅ 合併完成！新增了 {len(m3u_files)} 個頻道資訊")
+    try:
+        capture_local(tasks, on_result)
+    finally:
+        shutdown()
+        TIER_STATS.save()
+        CAPTURE_CACHE.save()
+        SCHEDULER.save()
 
 
-def job_wrapper():
-    """排程任務主入口"""
-    print(f"\n⏰ 排程啟動: {datetime.now():%Y-%m-%d %H:%M:%S}")
+def cmd_probe():
+    """只檢測現有的 TWTV.m3u (報告寫入 logs/probe_report.json)，不改寫檔案"""
+    if not os.path.exists(LOCAL_TWTV_PATH):
+        print(f"❌ 找不到 {LOCAL_TWTV_PATH}")
+        return
+    probe_playlist(M3UPlaylist.from_file(LOCAL_TWTV_PATH))
 
-    total_tasks = sum(len(v) for v in CHANNEL_GROUPS.values())
-    current = 0
 
-    for group, channels in CHANNEL_GROUPS.items():
-        for name, url in channels.items():
-            current += 1
-            print(f"--- 進度 {current}/{total_tasks} ---")
-            fetch_stream(group, name, url)
-            time.sleep(2)  # 稍微休息避免被網站封鎖
+def cmd_history(window):
+    """列出各頻道在指定區間的成功率、p50 / p95 抓取耗時與平均網址壽命 (只讀預先計算的統計)"""
+    HISTORY.refresh()  # 長時間沒有抓取的頻道，讓舊紀錄移出區間
+    rows = HISTORY.summaries(window)
+    if not rows:
+        print("ℹ️ 尚無抓取歷史")
+        return
+    print(f"📊 最近 {window} 抓取統計")
+    for r in rows:
+        rate = f"{r['success_rate'] * 100:5.1f}%" if r["success_rate"] is not None else "    -"
+        p50 = f"{r['p50_ms'] / 1000:6.1f}s" if r["p50_ms"] is not None else "      -"
+        p95 = f"{r['p95_ms'] / 1000:6.1f}s" if r["p95_ms"] is not None else "      -"
+        life = f"{r['lifetime_avg'] / 60:5.0f} 分" if r["lifetime_avg"] is not None else "     -"
+        print(f"  {r['channel']:<16} 成功率 {rate} ({r['ok']}/{r['total']})  p50 {p50}  p95 {p95}  網址壽命 {life}")
+    for run in HISTORY.recent_runs(5):
+        print(f"  🕒 {datetime.fromtimestamp(run['ts']):%Y-%m-%d %H:%M:%S} {run['action']} "
+              f"{run['success_count']}/{run['total_count']}")
+
+
+def serve():
+    """常駐服務：依 RUN_MODE 以單機、協調者或工作者模式執行，直到 Ctrl+C"""
+    global JOB_QUEUE
+    from apscheduler.schedulers.background import BackgroundScheduler
 
-    merge_m3u()
-    git_operations()
-    print(f"🏁 排程結束: {datetime.now():%Y-%m-%d %H:%M:%S}\n")
-    print("⏳ 等待下次排程 (15分鐘後)...")
+    print("🚀 LITV 自動更新系統 (Enhanced) 啟動")
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    if RUN_MODE == "worker" and COORDINATOR_URL:
+        JOB_QUEUE = RemoteQueue(COORDINATOR_URL)  # 其他主機：經由協調者的佇列端點領取工作
+    elif RUN_MODE != "standalone":
+        JOB_QUEUE = JobQueue(JOB_QUEUE_PATH)
+    if RUN_MODE == "coordinator":
+        start_queue_server(JOB_QUEUE)
+    SUPERVISOR.reap_orphans()  # 上次異常結束留下的 chromedriver / Chrome
+    if (PLAYLIST_SERVER_ENABLED or ON_DEMAND) and RUN_MODE != "worker":
+        if ON_DEMAND:
+            PLAYLIST_STORE.resolver = resolve_on_demand
+            print(f"📺 隨選模式：頻道網址 {public_base_url()}/ch/<頻道>")
+        if os.path.exists(LOCAL_TWTV_PATH):  # 先以上次的結果提供服務，不必等第一輪合併
+            PLAYLIST_STORE.update(M3UPlaylist.from_file(LOCAL_TWTV_PATH))
+        playlist_server.start_server(PLAYLIST_STORE)
+    if METRICS_ENABLED:
+        metrics.add_collector(HISTORY.prometheus_lines)  # 各頻道滾動成功率與 p50 / p95
+        try:
+            metrics.start_server()
+        except OSError as e:  # 同一台主機上同時執行協調者與工作者時埠號已被占用
+            print(f"⚠️ Metrics 端點啟動失敗: {e}")
 
+    if RUN_MODE == "worker":
+        try:
+            worker_loop()
+        except KeyboardInterrupt:
+            print("\n🛑 程式已停止")
+            shutdown()
+        return
 
-# ====== 主程式 ======
-if __name__ == "__main__":
-    print("🚀 LITV 自動更新系統 (Enhanced) 啟動")
+    # 同一時間只跑一輪 (跨程序鎖檔 cache/update.lock)；執行中的觸發合併為結束後再跑一輪
+    run = RunCoordinator(job_wrapper)
 
     # 啟動時先執行一次
-    job_wrapper()
+    run.trigger("啟動")
 
-    # 設定排程
+    # 設定排程：每分鐘檢查一次，各頻道依自己的更新時間抓取
     scheduler = BackgroundScheduler()
-    scheduler.add_job(job_wrapper, 'interval', minutes=15)
+    scheduler.add_job(run.trigger, 'interval', seconds=TICK_SECONDS, max_instances=2, coalesce=True)
     scheduler.start()
 
     try:
@@ -312,4 +710,50 @@ if __name__ == "__main__":
             time.sleep(2)
     except KeyboardInterrupt:
         print("\n🛑 程式已停止")
-        scheduler.shutdown()
\ No newline at end of file
+        scheduler.shutdown()
+        if RUN_MODE == "coordinator":
+            JOB_QUEUE.release_role("coordinator", INSTANCE_ID)
+        shutdown()
+
+
+def main(argv=None):
+    global RUN_MODE, PROBE_ENABLED
+    parser = argparse.ArgumentParser(description="LITV 自動更新系統：抓取、合併、檢測與發布 TWTV.m3u")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--coordinator", action="store_true", help="常駐服務以協調者模式執行 (只派工、合併與發布)")
+    mode.add_argument("--worker", action="store_true", help="常駐服務以工作者模式執行 (只抓取)")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("run", help="常駐服務 (預設)")
+    capture = sub.add_parser("capture", help="抓取到期 (或指定) 的頻道一次")
+    capture.add_argument("channels", nargs="*", help="頻道名稱 (省略則抓取已到期的頻道)")
+    merge = sub.add_parser("merge", help="以 m3u-files 現有結果合併 TWTV.m3u")
+    merge.add_argument("--no-probe", action="store_true", help="合併後不檢測線路")
+    sub.add_parser("publish", help="git 發布輸出檔案")
+    sub.add_parser("probe", help="檢測 TWTV.m3u 的線路並寫出報告")
+    history = sub.add_parser("history", help="各頻道成功率與 p50 / p95 抓取耗時")
+    history.add_argument("--window", choices=list(WINDOWS), default="24h")
+    args = parser.parse_args(argv)
+
+    if args.command == "capture":
+        run_once(lambda: cmd_capture(args.channels), "抓取")
+    elif args.command == "merge":
+        if args.no_probe:
+            PROBE_ENABLED = False
+        run_once(merge_m3u, "合併")
+    elif args.command == "publish":
+        run_once(git_operations, "發布")
+    elif args.command == "probe":
+        cmd_probe()
+    elif args.command == "history":
+        cmd_history(args.window)
+    else:
+        if args.coordinator:
+            RUN_MODE = "coordinator"
+        elif args.worker:
+            RUN_MODE = "worker"
+        serve()
+
+
+# ====== 主程式 ======
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+adaptive_scheduler.py
+--------------------------------------------
+每個頻道各自的下次更新時間：
+- 成功：依網址到期時間或實測的網址壽命決定間隔 (穩定的頻道更新得更少)
+- 失敗：指數退避重試 (壞掉的頻道較快重試，但不會每分鐘狂抓)
+- 線路檢測失效：立即排入下一輪提早更新；重抓仍得到同一條失效網址時視為失敗並退避
+- 網址壽命：只有檢測到失效才是實際壽命樣本；換網址或檢測仍可用時只知道「至少活了這麼久」，
+  僅用來提高估計值 (快取到期換網址的時間是快取 TTL，不是網址壽命)
+排程器只需每分鐘呼叫 due() 取出到期的頻道。
+"""
+
+import os
+import json
+import time
+import threading
+
+from atomic_io import atomic_write_text
+from capture_cache import REFRESH_MARGIN
+
+# ====== 配置設定 ======
+STATE_PATH = os.path.join("cache", "schedule_state.json")
+TICK_SECONDS = 60  # 排程器檢查到期頻道的頻率
+DEFAULT_INTERVAL = 15 * 60  # 尚無壽命資料時的更新間隔
+MIN_INTERVAL = 5 * 60
+MAX_INTERVAL = 6 * 3600
+LIFETIME_SAFETY = 0.5  # 以實測壽命的一半作為更新間隔
+EXPIRY_MARGIN = REFRESH_MARGIN + TICK_SECONDS  # 網址帶到期時間時提前更新 (落在快取判定需重抓的範圍內)
+RETRY_BASE = 2 * 60  # 失敗後第一次重試的等待時間，之後每次加倍
+RETRY_MAX = 60 * 60
+EWMA_ALPHA = 0.3  # 壽命估計的平滑係數
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+class AdaptiveScheduler:
+    """以 (group, channel) 為單位保存下次執行時間、失敗次數與網址壽命估計"""
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.state = {}
+        self.load()
+
+    @staticmethod
+    def key(group, channel):
+        return f"{group}/{channel}"
+
+    def load(self):
+        """從磁碟重新讀取 (常駐服務每輪開始時呼叫，納入單次指令寫入的結果)"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        with self._lock:
+            self.state = state
+
+    def save(self):
+        with self._lock:
+            data = json.dumps(self.state, ensure_ascii=False, indent=2)
+        atomic_write_text(self.path, data)
+
+    def _entry(self, group, channel):
+        return self.state.setdefault(self.key(group, channel), {
+            "next_run": 0, "failures": 0, "lifetime": None, "url": None, "url_since": None, "dead_url": None,
+        })
+
+    def due(self, channels, now=None):
+        """回傳已到期的頻道 (channel_registry.Channel，保持傳入順序)"""
+        now = now or time.time()
+        with self._lock:
+            return [c for c in channels if self._entry(c.group, c.name)["next_run"] <= now]
+
+    def next_due_in(self, channels, now=None):
+        """距離最近一個頻道到期還有幾秒"""
+        now = now or time.time()
+        with self._lock:
+            times = [self._entry(c.group, c.name)["next_run"] for c in channels]
+        return max(0.0, min(times) - now) if times else None
+
+    def in_backoff(self, group, channel, now=None):
+        """上次抓取失敗且尚未到重試時間 (與快取無關：從未抓成功的頻道同樣適用)"""
+        now = now or time.time()
+        with self._lock:
+            entry = self.state.get(self.key(group, channel))
+            return bool(entry and entry["failures"] and entry["next_run"] > now)
+
+    def _observe_lifetime(self, entry, now, died):
+        """died=True：網址經檢測失效，存活時間為實際壽命樣本 (EWMA)；
+        died=False：網址仍可用或被主動換掉，存活時間只是壽命下限，只在超過目前估計時提高估計
+        """
+        if entry["url_since"] is None:
+            return
+        sample = now - entry["url_since"]
+        if entry["lifetime"] is None or (not died and sample > entry["lifetime"]):
+            entry["lifetime"] = sample
+        elif died:
+            entry["lifetime"] = EWMA_ALPHA * sample + (1 - EWMA_ALPHA) * entry["lifetime"]
+
+    def record_success(self, group, channel, primary_url, expires_at=None, now=None,
+                       min_interval=None, max_interval=None):
+        """min_interval / max_interval 為頻道設定的更新間隔提示 (秒)，None 使用預設"""
+        now = now or time.time()
+        with self._lock:
+            entry = self._entry(group, channel)
+            same_dead_url = primary_url == entry.get("dead_url")
+            if not same_dead_url:
+                if primary_url != entry["url"]:
+                    self._observe_lifetime(entry, now, died=False)
+                    entry["url"] = primary_url
+                    entry["url_since"] = now
+                entry["failures"] = 0
+                entry["dead_url"] = None
+
+                if expires_at:
+                    interval = expires_at - EXPIRY_MARGIN - now
+                elif entry["lifetime"]:
+                    interval = entry["lifetime"] * LIFETIME_SAFETY
+                else:
+                    interval = DEFAULT_INTERVAL
+                interval = _clamp(interval, min_interval or MIN_INTERVAL, max_interval or MAX_INTERVAL)
+                entry["next_run"] = now + interval
+                return interval
+
+        # 鎖已釋放後才呼叫 (record_failure 會自行取得鎖)
+        print(f"    ⚠️ [{channel}] 重抓仍是已失效的網址，退避後再試")
+        return self.record_failure(group, channel, now)
+
+    def record_failure(self, group, channel, now=None):
+        now = now or time.time()
+        with self._lock:
+            entry = self._entry(group, channel)
+            entry["failures"] += 1
+            delay = min(RETRY_BASE * 2 ** (entry["failures"] - 1), RETRY_MAX)
+            entry["next_run"] = now + delay
+            return delay
+
+    def mark_dead(self, group, channel, url=None, now=None):
+        """線路檢測失效：記錄實際壽命並排入下一輪立即更新 (快取需由呼叫端一併作廢)"""
+        now = now or time.time()
+        with self._lock:
+            entry = self._entry(group, channel)
+            if entry["url"] is None and url is not None and url == entry.get("dead_url"):
+                return  # 重抓後仍是同一條失效網址，維持 record_failure 的退避
+            if entry["url"] is not None:
+                self._observe_lifetime(entry, now, died=True)
+                entry["dead_url"] = url or entry["url"]
+                entry["url"] = None
+                entry["url_since"] = None
+            entry["next_run"] = now
+
+    def mark_alive(self, group, channel, url, now=None):
+        """線路檢測仍可用：目前網址至少已存活這麼久，用來提高壽命估計"""
+        now = now or time.time()
+        with self._lock:
+            entry = self._entry(group, channel)
+            if entry["url"] == url:
+                self._observe_lifetime(entry, now, died=False)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+atomic_io.py
+--------------------------------------------
+輸出檔案的防當機寫入與快照備份：
+- atomic_open() / atomic_write_text()：寫入同目錄暫存檔 → fsync → os.replace，
+  讀取端永遠只會看到完整的舊檔或新檔，不會讀到寫到一半的內容
+- SnapshotBackups：以內容雜湊去重的快照備份，優先使用硬連結 (不複製檔案內容)，
+  內容未變更時只更新時間戳；保留數量可設定
+"""
+
+import os
+import glob
+import time
+import shutil
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+
+# ====== 配置設定 ======
+BACKUP_RETENTION = 5  # 每個檔案保留的快照數量
+REPLACE_RETRIES = 5  # Windows 上目標檔案正被讀取時 os.replace 可能失敗，短暫重試
+
+
+def _fsync_dir(path):
+    """POSIX 上同步目錄項目，確保 rename 本身也已落盤 (Windows 不支援，略過)"""
+    if os.name == "nt":
+        return
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _replace(src, dst):
+    for attempt in range(REPLACE_RETRIES):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if attempt == REPLACE_RETRIES - 1:
+                raise
+            time.sleep(0.1 * (attempt + 1))
+
+
+@contextmanager
+def atomic_open(path, mode="w", encoding="utf-8", newline=None):
+    """with atomic_open(path) as f: ... 區塊正常結束才以新內容取代 path；發生例外時保留舊檔"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        if "b" in mode:
+            f = os.fdopen(fd, mode)
+        else:
+            f = os.fdopen(fd, mode, encoding=encoding, newline=newline)
+        with f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        _replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    _fsync_dir(path)
+
+
+def atomic_write_text(path, text, encoding="utf-8", newline=None):
+    with atomic_open(path, "w", encoding=encoding, newline=newline) as f:
+        f.write(text)
+
+
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class SnapshotBackups:
+    """<stem>_backup_<時間>_<雜湊>.<ext> 形式的快照備份
+
+    快照以硬連結指向被備份時的檔案 (inode)；因所有輸出都經 atomic_open 以新檔取代，
+    原檔之後的寫入不會影響已建立的快照。不支援硬連結的檔案系統改為複製。
+    """
+
+    def __init__(self, backup_dir, retention=BACKUP_RETENTION):
+        self.backup_dir = backup_dir
+        self.retention = retention
+
+    def _pattern(self, path, suffix="*"):
+        stem, ext = os.path.splitext(os.path.basename(path))
+        return os.path.join(self.backup_dir, f"{stem}_backup_{suffix}{ext}")
+
+    def snapshots(self, path):
+        """既有快照，舊的在前"""
+        return sorted(glob.glob(self._pattern(path)), key=os.path.getmtime)
+
+    def snapshot(self, path):
+        """備份 path 目前的內容，回傳快照路徑 (檔案不存在回傳 None)；內容已有快照時不寫入任何資料"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        os.makedirs(self.backup_dir, exist_ok=True)
+        existing = self.snapshots(path)
+
+        # 1. 同一個 inode 已備份過 (上次之後沒有寫入)：零 I/O
+        for snap in existing:
+            try:
+                if os.path.samestat(st, os.stat(snap)):
+                    return snap
+            except OSError:
+                continue
+
+        # 2. 內容相同的快照已存在：只更新時間戳，讓它在保留順序中變成最新
+        digest = file_digest(path)[:12]
+        same = [s for s in existing if os.path.splitext(s)[0].endswith("_" + digest)]
+        if same:
+            os.utime(same[-1])
+            return same[-1]
+
+        # 3. 新內容：硬連結 (不複製資料)，失敗才複製
+        dest = self._pattern(path, f"{datetime.now():%Y%m%d_%H%M%S}_{digest}")
+        try:
+            os.link(path, dest)
+        except OSError:
+            with open(path, "rb") as src, atomic_open(dest, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        print(f"    📦 已建立快照 {os.path.basename(dest)}")
+        self.prune(path)
+        return dest
+
+    def prune(self, path):
+        """只保留最新的 retention 個快照"""
+        snaps = self.snapshots(path)
+        for old in snaps[:max(0, len(snaps) - self.retention)]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
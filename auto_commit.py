@@ -5,26 +5,23 @@
 並保存至 m3u-files/all.m3u
 """
 
-import os, time, subprocess, requests
+import os, time, requests
 from datetime import datetime
-from seleniumwire import webdriver
-import chromedriver_autoinstaller
-from apscheduler.schedulers.background import BackgroundScheduler
-
-# 頻道列表
-CHANNELS = {
-    "龍華戲劇": "https://www.ofiii.com/channel/watch/litv-longturn21",
-    "龍華電影": "https://www.ofiii.com/channel/watch/litv-longturn03",
-    "龍華偶像": "https://www.ofiii.com/channel/watch/litv-longturn12",
-    "龍華經典": "https://www.ofiii.com/channel/watch/litv-longturn20"
-}
+from browser_pool import BrowserPool
+from m3u8_watch import M3U8Collector
+from publisher import Publisher
+from channel_registry import load_channels
+from atomic_io import atomic_open, atomic_write_text
+
+# 頻道列表統一由 channels.json 提供 (channel_registry.py)
+GROUP = "台灣頻道"
 
 OUTPUT_DIR = "m3u-files"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-chromedriver_autoinstaller.install()
 
 
-def fetch_stream(channel_name, url):
+def stream_chrome_options():
+    from seleniumwire import webdriver  # 第一次啟動瀏覽器時才載入 (ChromeDriver 檢查亦同)
+
     options = webdriver.ChromeOptions()
     options.add_argument("--headless")
     options.add_argument("--disable-blink-features=AutomationControlled")
@@ -32,25 +29,36 @@ def fetch_stream(channel_name, url):
     options.add_argument("--window-size=1280,720")
     options.add_argument(
         "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36")
+    return options
+
+
+# 常駐瀏覽器：跨頻道與排程重複使用
+BROWSER_POOL = BrowserPool(1, options_factory=stream_chrome_options, seleniumwire_options={})
 
-    driver = webdriver.Chrome(options=options)
-    driver.get(url)
-    print(f"[台灣頻道/{channel_name}] 🌍 正在加载页面...")
-    time.sleep(20)
 
-    streams = []
-    for req in driver.requests:
-        if req.response and ".m3u8" in req.url:
-            if "avc1_" in req.url:
-                streams.append(req.url)
-    driver.quit()
+def fetch_stream(channel_name, url):
+    with BROWSER_POOL.session() as session:
+        collector = M3U8Collector(match=lambda u: "avc1_" in u)
+        driver = None
+        try:
+            driver = session.open(url, before_load=collector.attach)
+            print(f"[{GROUP}/{channel_name}] 🌍 正在加载页面...")
+            collector.wait(20)  # 串流出現即返回，最多 20 秒
+        except Exception as e:
+            print(f"[{channel_name}] ❌ 发生错误: {e}")
+            session.broken = True
+        finally:
+            if driver is not None:
+                collector.detach(driver)
+
+        streams = [u for u in collector.candidates() if "avc1_" in u]
 
     if streams:
         output_path = os.path.join(OUTPUT_DIR, f"{channel_name}.m3u")
-        with open(output_path, "w", encoding="utf-8") as f:
+        with atomic_open(output_path) as f:
             f.write("#EXTM3U\n")
             for s in sorted(set(streams)):
-                f.write(f"#EXTINF:-1 group-title=\"台灣頻道\" tvg-name=\"{channel_name}\",{channel_name}\n{s}\n")
+                f.write(f"#EXTINF:-1 group-title=\"{GROUP}\" tvg-name=\"{channel_name}\",{channel_name}\n{s}\n")
             f.write(f"# 更新時間：{datetime.now():%Y-%m-%d %H:%M:%S}\n")
         print(f"[{channel_name}] ✅ 抓取到 {len(streams)} 條流並保存")
     else:
@@ -59,8 +67,8 @@ def fetch_stream(channel_name, url):
 
 def update_all_channels():
     print(f"\n🕒 [{datetime.now():%Y-%m-%d %H:%M:%S}] 開始更新台灣頻道...")
-    for name, url in CHANNELS.items():
-        fetch_stream(name, url)
+    for channel in load_channels(group=GROUP):
+        fetch_stream(channel.name, channel.url)
     merge_all()
     git_push()
     print("✅ 台灣頻道更新完成\n")
@@ -73,26 +81,33 @@ def merge_all():
             with open(os.path.join(OUTPUT_DIR, file), encoding="utf-8") as f:
                 lines.append(f.read())
     all_path = os.path.join(OUTPUT_DIR, "all.m3u")
-    with open(all_path, "w", encoding="utf-8") as f:
-        f.write("\n".join(lines))
+    atomic_write_text(all_path, "\n".join(lines))
     print("📄 已生成台灣頻道總表 all.m3u")
 
 
 def git_push():
-    subprocess.run(["git", "add", "."], check=False)
-    subprocess.run(["git", "commit", "-m", f"🕒 Auto update {datetime.now():%Y-%m-%d %H:%M:%S}"], check=False)
-    subprocess.run(["git", "push", "origin", "main"], check=False)
+    files = [os.path.join(OUTPUT_DIR, f) for f in os.listdir(OUTPUT_DIR) if f.endswith(".m3u")]
+    Publisher().publish(files, message=f"🕒 Auto update {datetime.now():%Y-%m-%d %H:%M:%S}")
     print("🚀 已自動推送到 GitHub")
 
 
+def main():
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    scheduler = BackgroundScheduler()
+    scheduler.add_job(update_all_channels, 'interval', minutes=30)
+    scheduler.start()
+    update_all_channels()
+
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        scheduler.shutdown()
+        BROWSER_POOL.close_all()
+
+
 # 主程序
-scheduler = BackgroundScheduler()
-scheduler.add_job(update_all_channels, 'interval', minutes=30)
-scheduler.start()
-update_all_channels()
-
-try:
-    while True:
-        time.sleep(60)
-except KeyboardInterrupt:
-    scheduler.shutdown()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+benchmark.py
+--------------------------------------------
+可重現的效能基準 (全部在本機完成，不連線 ofiii / GitHub)：
+- 本機 HTTP 假站：模擬 ofiii 觀看頁 (同意彈窗、播放按鈕、延遲送出的 .m3u8 請求) 與 HLS master / 畫質列表
+- 產生 1k / 10k / 100k 條線路的合成 TWTV.m3u，量測解析 + 群組取代 + 寫檔的吞吐量
+- 量測 collect_taiwan_streams、線路排序 (rank_streams)、fetch_stream 抓取延遲百分位數與瀏覽器啟動成本
+- 各階段的程序樹記憶體峰值 (RSS)
+結果寫入 logs/benchmark/<時間>.json；--baseline 指定舊結果時列出差異。
+
+用法：
+    python benchmark.py                      # 全部
+    python benchmark.py --skip-browser       # 不啟動 Chrome (只跑合併與排序)
+    python benchmark.py --sizes 1000,10000 --captures 5 --baseline logs/benchmark/xxx.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import psutil
+
+import metrics
+from m3u_model import M3UPlaylist
+
+# ====== 配置設定 ======
+RESULTS_DIR = os.path.join("logs", "benchmark")
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_CAPTURES = 10
+RANK_ROUNDS = 50
+M3U8_DELAY_MS = 800  # 點擊播放後延遲多久才請求 .m3u8
+RSS_SAMPLE_SECONDS = 0.05
+FIXTURE_GROUP = "台灣頻道"
+SEGMENT_BYTES = 4096  # 假站片段大小
+
+WATCH_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{channel}</title></head>
+<body>
+<div id="consent" style="position:fixed;top:0;left:0;right:0;background:#eee;padding:20px">
+  <p>使用條款</p><button onclick="document.getElementById('consent').remove()">我同意</button>
+</div>
+<div id="player" style="margin-top:120px">
+  <button class="vjs-big-play-button" onclick="play()">播放</button>
+</div>
+<script>
+function play() {{
+  setTimeout(function () {{ fetch("/hls/{channel}/" + "master" + ".m3u8"); }}, {delay});
+}}
+</script>
+</body></html>
+"""
+
+MASTER_PLAYLIST = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360,CODECS="avc1.4d401e,mp4a.40.2"
+avc1_360p.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2500000,RESOLUTION=1280x720,CODECS="avc1.4d401f,mp4a.40.2"
+avc1_720p.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=5000000,RESOLUTION=1920x1080,CODECS="avc1.640028,mp4a.40.2"
+avc1_1080p.m3u8
+"""
+
+MEDIA_PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-TARGETDURATION:6
+#EXT-X-MEDIA-SEQUENCE:1
+#EXTINF:6.0,
+seg1.ts
+"""
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path.startswith("/channel/watch/"):
+            channel = path.rsplit("/", 1)[-1]
+            self._send(200, "text/html; charset=utf-8", WATCH_PAGE.format(channel=channel, delay=M3U8_DELAY_MS))
+        elif path.endswith("/master.m3u8"):
+            self._send(200, "application/vnd.apple.mpegurl", MASTER_PLAYLIST)
+        elif path.endswith(".m3u8"):
+            self._send(200, "application/vnd.apple.mpegurl", MEDIA_PLAYLIST)
+        elif path.endswith(".ts"):
+            self._send(200, "video/mp2t", "G" * SEGMENT_BYTES)  # 線路檢測會讀取第一個片段
+        else:
+            self._send(404, "text/plain", "not found")
+
+    def _send(self, status, content_type, text):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_fixture_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FixtureHandler)
+    threading.Thread(target=server.serve_forever, name="fixture", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+class PeakRSS:
+    """with PeakRSS() as p: ... 取樣本程序與所有子程序 (Chrome) 的記憶體，p.peak_mb 為峰值"""
+
+    def __init__(self):
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        root = psutil.Process()
+        total = 0
+        for p in [root] + root.children(recursive=True):
+            try:
+                total += p.memory_info().rss
+            except psutil.Error:
+                continue
+        self.peak_mb = max(self.peak_mb, total / (1024 * 1024))
+
+    def _run(self):
+        while not self._stop.wait(RSS_SAMPLE_SECONDS):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+def percentiles(samples):
+    """回傳毫秒為單位的 p50 / p90 / p95 / p99 / max / mean"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "p50_ms": round(pick(0.50) * 1000, 1),
+        "p90_ms": round(pick(0.90) * 1000, 1),
+        "p95_ms": round(pick(0.95) * 1000, 1),
+        "p99_ms": round(pick(0.99) * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 1),
+    }
+
+
+# ====== 合成資料 ======
+def write_synthetic_twtv(path, size, groups=20, seed=42):
+    """產生 size 條線路的 TWTV.m3u (含分隔註解與既有的台灣頻道群組)"""
+    rnd = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("#EXTM3U\n")
+        for i in range(size):
+            group = FIXTURE_GROUP if i % groups == 0 else f"群組{i % groups:02d}"
+            if i % 500 == 0:
+                f.write(f"\n#{'=' * 50}\n# {group}\n#{'=' * 50}\n")
+            name = f"頻道{i // 3:06d}"
+            f.write(f'#EXTINF:-1 tvg-id="ch{i}" tvg-name="{name}" tvg-logo="https://logo.example/{i}.png" '
+                    f'group-title="{group}",{name}\n')
+            f.write(f"https://cdn{rnd.randint(1, 9)}.example.com/live/{i}/index.m3u8?token={rnd.getrandbits(64):x}\n")
+
+
+def write_synthetic_channel_files(root, count):
+    """產生 m3u-files/<group>/<channel>.m3u (每個頻道 3 條線路)"""
+    group_dir = os.path.join(root, FIXTURE_GROUP)
+    os.makedirs(group_dir, exist_ok=True)
+    for i in range(count):
+        name = f"龍華測試{i:04d}"
+        with open(os.path.join(group_dir, f"{name}.m3u"), "w", encoding="utf-8") as f:
+            f.write("#EXTM3U\n")
+            for j in range(3):
+                tag = "主線路" if j == 0 else f"備用線路{j}"
+                f.write(f'#EXTINF:-1 group-title="{FIXTURE_GROUP}" tvg-name="{name}",{name} [{tag}]\n')
+                f.write(f"https://cdn.example.com/{i}/avc1_{j}.m3u8\n")
+            f.write(f"# Updated: {datetime.now():%Y-%m-%d %H:%M:%S}\n")
+
+
+# ====== 各項基準 ======
+def bench_merge(workdir, sizes):
+    """與 merge_m3u 相同的流程：解析遠端 TWTV → 以群組取代台灣頻道 → 串流寫檔"""
+    import merge_into_twtv
+
+    results = []
+    for size in sizes:
+        src = os.path.join(workdir, f"TWTV_{size}.m3u")
+        out = os.path.join(workdir, f"TWTV_{size}.out.m3u")
+        channels_dir = os.path.join(workdir, f"m3u-files-{size}")
+        write_synthetic_twtv(src, size)
+        write_synthetic_channel_files(channels_dir, max(7, size // 100))
+
+        merge_into_twtv.SOURCE_DIR = channels_dir
+        with PeakRSS() as rss:
+            t0 = time.perf_counter()
+            entries = merge_into_twtv.collect_taiwan_streams()
+            t_collect = time.perf_counter() - t0
+
+            t1 = time.perf_counter()
+            playlist = M3UPlaylist.from_file(src)
+            t_parse = time.perf_counter() - t1
+            t2 = time.perf_counter()
+            playlist.upsert_group(FIXTURE_GROUP, entries, banner=f"{FIXTURE_GROUP} (自動更新)",
+                                  notes=[f"更新時間: {datetime.now():%Y-%m-%d %H:%M:%S}"])
+            t_upsert = time.perf_counter() - t2
+            t3 = time.perf_counter()
+            playlist.write(out)
+            t_write = time.perf_counter() - t3
+
+        total = t_parse + t_upsert + t_write
+        results.append({
+            "entries": size,
+            "input_kb": os.path.getsize(src) // 1024,
+            "collect_taiwan_streams_ms": round(t_collect * 1000, 1),
+            "collected_entries": len(entries),
+            "parse_ms": round(t_parse * 1000, 1),
+            "upsert_ms": round(t_upsert * 1000, 1),
+            "write_ms": round(t_write * 1000, 1),
+            "entries_per_sec": round(size / total) if total else None,
+            "peak_rss_mb": round(rss.peak_mb, 1),
+        })
+        print(f"    📑 {size:>7} 條：解析 {t_parse * 1000:.0f} ms / 取代 {t_upsert * 1000:.0f} ms / "
+              f"寫入 {t_write * 1000:.0f} ms，{results[-1]['entries_per_sec']} 條/秒，"
+              f"collect {t_collect * 1000:.0f} ms")
+    return results
+
+
+def bench_rank(base_url, rounds=RANK_ROUNDS):
+    """讀取 master playlist 並依頻寬 / 解析度排序"""
+    from hls_ranker import rank_streams
+
+    master = f"{base_url}/hls/litv-longturn99/master.m3u8"
+    samples = []
+    with PeakRSS() as rss:
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            ranked = rank_streams([master])
+            samples.append(time.perf_counter() - t0)
+    result = {**percentiles(samples), "top": ranked[0] if ranked else None, "peak_rss_mb": round(rss.peak_mb, 1)}
+    print(f"    🏅 排序 p50 {result['p50_ms']} ms / p95 {result['p95_ms']} ms")
+    return result
+
+
+def bench_browser(base_url, workdir, captures):
+    """瀏覽器啟動成本與 fetch_stream 抓取延遲 (使用主程式的實際抓取流程)"""
+    import browser_pool
+    import LITV_TWTV_AutoUpdate as app
+
+    def bench_options():
+        options = browser_pool.default_chrome_options()
+        options.add_argument("--proxy-bypass-list=<-loopback>")  # 讓本機假站也經過 selenium-wire 代理
+        return options
+
+    startup = []
+    with PeakRSS() as rss_start:
+        for _ in range(3):
+            session = browser_pool.BrowserSession(options_factory=bench_options)
+            t0 = time.perf_counter()
+            session.start()
+            startup.append(time.perf_counter() - t0)
+            session.quit()
+
+    app.OUTPUT_DIR = os.path.join(workdir, "m3u-files")
+    app.BROWSER_POOL = browser_pool.BrowserPool(1, options_factory=bench_options)
+    samples, failures = [], 0
+    try:
+        with PeakRSS() as rss_capture:
+            for i in range(captures):
+                url = f"{base_url}/channel/watch/litv-longturn{i % 7 + 1:02d}"
+                t0 = time.perf_counter()
+                candidates = app.fetch_stream(FIXTURE_GROUP, f"測試{i}", url)
+                elapsed = time.perf_counter() - t0
+                if candidates:
+                    samples.append(elapsed)
+                else:
+                    failures += 1
+    finally:
+        app.BROWSER_POOL.close_all()
+
+    result = {
+        "startup": percentiles(startup),
+        "startup_peak_rss_mb": round(rss_start.peak_mb, 1),
+        # 第一次抓取包含瀏覽器啟動，另外列出暖機後的延遲
+        "capture": percentiles(samples),
+        "capture_warm": percentiles(samples[1:]),
+        "capture_failures": failures,
+        "capture_peak_rss_mb": round(rss_capture.peak_mb, 1),
+    }
+    print(f"    🌐 啟動 p50 {result['startup'].get('p50_ms')} ms，"
+          f"抓取 p50 {result['capture'].get('p50_ms')} ms / p95 {result['capture'].get('p95_ms')} ms，"
+          f"失敗 {failures}")
+    return result
+
+
+# ====== 結果 ======
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten(node, prefix=""):
+    if isinstance(node, dict):
+        for k, v in node.items():
+            yield from _flatten(v, f"{prefix}{k}.")
+    elif isinstance(node, list):
+        for i, v in enumerate(node):
+            key = v.get("entries", i) if isinstance(v, dict) else i
+            yield from _flatten(v, f"{prefix}{key}.")
+    elif isinstance(node, (int, float)) and not isinstance(node, bool):
+        yield prefix[:-1], node
+
+
+def compare(current, baseline_path):
+    """列出與舊結果相比變化超過 5% 的指標"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = dict(_flatten(json.load(f)["results"]))
+    print(f"\n📊 與 {baseline_path} 比較 (變化 > 5%)：")
+    for key, value in _flatten(current["results"]):
+        old = baseline.get(key)
+        if old and abs(value - old) / abs(old) > 0.05:
+            print(f"    {'🔺' if value > old else '🔻'} {key}: {old} → {value} ({(value - old) / old * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LITV 更新流程效能基準")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="合成 TWTV 的線路數，逗號分隔")
+    parser.add_argument("--captures", type=int, default=DEFAULT_CAPTURES, help="fetch_stream 抓取次數")
+    parser.add_argument("--skip-browser", action="store_true", help="不量測瀏覽器啟動與抓取")
+    parser.add_argument("--output", help="結果 JSON 路徑 (預設 logs/benchmark/<時間>.json)")
+    parser.add_argument("--baseline", help="與舊的結果 JSON 比較")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    workdir = tempfile.mkdtemp(prefix="litv-bench-")
+    metrics.METRICS_LOG_PATH = os.path.join(workdir, "metrics.jsonl")  # 不污染正式的分段計時紀錄
+    server, base_url = start_fixture_server()
+    print(f"🧪 假站：{base_url}，工作目錄：{workdir}")
+
+    results = {}
+    try:
+        print("\n📑 合併吞吐量")
+        results["merge"] = bench_merge(workdir, sizes)
+        print("\n🏅 線路排序")
+        results["rank"] = bench_rank(base_url)
+        if not args.skip_browser:
+            print("\n🌐 瀏覽器抓取")
+            results["browser"] = bench_browser(base_url, workdir, args.captures)
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "time": f"{datetime.now():%Y-%m-%d %H:%M:%S}",
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 結果已寫入 {output}")
+
+    if args.baseline:
+        compare(report, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+browser_pool.py
+--------------------------------------------
+常駐瀏覽器池：Chrome (含 selenium-wire 代理) 只啟動一次，
+之後每個頻道開新分頁抓取，跨頻道、跨排程重複使用。
+達到抓取次數上限或記憶體過高時才回收重啟。
+精簡模式 (LEAN_CAPTURE) 下，圖片、字型、影音片段與廣告網域一律在瀏覽器內攔截，
+只放行 HTML / JS / XHR 與 .m3u8。
+selenium-wire (mitmproxy) 與 ChromeDriver 檢查都延後到第一次啟動瀏覽器時才載入。
+"""
+
+import queue
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import metrics
+from browser_supervisor import SUPERVISOR, CAPTURE_WALL_SECONDS
+from driver_setup import ensure_chromedriver
+
+# ====== 配置設定 ======
+MAX_CAPTURES_PER_BROWSER = 30  # 每個瀏覽器最多抓取幾次後重啟
+MAX_BROWSER_RSS_MB = 1500  # 瀏覽器程序樹記憶體上限 (MB)，超過即回收
+PAGE_LOAD_TIMEOUT = 30
+LEAN_CAPTURE = True  # 精簡模式：攔截圖片 / 字型 / 影音片段 / 廣告，降低記憶體與頻寬
+
+# 精簡模式下攔截的資源 (Chrome DevTools Network.setBlockedURLs 萬用字元格式)
+BLOCK_PATTERNS = {
+    "images": ["*.png", "*.png?*", "*.jpg", "*.jpg?*", "*.jpeg*", "*.gif*", "*.webp*", "*.svg", "*.svg?*",
+               "*.ico", "*.ico?*"],
+    "fonts": ["*.woff", "*.woff?*", "*.woff2*", "*.ttf*", "*.otf*", "*.eot*"],
+    "media": ["*.ts", "*.ts?*", "*.m4s*", "*.aac*", "*.mp4", "*.mp4?*", "*.m4a*", "*.m4v*", "*.webm*"],
+    "ads": ["*doubleclick.net*", "*googlesyndication.com*", "*googleadservices.com*", "*google-analytics.com*",
+            "*googletagmanager.com*", "*adservice.google.*", "*facebook.net*", "*connect.facebook.*",
+            "*scorecardresearch.com*", "*imasdk.googleapis.com*"],
+}
+
+# 各網站的額外規則：allow 從預設攔截清單中移除，deny 追加攔截 (以頁面網址的主機比對)
+SITE_RULES = {
+    "ofiii.com": {"allow": [], "deny": []},
+}
+
+DEFAULT_USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                      "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+
+# Selenium Wire 特定設定：排除不必要的請求以加速
+DEFAULT_SELENIUMWIRE_OPTIONS = {
+    'exclude_hosts': ['google-analytics.com', 'facebook.com', 'doubleclick.net'],
+    'disable_capture': False  # 確保開啟抓包
+}
+
+
+def blocked_patterns(page_url):
+    """依頁面所在網站組出要攔截的網址樣式"""
+    host = urlparse(page_url).hostname or ""
+    patterns = [p for group in BLOCK_PATTERNS.values() for p in group]
+    for site, rule in SITE_RULES.items():
+        if host == site or host.endswith("." + site):
+            patterns = [p for p in patterns if p not in rule.get("allow", [])]
+            patterns += [p for p in rule.get("deny", []) if p not in patterns]
+    return patterns
+
+
+def default_chrome_options():
+    """無頭 Chrome 的預設參數"""
+    from seleniumwire import webdriver  # 需安裝 selenium-wire
+
+    options = webdriver.ChromeOptions()
+    # 隱匿模式與效能設定
+    options.add_argument("--headless=new")  # 新版無頭模式
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--mute-audio")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--ignore-certificate-errors")  # 忽略 SSL 錯誤 (重要)
+    options.add_argument("--allow-running-insecure-content")
+    # 偽裝 User-Agent
+    options.add_argument(f"--user-agent={DEFAULT_USER_AGENT}")
+    if LEAN_CAPTURE:
+        # 不載入圖片與遠端字型 (其餘資源由 Network.setBlockedURLs 攔截)
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_argument("--disable-remote-fonts")
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    return options
+
+
+class BrowserSession:
+    """單一常駐 Chrome；consent 彈窗每個網站在每個 session 只需處理一次"""
+
+    def __init__(self, options_factory=default_chrome_options, seleniumwire_options=None,
+                 max_captures=MAX_CAPTURES_PER_BROWSER, max_rss_mb=MAX_BROWSER_RSS_MB, lean=LEAN_CAPTURE,
+                 supervisor=SUPERVISOR):
+        self.options_factory = options_factory
+        self.seleniumwire_options = (DEFAULT_SELENIUMWIRE_OPTIONS if seleniumwire_options is None
+                                     else seleniumwire_options)
+        self.max_captures = max_captures
+        self.max_rss_mb = max_rss_mb
+        self.lean = lean
+        self.supervisor = supervisor
+        self.key = f"session-{id(self)}"
+        self.driver = None
+        self.captures = 0
+        self.consented = set()  # 已處理同意條款的網站 (外掛名稱)
+        self.broken = False
+
+    def start(self):
+        from seleniumwire import webdriver
+
+        ensure_chromedriver()
+        print("    🌐 啟動常駐瀏覽器...")
+        with metrics.span("browser_start"):
+            self.driver = webdriver.Chrome(options=self.options_factory(),
+                                           seleniumwire_options=dict(self.seleniumwire_options))
+        try:
+            self.supervisor.track(self.key, self.driver.service.process.pid)
+        except AttributeError:
+            pass
+        self.driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        self.captures = 0
+        self.consented = set()
+        self.broken = False
+
+    def open(self, url, before_load=None):
+        """清空已攔截的請求，於全新分頁載入 url，並關閉舊分頁
+
+        before_load(driver) 於載入前呼叫，可用來掛上攔截器
+        """
+        if self.driver is None:
+            self.start()
+        driver = self.driver
+        if before_load:
+            before_load(driver)
+        del driver.requests  # 清除上一次抓取留下的封包
+        old_handles = list(driver.window_handles)
+        driver.switch_to.new_window("tab")
+        new_handle = driver.current_window_handle
+        for handle in old_handles:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(new_handle)
+        if self.lean:
+            self._block_resources(url)
+        self.captures += 1
+        with metrics.span("page_load"):
+            driver.get(url)
+        return driver
+
+    def _block_resources(self, url):
+        """於目前分頁啟用資源攔截 (在瀏覽器內就擋下，不經過 selenium-wire 代理)"""
+        try:
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked_patterns(url)})
+        except Exception as e:
+            print(f"    ⚠️ 無法啟用資源攔截: {e}")
+
+    def rss_mb(self):
+        """chromedriver 與其所有子程序 (Chrome) 的總記憶體 (MB)"""
+        return self.supervisor.rss_mb(self.key)
+
+    def needs_recycle(self):
+        if self.driver is None:
+            return False
+        if self.broken or self.captures >= self.max_captures:
+            return True
+        return self.rss_mb() > self.max_rss_mb
+
+    def quit(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception as e:
+                print(f"    ⚠️ 關閉瀏覽器異常: {e}")
+            # driver.quit() 失敗或卡住時殘留的 chromedriver / Chrome 一律結束
+            self.supervisor.untrack(self.key)
+        self.driver = None
+
+
+class BrowserPool:
+    """最多 size 個常駐瀏覽器，以 with pool.session() as s: 借用"""
+
+    def __init__(self, size, **session_kwargs):
+        self.size = size
+        self.session_kwargs = session_kwargs
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()  # 優先使用最近用過的 (已暖機)
+        self._lock = threading.Lock()
+        self._all = []
+
+    @contextmanager
+    def session(self):
+        self._slots.acquire()
+        try:
+            sess = self._idle.get_nowait()
+        except queue.Empty:
+            sess = BrowserSession(**self.session_kwargs)
+            with self._lock:
+                self._all.append(sess)
+        try:
+            # 看門狗：借用期間超過牆鐘時間或記憶體上限即結束程序樹 (卡住的 driver.get 隨之失敗)
+            with sess.supervisor.watch(sess.key, CAPTURE_WALL_SECONDS, sess.max_rss_mb,
+                                       on_kill=lambda reason: setattr(sess, "broken", True)):
+                yield sess
+        except Exception:
+            sess.broken = True
+            raise
+        finally:
+            if sess.needs_recycle():
+                print(f"    ♻️ 回收瀏覽器 (已抓取 {sess.captures} 次)")
+                sess.quit()
+            self._idle.put(sess)
+            self._slots.release()
+
+    def close_all(self):
+        with self._lock:
+            sessions = list(self._all)
+        for sess in sessions:
+            sess.quit()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+browser_supervisor.py
+--------------------------------------------
+瀏覽器程序監管 (psutil)：
+- 記錄每個啟動的 chromedriver 與其 Chrome 程序樹 (cache/browser_pids_<pid>.json)
+- 看門狗：單次抓取超過牆鐘時間或程序樹記憶體超過上限時，直接結束整個程序樹
+  (卡在 driver.get 的抓取因此立即失敗，瀏覽器於歸還時回收)
+- 回收孤兒：啟動時與每次排程檢查，結束已不存在的舊程序留下的瀏覽器，
+  以及 chromedriver 已結束但仍殘留的 Chrome
+"""
+
+import os
+import glob
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+import psutil
+
+from atomic_io import atomic_write_text
+
+# ====== 配置設定 ======
+STATE_DIR = "cache"
+CAPTURE_WALL_SECONDS = 180  # 單次抓取 (借用瀏覽器期間，含頁面載入與等待串流) 的牆鐘時間上限
+WATCHDOG_INTERVAL = 2.0
+KILL_TIMEOUT = 5
+
+
+def _proc_key(proc):
+    return str(proc.pid), round(proc.create_time(), 2)
+
+
+def kill_tree(procs, timeout=KILL_TIMEOUT):
+    """先 terminate 再 kill，回傳實際結束的程序數"""
+    procs = [p for p in procs if p.is_running()]
+    for p in procs:
+        try:
+            p.terminate()
+        except psutil.Error:
+            pass
+    _, alive = psutil.wait_procs(procs, timeout=timeout)
+    for p in alive:
+        try:
+            p.kill()
+        except psutil.Error:
+            pass
+    return len(procs)
+
+
+def _alive(pid, create_time):
+    """pid 仍存在且是同一個程序 (排除 pid 被重複使用)"""
+    try:
+        proc = psutil.Process(int(pid))
+        if round(proc.create_time(), 2) == create_time:
+            return proc
+    except (psutil.Error, ValueError):
+        pass
+    return None
+
+
+class BrowserSupervisor:
+    """追蹤本程序啟動的瀏覽器程序樹，並以看門狗執行時間與記憶體上限"""
+
+    def __init__(self, state_dir=STATE_DIR, interval=WATCHDOG_INTERVAL):
+        self.state_dir = state_dir
+        self.state_path = os.path.join(state_dir, f"browser_pids_{os.getpid()}.json")
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._trees = {}  # key -> {pid: create_time} (root 與所有子程序)
+        self._roots = {}  # key -> root pid
+        self._watches = {}  # key -> (deadline, max_rss_mb, on_kill)
+        self._thread = None
+        self._dirty = False
+
+    # ---- 追蹤 ----
+    def _save(self):
+        data = {"owner": os.getpid(), "owner_started": round(psutil.Process().create_time(), 2),
+                "trees": {k: tree for k, tree in self._trees.items()}}
+        try:
+            atomic_write_text(self.state_path, json.dumps(data, indent=2))
+        except OSError:
+            pass
+
+    def _refresh(self, key):
+        """把 root 目前的子程序併入追蹤清單 (Chrome 的子程序會陸續產生)"""
+        root = self._roots.get(key)
+        tree = self._trees.get(key)
+        if root is None or tree is None:
+            return []
+        procs = []
+        try:
+            root_proc = psutil.Process(root)
+            if str(root) in tree and round(root_proc.create_time(), 2) != tree[str(root)]:
+                root_proc = None  # pid 已被其他程序重複使用
+            if root_proc is not None:
+                procs = [root_proc] + root_proc.children(recursive=True)
+        except psutil.Error:
+            pass
+        for p in procs:
+            try:
+                pid, created = _proc_key(p)
+                if pid not in tree:
+                    tree[pid] = created
+                    self._dirty = True
+            except psutil.Error:
+                continue
+        return [p for p in (_alive(pid, created) for pid, created in tree.items()) if p]
+
+    def track(self, key, pid):
+        """登記一個新啟動的瀏覽器 (通常是 chromedriver 的 pid)"""
+        with self._lock:
+            self._roots[key] = pid
+            self._trees[key] = {}
+            self._refresh(key)
+            self._save()
+
+    def untrack(self, key):
+        """瀏覽器已關閉：結束仍殘留的程序並移除紀錄"""
+        with self._lock:
+            procs = self._refresh(key)
+            self._trees.pop(key, None)
+            self._roots.pop(key, None)
+            self._watches.pop(key, None)
+            self._save()
+        if procs:
+            killed = kill_tree(procs)
+            if killed:
+                print(f"    🧹 結束 {killed} 個殘留的瀏覽器程序")
+
+    def rss_mb(self, key):
+        with self._lock:
+            procs = self._refresh(key)
+        total = 0
+        for p in procs:
+            try:
+                total += p.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+
+    # ---- 看門狗 ----
+    @contextmanager
+    def watch(self, key, wall_seconds=CAPTURE_WALL_SECONDS, max_rss_mb=None, on_kill=None):
+        """with 區塊期間限制牆鐘時間與記憶體；超過時結束程序樹並呼叫 on_kill(reason)"""
+        with self._lock:
+            self._watches[key] = (time.monotonic() + wall_seconds, max_rss_mb, on_kill)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._watchdog, name="browser-watchdog", daemon=True)
+                self._thread.start()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._watches.pop(key, None)
+
+    def _watchdog(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                watches = list(self._watches.items())
+                if self._dirty:  # 新產生的子程序也寫入紀錄，當機後才能一併回收
+                    self._dirty = False
+                    self._save()
+            for key, (deadline, max_rss_mb, on_kill) in watches:
+                reason = None
+                if time.monotonic() > deadline:
+                    reason = "抓取逾時"
+                elif max_rss_mb and self.rss_mb(key) > max_rss_mb:
+                    reason = f"記憶體超過 {max_rss_mb} MB"
+                if reason is None:
+                    continue
+                with self._lock:
+                    procs = self._refresh(key)
+                    self._watches.pop(key, None)
+                print(f"    🪓 看門狗：{reason}，結束瀏覽器程序樹 ({len(procs)} 個程序)")
+                kill_tree(procs)
+                if on_kill is not None:
+                    on_kill(reason)
+
+    # ---- 孤兒回收 ----
+    def reap_orphans(self):
+        """結束已終止的舊程序留下的瀏覽器，以及本程序中 chromedriver 已結束的殘留 Chrome"""
+        orphans = []
+        for path in glob.glob(os.path.join(self.state_dir, "browser_pids_*.json")):
+            if os.path.abspath(path) == os.path.abspath(self.state_path):
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if _alive(data.get("owner", 0), data.get("owner_started")):
+                continue  # 另一個仍在執行的實例
+            for tree in data.get("trees", {}).values():
+                orphans += [p for p in (_alive(pid, created) for pid, created in tree.items()) if p]
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+        with self._lock:
+            for key, root in list(self._roots.items()):
+                if _alive(root, self._trees[key].get(str(root))) is None:
+                    orphans += self._refresh(key)
+
+        if orphans:
+            killed = kill_tree(orphans)
+            print(f"    🧹 回收 {killed} 個孤兒瀏覽器程序")
+        return len(orphans)
+
+
+SUPERVISOR = BrowserSupervisor()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+capture_cache.py
+--------------------------------------------
+抓取結果快取 (cache/capture_cache.json，不納入 git)：
+每個頻道記錄解析出的線路、抓取時間與到期時間。
+到期時間取自簽章網址的參數 (expires / exp / hdnts 等)，
+取不到時使用預設 TTL，並以 HEAD 檢測確認線路仍有效。
+排程只重新抓取即將到期或已失效的頻道。
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from urllib.parse import urlparse, parse_qsl, unquote
+
+import requests
+
+from atomic_io import atomic_write_text
+
+# ====== 配置設定 ======
+CACHE_PATH = os.path.join("cache", "capture_cache.json")
+DEFAULT_TTL = 2 * 3600  # 網址內沒有到期資訊時的預設有效時間 (秒)
+REFRESH_MARGIN = 20 * 60  # 距離到期不到此秒數即重新抓取 (需大於排程間隔)
+HEAD_TIMEOUT = 6
+
+EXPIRY_KEYS = ("expires", "expire", "expiry", "exp", "e", "validto", "deadline", "wstime")
+TIMESTAMP_RE = re.compile(r"(?<!\d)(1[6-9]\d{8})(?!\d)")  # 2020 ~ 2033 年的 unix 秒數
+
+
+def _as_timestamp(value, now):
+    try:
+        ts = int(float(value))
+    except (TypeError, ValueError):
+        return None
+    if ts > 10 ** 12:  # 毫秒
+        ts //= 1000
+    # 合理範圍：過去一天 ~ 未來 30 天
+    if now - 86400 <= ts <= now + 30 * 86400:
+        return ts
+    return None
+
+
+def parse_expiry(url, now=None):
+    """從簽章網址解析到期時間 (unix 秒)，無法判斷回傳 None"""
+    now = now or time.time()
+    params = parse_qsl(urlparse(url).query, keep_blank_values=True)
+
+    for key, value in params:
+        if key.lower() in EXPIRY_KEYS:
+            ts = _as_timestamp(value, now)
+            if ts:
+                return ts
+        # Akamai 風格：hdnts=exp=1700000000~acl=...
+        if key.lower() in ("hdnts", "hdnea", "__token__"):
+            m = re.search(r"exp=(\d+)", value)
+            if m and _as_timestamp(m.group(1), now):
+                return _as_timestamp(m.group(1), now)
+
+    # 最後手段：token 內夾帶的時間戳 (例如 token=...%3A1765423896%3A...)
+    for _, value in params:
+        for m in TIMESTAMP_RE.finditer(unquote(value)):
+            ts = _as_timestamp(m.group(1), now)
+            if ts and ts > now - 3600:
+                return ts
+    return None
+
+
+def head_ok(url):
+    """HEAD 檢測線路是否仍有效 (部分伺服器不支援 HEAD，改用 GET 只讀表頭)"""
+    try:
+        r = requests.head(url, timeout=HEAD_TIMEOUT, allow_redirects=True)
+        if r.status_code in (405, 501):
+            r = requests.get(url, timeout=HEAD_TIMEOUT, stream=True)
+            r.close()
+        return r.status_code < 400
+    except requests.RequestException:
+        return False
+
+
+class CaptureCache:
+    """以頻道為 key 的持久化快取"""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        self.load()
+
+    @staticmethod
+    def key(group, channel):
+        return f"{group}/{channel}"
+
+    def load(self):
+        """從磁碟重新讀取 (常駐服務每輪開始時呼叫，納入單次指令寫入的結果)"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+        with self._lock:
+            self.entries = entries
+
+    def save(self):
+        with self._lock:
+            data = json.dumps(self.entries, ensure_ascii=False, indent=2)
+        atomic_write_text(self.path, data)
+
+    def get(self, group, channel):
+        with self._lock:
+            return self.entries.get(self.key(group, channel))
+
+    def put(self, group, channel, urls, tier=None):
+        now = time.time()
+        # 多條線路時以最早到期者為準
+        expiries = sorted(e for e in (parse_expiry(u, now) for u in urls) if e)
+        with self._lock:
+            old = self.entries.get(self.key(group, channel), {})
+            # 主線路沒變時保留首次出現時間，用來估算網址實際壽命
+            same_primary = bool(urls) and old.get("urls", [None])[0] == urls[0]
+            first_seen = old.get("first_seen", now) if same_primary else now
+            self.entries[self.key(group, channel)] = {
+                "urls": list(urls),
+                "captured_at": now,
+                "expires_at": expiries[0] if expiries else now + DEFAULT_TTL,
+                "expiry_source": "url" if expiries else "default",
+                "tier": tier,
+                "failures": 0,
+                "first_seen": first_seen,
+            }
+
+    def mark_failed(self, group, channel):
+        with self._lock:
+            entry = self.entries.get(self.key(group, channel))
+            if entry:
+                entry["failures"] = entry.get("failures", 0) + 1
+
+    def invalidate(self, group, channel):
+        """線路檢測判定失效：即使 HEAD 仍成功 (playlist 可讀但片段已失效) 也強制重抓"""
+        with self._lock:
+            entry = self.entries.get(self.key(group, channel))
+            if entry:
+                entry["dead"] = True
+
+    def needs_refresh(self, group, channel, now=None, check_alive=True):
+        """沒有快取、即將到期、上次失敗或 HEAD 檢測失效 -> 需要重新抓取"""
+        now = now or time.time()
+        entry = self.get(group, channel)
+        if not entry or not entry.get("urls") or entry.get("failures") or entry.get("dead"):
+            return True
+        if entry["expires_at"] - now < REFRESH_MARGIN:
+            return True
+        if check_alive and not head_ok(entry["urls"][0]):
+            print(f"    ⚠️ [{channel}] 快取線路已失效")
+            return True
+        return False
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+cdp_capture.py
+--------------------------------------------
+不經 MITM 代理的抓取後端：以 asyncio 直接透過 Chrome DevTools Protocol 驅動無頭 Chrome。
+- 訂閱 Network.responseReceived / loadingFinished，在程序內過濾 .m3u8，不解密任何 TLS 流量
+- 一個瀏覽器、一條 WebSocket，多個分頁以 flatten session 多工 (CDP_MAX_TABS 同時抓取)
+- CDPCaptureEngine.capture() 為同步介面，可直接替換 fetch_stream 內的 selenium-wire 流程
+- Chrome 程序樹登記於 browser_supervisor (當機後可回收孤兒)，閒置時記憶體超過上限即重啟；
+  異常結束留下的暫存設定檔目錄於下次啟動時清除
+"""
+
+import os
+import glob
+import json
+import time
+import base64
+import shutil
+import asyncio
+import tempfile
+import threading
+import subprocess
+
+import psutil
+import websockets  # pip install websockets
+
+from browser_pool import DEFAULT_USER_AGENT, LEAN_CAPTURE, MAX_BROWSER_RSS_MB, blocked_patterns
+from browser_supervisor import SUPERVISOR
+from m3u8_watch import SETTLE_SECONDS, is_main_stream, parse_variant_uris
+
+# ====== 配置設定 ======
+CHROME_PATH = None  # None 表示自動尋找
+CHROME_CANDIDATES = [
+    "google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome",
+    r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+    r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
+]
+CDP_MAX_TABS = 8  # 同一個瀏覽器同時抓取的分頁數
+CDP_COMMAND_TIMEOUT = 30
+STARTUP_TIMEOUT = 20
+CLICK_INTERVAL = 1.5  # 尚未捕捉到串流前，每隔幾秒嘗試點擊同意 / 播放按鈕
+CONSENT_TEXTS = ["我同意", "確定"]
+PROFILE_PREFIX = "cdp-capture-"  # 暫存設定檔目錄：<prefix><擁有者 pid>-xxxx
+
+PLAY_SELECTORS = ["button.vjs-big-play-button", ".play-icon", "button[class*='play']"]
+
+_CLICK_TEMPLATE = """
+(() => {
+  const clicked = [];
+  for (const text of %s) {
+    const el = [...document.querySelectorAll('button, a, div, span')]
+      .find(e => e.children.length === 0 && e.textContent.trim().includes(text));
+    if (el) { el.click(); clicked.push(text); }
+  }
+  const selector = %s;
+  const play = selector && document.querySelector(selector);
+  if (play) { play.click(); clicked.push('play'); }
+  return clicked;
+})()
+"""
+
+
+def click_script(consent_texts=CONSENT_TEXTS, play_selectors=PLAY_SELECTORS):
+    """點擊同意條款與播放按鈕的 JS (各網站外掛提供自己的文字與選擇器)"""
+    return _CLICK_TEMPLATE % (json.dumps(list(consent_texts), ensure_ascii=False),
+                              json.dumps(", ".join(play_selectors)))
+
+
+CLICK_JS = click_script()  # 與 selenium 版 fetch_stream 的 ofiii 選擇器相同
+
+
+def find_chrome():
+    if CHROME_PATH:
+        return CHROME_PATH
+    for name in CHROME_CANDIDATES:
+        path = shutil.which(name) or (name if os.path.isfile(name) else None)
+        if path:
+            return path
+    raise FileNotFoundError("找不到 Chrome，請設定 cdp_capture.CHROME_PATH")
+
+
+class _TabCapture:
+    """單一分頁的 .m3u8 收集 (邏輯與 m3u8_watch.M3U8Collector 相同，改以 CDP 事件驅動)"""
+
+    def __init__(self, browser, session_id, match):
+        self.browser = browser
+        self.session_id = session_id
+        self.match = match
+        self.urls = []
+        self.masters = {}
+        self.first_match_at = None
+        self._requests = {}  # requestId -> url (僅 .m3u8)
+        self._changed = asyncio.Event()
+
+    def on_event(self, method, params):
+        if method == "Network.responseReceived":
+            response = params["response"]
+            url = response["url"]
+            if ".m3u8" not in url or response.get("status") != 200:
+                return
+            self._requests[params["requestId"]] = url
+            if url not in self.urls:
+                self.urls.append(url)
+            if self.first_match_at is None and self.match(url):
+                self.first_match_at = time.monotonic()
+            self._changed.set()
+        elif method == "Network.loadingFinished" and params["requestId"] in self._requests:
+            url = self._requests.pop(params["requestId"])
+            asyncio.ensure_future(self._read_body(params["requestId"], url))
+
+    async def _read_body(self, request_id, url):
+        """讀取 .m3u8 內容，是 master playlist 則記錄其畫質列表"""
+        try:
+            result = await self.browser.send("Network.getResponseBody", {"requestId": request_id}, self.session_id)
+        except Exception:
+            return
+        body = result.get("body", "")
+        if result.get("base64Encoded"):
+            body = base64.b64decode(body).decode("utf-8", errors="ignore")
+        if "#EXT-X-STREAM-INF" in body:
+            self.masters[url] = parse_variant_uris(url, body)
+            self._changed.set()
+
+    def _complete(self):
+        if any(self.match(u) for u in self.masters):
+            return True
+        return (self.first_match_at is not None
+                and time.monotonic() - self.first_match_at >= SETTLE_SECONDS)
+
+    async def wait(self, timeout, on_idle=None):
+        """等待 master 與其畫質列表齊全 (或逾時)；尚未捕捉到串流時定期呼叫 on_idle() (點擊按鈕)"""
+        deadline = time.monotonic() + timeout
+        while not self._complete():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            step = SETTLE_SECONDS if self.first_match_at is not None else CLICK_INTERVAL
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), min(remaining, step))
+            except asyncio.TimeoutError:
+                if on_idle is not None and self.first_match_at is None:
+                    await on_idle()
+        return self.first_match_at is not None
+
+    def candidates(self):
+        ordered = []
+        for master, variants in self.masters.items():
+            ordered.append(master)
+            ordered.extend(variants)
+        ordered.extend(self.urls)
+        seen = set()
+        return [u for u in ordered if not (u in seen or seen.add(u))]
+
+
+def reap_profiles():
+    """刪除擁有者程序已不存在的暫存設定檔目錄 (當機或被強制結束時 close() 來不及清除)"""
+    for path in glob.glob(os.path.join(tempfile.gettempdir(), PROFILE_PREFIX + "*")):
+        owner = os.path.basename(path)[len(PROFILE_PREFIX):].split("-", 1)[0]
+        if owner.isdigit() and not psutil.pid_exists(int(owner)):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class CDPBrowser:
+    """一個無頭 Chrome 與其 DevTools WebSocket 連線 (需在同一個事件迴圈內使用)"""
+
+    def __init__(self, lean=LEAN_CAPTURE, supervisor=SUPERVISOR):
+        self.lean = lean
+        self.supervisor = supervisor
+        self.key = f"cdp-{id(self)}"
+        self.process = None
+        self.profile_dir = None
+        self.active = 0  # 進行中的抓取數
+        self._ws = None
+        self._reader = None
+        self._next_id = 0
+        self._pending = {}  # command id -> Future
+        self._listeners = {}  # sessionId -> callback(method, params)
+        self._tabs = asyncio.Semaphore(CDP_MAX_TABS)
+
+    async def start(self):
+        self.profile_dir = tempfile.mkdtemp(prefix=f"{PROFILE_PREFIX}{os.getpid()}-")
+        args = [
+            find_chrome(), "--headless=new", "--remote-debugging-port=0",
+            f"--user-data-dir={self.profile_dir}", "--no-first-run", "--no-default-browser-check",
+            "--disable-gpu", "--disable-dev-shm-usage", "--mute-audio", "--autoplay-policy=no-user-gesture-required",
+            f"--user-agent={DEFAULT_USER_AGENT}",
+        ]
+        if self.lean:
+            args += ["--blink-settings=imagesEnabled=false", "--disable-remote-fonts"]
+        self.process = subprocess.Popen(args + ["about:blank"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.supervisor.track(self.key, self.process.pid)
+
+        # Chrome 啟動後把實際埠號與瀏覽器端點寫入 DevToolsActivePort
+        port_file = os.path.join(self.profile_dir, "DevToolsActivePort")
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                with open(port_file, "r", encoding="utf-8") as f:
+                    port, path = f.read().split()[:2]
+                break
+            except (OSError, ValueError):
+                if time.monotonic() > deadline or self.process.poll() is not None:
+                    self.close()
+                    raise RuntimeError("Chrome DevTools 端點啟動逾時")
+                await asyncio.sleep(0.1)
+
+        self._ws = await websockets.connect(f"ws://127.0.0.1:{port}{path}", max_size=None)
+        self._reader = asyncio.ensure_future(self._read_loop())
+        print(f"    🧭 CDP 瀏覽器已啟動 (pid {self.process.pid})")
+
+    async def _read_loop(self):
+        try:
+            async for raw in self._ws:
+                message = json.loads(raw)
+                if "id" in message:
+                    future = self._pending.pop(message["id"], None)
+                    if future is None or future.done():
+                        continue
+                    if "error" in message:
+                        future.set_exception(RuntimeError(message["error"].get("message", "CDP error")))
+                    else:
+                        future.set_result(message.get("result", {}))
+                else:
+                    listener = self._listeners.get(message.get("sessionId"))
+                    if listener is not None:
+                        listener(message.get("method"), message.get("params", {}))
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("CDP 連線已中斷"))
+            self._pending.clear()
+
+    async def send(self, method, params=None, session_id=None):
+        self._next_id += 1
+        message = {"id": self._next_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._next_id] = future
+        await self._ws.send(json.dumps(message))
+        return await asyncio.wait_for(future, CDP_COMMAND_TIMEOUT)
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None and self._reader and not self._reader.done()
+
+    def rss_mb(self):
+        return self.supervisor.rss_mb(self.key)
+
+    async def capture(self, url, match=is_main_stream, timeout=45, click_js=CLICK_JS):
+        """開新分頁載入 url，回傳捕捉到的 .m3u8 (master 與其畫質在前)"""
+        self.active += 1
+        try:
+            return await self._capture_tab(url, match, timeout, click_js)
+        finally:
+            self.active -= 1
+
+    async def _capture_tab(self, url, match, timeout, click_js):
+        async with self._tabs:
+            target_id = (await self.send("Target.createTarget", {"url": "about:blank"}))["targetId"]
+            session_id = (await self.send("Target.attachToTarget",
+                                          {"targetId": target_id, "flatten": True}))["sessionId"]
+            tab = _TabCapture(self, session_id, match)
+            self._listeners[session_id] = tab.on_event
+
+            async def click():
+                try:
+                    await self.send("Runtime.evaluate", {"expression": click_js, "returnByValue": True}, session_id)
+                except Exception:
+                    pass
+
+            try:
+                await self.send("Network.enable", {}, session_id)
+                if self.lean:
+                    await self.send("Network.setBlockedURLs", {"urls": blocked_patterns(url)}, session_id)
+                await self.send("Page.navigate", {"url": url}, session_id)
+                await tab.wait(timeout, on_idle=click)
+                return tab.candidates()
+            finally:
+                self._listeners.pop(session_id, None)
+                try:
+                    await self.send("Target.closeTarget", {"targetId": target_id})
+                except Exception:
+                    pass
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+        # 連同 renderer / GPU 子程序整個程序樹一併結束，否則 Windows 上設定檔目錄仍被占用而無法刪除
+        self.supervisor.untrack(self.key)
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class CDPCaptureEngine:
+    """在背景執行緒上跑事件迴圈，供同步程式 (ThreadPoolExecutor worker) 呼叫"""
+
+    def __init__(self, lean=LEAN_CAPTURE, max_rss_mb=MAX_BROWSER_RSS_MB):
+        self.lean = lean
+        self.max_rss_mb = max_rss_mb
+        self._loop = None
+        self._browser = None
+        self._lock = threading.Lock()
+        self._start_lock = asyncio.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="cdp-capture", daemon=True).start()
+            return self._loop
+
+    async def _get_browser(self):
+        async with self._start_lock:  # 多個分頁同時抓取時只啟動一個瀏覽器
+            browser = self._browser
+            if browser is not None and not browser.alive:
+                browser.close()
+                browser = None
+            elif (browser is not None and self.max_rss_mb and browser.active == 0
+                    and browser.rss_mb() > self.max_rss_mb):
+                print(f"    ♻️ CDP 瀏覽器記憶體超過 {self.max_rss_mb} MB，重新啟動")
+                browser.close()
+                browser = None
+            if browser is None:
+                if self._browser is None:
+                    reap_profiles()  # 第一次啟動：清除先前異常結束留下的設定檔目錄
+                self._browser = CDPBrowser(self.lean)
+                await self._browser.start()
+            return self._browser
+
+    async def _capture(self, url, match, timeout, click_js):
+        browser = await self._get_browser()
+        return await browser.capture(url, match, timeout, click_js)
+
+    def capture(self, url, match=is_main_stream, timeout=45, click_js=CLICK_JS):
+        """同步抓取：回傳 .m3u8 列表 (可能為空)"""
+        future = asyncio.run_coroutine_threadsafe(self._capture(url, match, timeout, click_js), self._ensure_loop())
+        return future.result(timeout + CDP_COMMAND_TIMEOUT * 2)
+
+    def close(self):
+        if self._loop is None:
+            return
+        if self._browser is not None:
+            self._loop.call_soon_threadsafe(self._browser.close)
+        self._loop.call_soon_threadsafe(self._loop.stop)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+channel_registry.py
+--------------------------------------------
+頻道清單 (channels.json) 的載入器，所有抓取與合併入口共用：
+- 每個頻道：群組、名稱、網址、網站、抓取策略、優先順序、更新間隔提示
+- "defaults" 區塊提供共用預設值，頻道只需寫出不同的欄位
+- 依檔案 mtime 快取解析結果；import 本模組沒有任何副作用
+- shard="i/n" 以頻道鍵的穩定雜湊分片，多台主機各抓一部分
+"""
+
+import os
+import json
+import zlib
+import threading
+
+# ====== 配置設定 ======
+REGISTRY_PATH = "channels.json"
+STRATEGIES = ("tiered", "http", "browser")  # tiered: HTTP 優先、失敗才開瀏覽器
+
+_lock = threading.Lock()
+_cache = {}  # path -> ((mtime, size), [Channel])
+
+
+class Channel:
+    """頻道清單中的一個頻道"""
+
+    __slots__ = ("group", "name", "url", "site", "strategy", "priority", "min_interval", "max_interval")
+
+    def __init__(self, group, name, url, site="ofiii", strategy="tiered", priority=100,
+                 min_interval=None, max_interval=None):
+        self.group = group
+        self.name = name
+        self.url = url
+        self.site = site
+        self.strategy = strategy
+        self.priority = priority
+        self.min_interval = min_interval  # 秒；None 表示使用排程器預設
+        self.max_interval = max_interval
+
+    @property
+    def key(self):
+        return f"{self.group}/{self.name}"
+
+    @classmethod
+    def from_dict(cls, data, defaults=None):
+        merged = {**(defaults or {}), **data}
+        refresh = {**(defaults or {}).get("refresh", {}), **data.get("refresh", {})}
+        for field in ("group", "name", "url"):
+            if not merged.get(field):
+                raise ValueError(f"頻道設定缺少 {field}: {data}")
+        strategy = merged.get("strategy", "tiered")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"[{merged['name']}] 不支援的抓取策略: {strategy}")
+        return cls(
+            merged["group"], merged["name"], merged["url"],
+            site=merged.get("site", "ofiii"),
+            strategy=strategy,
+            priority=int(merged.get("priority", 100)),
+            min_interval=refresh["min_minutes"] * 60 if "min_minutes" in refresh else None,
+            max_interval=refresh["max_minutes"] * 60 if "max_minutes" in refresh else None,
+        )
+
+    def __repr__(self):
+        return f"Channel({self.key!r}, {self.url!r}, strategy={self.strategy!r})"
+
+
+def _parse(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    defaults = data.get("defaults", {})
+    channels, seen = [], set()
+    for item in data.get("channels", []):
+        channel = Channel.from_dict(item, defaults)
+        if channel.key in seen:
+            raise ValueError(f"頻道重複: {channel.key}")
+        seen.add(channel.key)
+        channels.append(channel)
+    # 優先順序小的先抓；同優先順序保持檔案內順序
+    channels.sort(key=lambda c: c.priority)
+    return channels
+
+
+def _in_shard(channel, shard):
+    index, _, count = shard.partition("/")
+    return zlib.crc32(channel.key.encode("utf-8")) % int(count) == int(index)
+
+
+def load_channels(path=REGISTRY_PATH, group=None, site=None, shard=None):
+    """回傳 [Channel]，可依群組、網站與分片 ("i/n") 過濾；檔案未變更時不重新解析"""
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _cache.get(path)
+        if cached is None or cached[0] != stamp:
+            cached = _cache[path] = (stamp, _parse(path))
+    channels = list(cached[1])
+    if group is not None:
+        channels = [c for c in channels if c.group == group]
+    if site is not None:
+        channels = [c for c in channels if c.site == site]
+    if shard:
+        channels = [c for c in channels if _in_shard(c, shard)]
+    return channels
+
+
+def channel_groups(path=REGISTRY_PATH, **filters):
+    """{group: {name: url}}"""
+    groups = {}
+    for c in load_channels(path, **filters):
+        groups.setdefault(c.group, {})[c.name] = c.url
+    return groups
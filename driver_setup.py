@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+driver_setup.py
+--------------------------------------------
+ChromeDriver 版本檢查 (第一次啟動瀏覽器時才執行，import 沒有任何副作用)：
+- chromedriver_autoinstaller.install() 每次都會連網比對版本，耗時數秒
+- 檢查結果依已安裝的 Chrome 版本快取於 cache/chromedriver.json，
+  Chrome 版本未變、driver 檔案仍在且未超過 TTL 時直接沿用，只把 driver 目錄加入 PATH
+- 同一個程序只檢查一次
+"""
+
+import os
+import json
+import time
+import threading
+
+from atomic_io import atomic_write_text
+
+# ====== 配置設定 ======
+STATE_PATH = os.path.join("cache", "chromedriver.json")
+CHECK_TTL = 7 * 24 * 3600  # Chrome 版本不變時，多久重新連網檢查一次 driver (秒)
+
+_lock = threading.Lock()
+_driver_path = None
+
+
+def _load(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _add_to_path(driver_path):
+    directory = os.path.dirname(driver_path)
+    if directory not in os.environ.get("PATH", "").split(os.pathsep):
+        os.environ["PATH"] = directory + os.pathsep + os.environ.get("PATH", "")
+
+
+def ensure_chromedriver(path=STATE_PATH, ttl=CHECK_TTL):
+    """確保 PATH 上有與已安裝 Chrome 相符的 chromedriver，回傳其路徑 (失敗回傳 None)"""
+    global _driver_path
+    with _lock:
+        if _driver_path is not None:
+            return _driver_path
+
+        import chromedriver_autoinstaller
+
+        chrome_version = chromedriver_autoinstaller.get_chrome_version()
+        state = _load(path)
+        cached = state.get("driver_path")
+        if (cached and os.path.exists(cached) and state.get("chrome_version") == chrome_version
+                and time.time() - state.get("checked_at", 0) < ttl):
+            _add_to_path(cached)
+            _driver_path = cached
+            return cached
+
+        print("🔧 正在檢查 ChromeDriver...")
+        driver_path = chromedriver_autoinstaller.install()
+        if not driver_path:
+            print("⚠️ ChromeDriver 檢查失敗，改用 PATH 上現有的版本")
+            return None
+        try:
+            atomic_write_text(path, json.dumps({"chrome_version": chrome_version, "driver_path": driver_path,
+                                                "checked_at": time.time()}, indent=2))
+        except OSError:
+            pass
+        _driver_path = driver_path
+        return driver_path
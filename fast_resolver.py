@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fast_resolver.py
+--------------------------------------------
+免瀏覽器快速解析 (第一層)：
+以共用連線池的 requests.Session 讀取 ofiii 頻道頁 (含內嵌 JSON)，
+直接找出主 .m3u8；找不到、或找到的 .m3u8 都讀不到 #EXTM3U 時才交給 Selenium 抓取 (第二層)。
+每個頻道使用哪一層與耗時都會記錄下來。
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from atomic_io import atomic_open
+from hls_ranker import rank_and_verify
+
+# ====== 配置設定 ======
+HTTP_TIMEOUT = 10
+STATS_PATH = os.path.join("logs", "resolver_stats.json")
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+
+CHANNEL_ID_RE = re.compile(r"litv-longturn\d+")
+M3U8_RE = re.compile(r"https?://[^\s\"'<>\\]+?\.m3u8(?:\?[^\s\"'<>\\]*)?")
+NEXT_DATA_RE = re.compile(r'<script[^>]+id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
+
+_local = threading.local()
+
+
+def get_session():
+    """每個執行緒一個 Session，底層連線池重複使用 (keep-alive)"""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=1)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({"User-Agent": USER_AGENT})
+        _local.session = session
+    return session
+
+
+def _unescape(text):
+    """還原 JSON / JS 字串裡常見的跳脫 (\\/ 與 \\u002F)"""
+    return text.replace("\\u002F", "/").replace("\\u002f", "/").replace("\\/", "/")
+
+
+def _walk_json(node):
+    """遞迴取出 JSON 內所有字串值"""
+    if isinstance(node, dict):
+        for v in node.values():
+            yield from _walk_json(v)
+    elif isinstance(node, list):
+        for v in node:
+            yield from _walk_json(v)
+    elif isinstance(node, str):
+        yield node
+
+
+def extract_m3u8(text):
+    """從 HTML / JSON 內容取出所有 .m3u8 (保持出現順序、去重)"""
+    found = []
+    sources = [_unescape(text)]
+    m = NEXT_DATA_RE.search(text)
+    if m:
+        try:
+            sources.extend(_walk_json(json.loads(m.group(1))))
+        except ValueError:
+            pass
+    for src in sources:
+        for u in M3U8_RE.findall(src):
+            if u not in found:
+                found.append(u)
+    # master playlist 優先
+    return sorted(found, key=lambda u: "master" not in u)
+
+
+def fetch_text(url):
+    """以共用 Session 取得頁面內容，非 200 或連線失敗回傳 None"""
+    try:
+        with metrics.span("http_resolve"):
+            r = get_session().get(url, timeout=HTTP_TIMEOUT)
+        if r.status_code != 200:
+            return None
+        return r.text
+    except requests.RequestException as e:
+        print(f"    ⚠️ 快速解析失敗: {e}")
+        return None
+
+
+def resolve(url):
+    """第一層：純 HTTP 解析 ofiii 頻道頁，回傳 .m3u8 列表 (可能為空)"""
+    if not CHANNEL_ID_RE.search(url):
+        return []
+    text = fetch_text(url)
+    return extract_m3u8(text) if text else []
+
+
+class TierStats:
+    """記錄每個頻道各層級的成功 / 失敗次數、累計耗時，以及最近一次使用的層級"""
+
+    def __init__(self, path=STATS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, channel, tier, elapsed, ok):
+        with self._lock:
+            s = self._stats.setdefault(channel, {"http": 0, "selenium": 0, "http_failed": 0, "selenium_failed": 0,
+                                                 "http_ms": 0.0, "selenium_ms": 0.0})
+            s[tier if ok else f"{tier}_failed"] += 1
+            s[f"{tier}_ms"] = round(s[f"{tier}_ms"] + elapsed * 1000, 1)  # 含失敗的嘗試 (第一層落空的成本)
+            s["last_tier"] = tier
+            s["last_ok"] = ok
+            s["last_ms"] = round(elapsed * 1000, 1)
+            s["last_time"] = f"{datetime.now():%Y-%m-%d %H:%M:%S}"
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(self._stats))
+
+    def save(self):
+        with atomic_open(self.path) as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+
+
+def resolve_tiered(channel, url, browser_fallback, stats=None, http_resolve=resolve):
+    """先試第一層 (http_resolve(url)，預設為 ofiii 頁面解析)，失敗才呼叫 browser_fallback() 走第二層 (Selenium)
+
+    第一層找到的 .m3u8 需至少一條實際讀到 #EXTM3U 才算成功 (頁面裡的舊網址、廣告或需簽章的網址不算)；
+    回傳 (tier, candidates)，第一層成功時 candidates 已依畫質排序
+    """
+    t0 = time.perf_counter()
+    found = http_resolve(url)
+    if not found:
+        print(f"[{channel}] ℹ️ 快速解析未找到 m3u8，改用瀏覽器")
+    else:
+        with metrics.span("collect_candidates"):
+            candidates, verified = rank_and_verify(found)
+        if verified:
+            if stats:
+                stats.record(channel, "http", time.perf_counter() - t0, True)
+            print(f"[{channel}] ⚡ 快速解析成功 ({(time.perf_counter() - t0) * 1000:.0f} ms)")
+            return "http", candidates
+        print(f"[{channel}] ⚠️ 快速解析找到 {len(found)} 條 m3u8 但皆無法讀取，改用瀏覽器")
+    if stats:
+        stats.record(channel, "http", time.perf_counter() - t0, False)
+
+    t1 = time.perf_counter()
+    candidates = browser_fallback()
+    if stats:
+        stats.record(channel, "selenium", time.perf_counter() - t1, bool(candidates))
+    return "selenium", candidates
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+hls_ranker.py
+--------------------------------------------
+依 HLS master playlist 的實際內容排序線路：
+讀取 #EXT-X-STREAM-INF 的 BANDWIDTH / RESOLUTION / CODECS，
+並以共用連線池同時確認各畫質是否可播放，
+讓「主線路」真正是可連線的最高畫質。
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ====== 配置設定 ======
+HTTP_TIMEOUT = 8
+MAX_FETCH_WORKERS = 8
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+# 畫質相同時的編碼偏好 (相容性由高到低)
+CODEC_PREFERENCE = ("avc1", "hvc1", "hev1", "av01")
+
+ATTR_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=8, pool_maxsize=MAX_FETCH_WORKERS * 2, max_retries=1)
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+_session.headers.update({"User-Agent": USER_AGENT})
+
+
+def parse_attributes(attr_text):
+    """解析 HLS 屬性列表 (引號內可含逗號)"""
+    return {k: v.strip('"') for k, v in ATTR_RE.findall(attr_text)}
+
+
+def parse_master(base_url, text):
+    """解析 master playlist，回傳各畫質 dict 列表"""
+    variants = []
+    pending = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-STREAM-INF:"):
+            pending = parse_attributes(line.split(":", 1)[1])
+        elif pending is not None and line and not line.startswith("#"):
+            width, height = 0, 0
+            if "x" in pending.get("RESOLUTION", ""):
+                try:
+                    width, height = (int(n) for n in pending["RESOLUTION"].split("x", 1))
+                except ValueError:
+                    pass
+            try:
+                bandwidth = int(pending.get("BANDWIDTH", 0))
+            except ValueError:
+                bandwidth = 0
+            variants.append({
+                "url": urljoin(base_url, line),
+                "bandwidth": bandwidth,
+                "width": width,
+                "height": height,
+                "codecs": pending.get("CODECS", ""),
+            })
+            pending = None
+    return variants
+
+
+def _codec_score(codecs):
+    for i, name in enumerate(CODEC_PREFERENCE):
+        if name in codecs:
+            return len(CODEC_PREFERENCE) - i
+    return 0
+
+
+def _fetch(url):
+    """讀取 playlist，回傳內容；無法連線或非 HLS 回傳 None"""
+    try:
+        r = _session.get(url, timeout=HTTP_TIMEOUT)
+        if r.status_code == 200 and "#EXTM3U" in r.text[:1024]:
+            return r.text
+    except requests.RequestException:
+        pass
+    return None
+
+
+def rank_streams(candidates):
+    """回傳排序後的線路：可連線的最高畫質在前，master 作為備援，其餘依原順序殿後"""
+    return rank_and_verify(candidates)[0]
+
+
+def rank_and_verify(candidates):
+    """同 rank_streams，另回傳是否至少有一條線路確實讀到 #EXTM3U：(ranked, verified)
+
+    verified 為 False 時 ranked 是未經確認的原列表，呼叫端可據此改走其他解析方式
+    """
+    candidates = list(dict.fromkeys(candidates))
+    if not candidates:
+        return [], False
+
+    with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as pool:
+        bodies = dict(zip(candidates, pool.map(_fetch, candidates)))
+
+        variants = {}
+        masters = []
+        for url, text in bodies.items():
+            if text and "#EXT-X-STREAM-INF" in text:
+                masters.append(url)
+                for v in parse_master(url, text):
+                    variants.setdefault(v["url"], v)
+
+        # 尚未讀取過的畫質網址再同時確認一次是否可播放
+        unchecked = [u for u in variants if u not in bodies]
+        bodies.update(zip(unchecked, pool.map(_fetch, unchecked)))
+
+    reachable = [v for u, v in variants.items() if bodies.get(u)]
+    reachable.sort(key=lambda v: (v["bandwidth"], v["width"] * v["height"], _codec_score(v["codecs"])),
+                   reverse=True)
+
+    ranked = [v["url"] for v in reachable]
+    ranked += [u for u in masters if u not in ranked]
+    # 直接捕捉到、但不在任何 master 內的 media playlist
+    ranked += [u for u in candidates if bodies.get(u) and u not in ranked]
+    # 全部無法確認時保留原列表，避免因網路暫時異常而清空
+    return (ranked, True) if ranked else (candidates, False)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+job_queue.py
+--------------------------------------------
+協調者 / 工作者模式的抓取工作佇列：
+- 佇列只有一份 SQLite，放在協調者本機磁碟 (SQLite 的檔案鎖在網路檔案系統上不可靠，不共享佇列檔)
+- 協調者把到期頻道放入佇列 (enqueue)，等待結果後自行合併與發布
+- 工作者以租約領取工作 (claim)，抓取期間定期續約 (renew)，完成後回報結果 (complete)
+- 其他主機上的工作者經由協調者的 HTTP 端點 (start_queue_server) 操作同一個佇列，
+  RemoteQueue 提供與 JobQueue 相同的 claim / renew / complete 介面；同一台主機上的工作者可直接開啟佇列檔
+- 工作者當機時租約到期，工作自動重新排入佇列；超過重試次數記為失敗
+- 協調者角色本身也是一個租約 (acquire_role)，同時只有一個實例能合併與 git push
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# ====== 配置設定 ======
+QUEUE_PATH = os.path.join("cache", "jobs.sqlite3")  # 協調者本機磁碟上的佇列檔
+JOURNAL_MODE = "WAL"  # 本機磁碟用 WAL (讀寫不互相阻塞)；不支援共享記憶體的環境 (部分容器掛載) 改用 "DELETE"
+LEASE_SECONDS = 120  # 工作租約長度，工作者每 1/3 租約續約一次
+MAX_ATTEMPTS = 3  # 租約到期 (工作者當機) 重新排入的次數上限
+QUEUE_HOST = "0.0.0.0"  # 佇列端點：其他主機上的工作者連線至此
+QUEUE_PORT = 8089
+QUEUE_TOKEN = None  # 設定後工作者需帶相同的 X-Queue-Token 標頭 (區網外可連線時建議設定)
+REMOTE_TIMEOUT = 15
+COMPLETE_RETRIES = 3  # 回報結果失敗時的重試次數 (仍失敗則等租約到期由其他工作者重抓)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key           TEXT PRIMARY KEY,
+    run_id        TEXT NOT NULL,
+    payload       TEXT NOT NULL,
+    priority      INTEGER NOT NULL DEFAULT 100,
+    status        TEXT NOT NULL DEFAULT 'pending',
+    owner         TEXT,
+    lease_expires REAL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    result        TEXT,
+    updated_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority, updated_at);
+CREATE TABLE IF NOT EXISTS roles (
+    name    TEXT PRIMARY KEY,
+    owner   TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+
+class JobQueue:
+    """以 SQLite 交易實作的租約式工作佇列 (每個頻道同時最多一筆工作)"""
+
+    def __init__(self, path=QUEUE_PATH, lease_seconds=LEASE_SECONDS, journal_mode=JOURNAL_MODE):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.journal_mode = journal_mode
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db().executescript(SCHEMA)
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _tx(self):
+        """BEGIN IMMEDIATE 交易：領取與續約在多個程序間互斥"""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    # ---- 協調者 ----
+    def enqueue(self, run_id, key, payload, priority=100):
+        """放入一筆工作；同頻道已有執行中的工作時保留原租約，只更新 run_id"""
+        now = time.time()
+        with self._tx() as db:
+            db.execute("""
+                INSERT INTO jobs (key, run_id, payload, priority, status, attempts, updated_at)
+                VALUES (?, ?, ?, ?, 'pending', 0, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    run_id = excluded.run_id, payload = excluded.payload, priority = excluded.priority,
+                    status = CASE WHEN jobs.status = 'leased' AND jobs.lease_expires > ? THEN 'leased'
+                                  ELSE 'pending' END,
+                    attempts = CASE WHEN jobs.status = 'leased' AND jobs.lease_expires > ? THEN jobs.attempts
+                                    ELSE 0 END,
+                    result = NULL, updated_at = excluded.updated_at
+            """, (key, run_id, json.dumps(payload, ensure_ascii=False), priority, now, now, now))
+
+    def results(self, run_id):
+        """回傳 (已完成 {key: result}, 尚未完成的數量)"""
+        self.requeue_expired()
+        done, remaining = {}, 0
+        for row in self._db().execute("SELECT key, status, result FROM jobs WHERE run_id = ?", (run_id,)):
+            if row["status"] in ("done", "failed"):
+                done[row["key"]] = json.loads(row["result"]) if row["result"] else None
+            else:
+                remaining += 1
+        return done, remaining
+
+    def requeue_expired(self):
+        """租約到期的工作重新排入；超過重試次數記為失敗"""
+        now = time.time()
+        with self._tx() as db:
+            db.execute("""
+                UPDATE jobs SET status = 'failed', owner = NULL, updated_at = ?
+                WHERE status = 'leased' AND lease_expires <= ? AND attempts >= ?
+            """, (now, now, MAX_ATTEMPTS))
+            cur = db.execute("""
+                UPDATE jobs SET status = 'pending', owner = NULL, updated_at = ?
+                WHERE status = 'leased' AND lease_expires <= ?
+            """, (now, now))
+            return cur.rowcount
+
+    def acquire_role(self, name, owner, ttl):
+        """取得或續約具名角色 (例如 "coordinator")；已被其他存活實例持有時回傳 False"""
+        now = time.time()
+        with self._tx() as db:
+            row = db.execute("SELECT owner, expires FROM roles WHERE name = ?", (name,)).fetchone()
+            if row and row["owner"] != owner and row["expires"] > now:
+                return False
+            db.execute("INSERT OR REPLACE INTO roles (name, owner, expires) VALUES (?, ?, ?)",
+                       (name, owner, now + ttl))
+            return True
+
+    def release_role(self, name, owner):
+        with self._tx() as db:
+            db.execute("DELETE FROM roles WHERE name = ? AND owner = ?", (name, owner))
+
+    # ---- 工作者 ----
+    def claim(self, owner):
+        """領取優先順序最高的待處理工作，回傳 (key, payload) 或 None"""
+        self.requeue_expired()
+        now = time.time()
+        with self._tx() as db:
+            row = db.execute("""
+                SELECT key, payload FROM jobs WHERE status = 'pending'
+                ORDER BY priority, updated_at LIMIT 1
+            """).fetchone()
+            if row is None:
+                return None
+            db.execute("""
+                UPDATE jobs SET status = 'leased', owner = ?, lease_expires = ?,
+                                attempts = attempts + 1, updated_at = ?
+                WHERE key = ?
+            """, (owner, now + self.lease_seconds, now, row["key"]))
+            return row["key"], json.loads(row["payload"])
+
+    def renew(self, key, owner):
+        """延長租約；工作已被重新指派 (租約曾到期) 時回傳 False"""
+        now = time.time()
+        with self._tx() as db:
+            cur = db.execute("""
+                UPDATE jobs SET lease_expires = ?, updated_at = ?
+                WHERE key = ? AND owner = ? AND status = 'leased'
+            """, (now + self.lease_seconds, now, key, owner))
+            return cur.rowcount == 1
+
+    def complete(self, key, owner, result, ok=True):
+        """回報結果；租約已被他人接手時忽略 (回傳 False)"""
+        with self._tx() as db:
+            cur = db.execute("""
+                UPDATE jobs SET status = ?, result = ?, owner = NULL, updated_at = ?
+                WHERE key = ? AND owner = ? AND status = 'leased'
+            """, ("done" if ok else "failed", json.dumps(result, ensure_ascii=False), time.time(), key, owner))
+            return cur.rowcount == 1
+
+
+class _QueueHandler(BaseHTTPRequestHandler):
+    """POST /claim、/renew、/complete (JSON)，對應 JobQueue 的工作者方法"""
+
+    queue = None  # start_queue_server() 設定
+    token = None
+
+    def do_POST(self):
+        if self.token and self.headers.get("X-Queue-Token") != self.token:
+            self.send_error(403)
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path == "/claim":
+                job = self.queue.claim(body["owner"])
+                reply = {"job": list(job) if job else None, "lease_seconds": self.queue.lease_seconds}
+            elif self.path == "/renew":
+                reply = {"ok": self.queue.renew(body["key"], body["owner"])}
+            elif self.path == "/complete":
+                reply = {"ok": self.queue.complete(body["key"], body["owner"], body.get("result"),
+                                                   ok=body.get("ok", True))}
+            else:
+                self.send_error(404)
+                return
+        except (ValueError, KeyError, TypeError):
+            self.send_error(400)
+            return
+        except sqlite3.Error as e:
+            self.send_error(503, str(e))
+            return
+        data = json.dumps(reply, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_queue_server(queue, host=QUEUE_HOST, port=QUEUE_PORT, token=QUEUE_TOKEN):
+    """協調者於背景執行緒啟動佇列端點，回傳 server (可呼叫 shutdown())"""
+    handler = type("QueueHandler", (_QueueHandler,), {"queue": queue, "token": token})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="job-queue", daemon=True).start()
+    print(f"📮 工作佇列端點：http://{host}:{server.server_port}")
+    return server
+
+
+class RemoteQueue:
+    """其他主機上的工作者使用：經由協調者的佇列端點領取、續約與回報工作 (介面同 JobQueue)
+
+    協調者暫時連不上時不擲出例外：claim 視為沒有工作、renew 視為仍持有租約
+    (真的被收回時 complete 會被協調者忽略)、complete 重試數次後放棄 (租約到期後由其他工作者重抓)。
+    """
+
+    def __init__(self, base_url, token=QUEUE_TOKEN, lease_seconds=LEASE_SECONDS):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.lease_seconds = lease_seconds  # 以協調者 claim 回應中的租約長度為準
+
+    def _post(self, route, **body):
+        headers = {"X-Queue-Token": self.token} if self.token else {}
+        r = requests.post(self.base_url + route, json=body, headers=headers, timeout=REMOTE_TIMEOUT)
+        r.raise_for_status()
+        return r.json()
+
+    def claim(self, owner):
+        try:
+            reply = self._post("/claim", owner=owner)
+        except (requests.RequestException, ValueError) as e:
+            print(f"    ⚠️ 無法連線協調者佇列: {e}")
+            return None
+        self.lease_seconds = reply.get("lease_seconds", self.lease_seconds)
+        return tuple(reply["job"]) if reply.get("job") else None
+
+    def renew(self, key, owner):
+        try:
+            return self._post("/renew", key=key, owner=owner)["ok"]
+        except (requests.RequestException, ValueError, KeyError) as e:
+            print(f"    ⚠️ [{key}] 續約失敗，稍後再試: {e}")
+            return True
+
+    def complete(self, key, owner, result, ok=True):
+        for attempt in range(COMPLETE_RETRIES):
+            try:
+                return self._post("/complete", key=key, owner=owner, result=result, ok=ok)["ok"]
+            except (requests.RequestException, ValueError, KeyError) as e:
+                print(f"    ⚠️ [{key}] 回報結果失敗 ({attempt + 1}/{COMPLETE_RETRIES}): {e}")
+                time.sleep(2 ** attempt)
+        return False
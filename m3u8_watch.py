@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+m3u8_watch.py
+--------------------------------------------
+事件驅動的 .m3u8 偵測：
+以 selenium-wire 的 response_interceptor 在回應抵達時即時推送，
+並以 scopes 限制只記錄 .m3u8，不再每秒複製掃描整個 driver.requests。
+收到 master playlist 並解析出其畫質列表後立即結束等待。
+"""
+
+import threading
+import time
+from urllib.parse import urljoin
+
+# ====== 配置設定 ======
+M3U8_SCOPE = r".*\.m3u8.*"
+SETTLE_SECONDS = 1.0  # 只收到 media playlist (無 master) 時，再等待 master 出現的時間
+
+
+def is_main_stream(url):
+    """過濾掉廣告或非主要串流 (簡單過濾)"""
+    return "litv" in url or "hls" in url or "manifest" in url
+
+
+def parse_variant_uris(base_url, text):
+    """取出 master playlist 中 #EXT-X-STREAM-INF 之後的各畫質網址"""
+    uris = []
+    expect_uri = False
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-STREAM-INF"):
+            expect_uri = True
+        elif expect_uri and line and not line.startswith("#"):
+            uris.append(urljoin(base_url, line))
+            expect_uri = False
+    return uris
+
+
+class M3U8Collector:
+    """掛在 driver 上，收集本次抓取看到的 .m3u8"""
+
+    def __init__(self, match=is_main_stream):
+        self.match = match
+        self._cond = threading.Condition()
+        self.urls = []  # 依抵達順序
+        self.masters = {}  # master url -> 其畫質網址列表
+        self.first_match_at = None
+
+    def attach(self, driver):
+        driver.scopes = [M3U8_SCOPE]
+        driver.response_interceptor = self._on_response
+
+    def detach(self, driver):
+        try:
+            del driver.response_interceptor
+            driver.scopes = []
+        except Exception:
+            pass
+
+    def _on_response(self, request, response):
+        """於 selenium-wire 代理執行緒內呼叫"""
+        from seleniumwire.utils import decode  # 已由 driver 載入，這裡不增加 import 成本
+
+        url = request.url
+        if ".m3u8" not in url or response.status_code != 200:
+            return
+        variants = None
+        try:
+            body = decode(response.body, response.headers.get("Content-Encoding", "identity"))
+            text = body.decode("utf-8", errors="ignore")
+            if "#EXT-X-STREAM-INF" in text:
+                variants = parse_variant_uris(url, text)
+        except Exception:
+            pass
+        with self._cond:
+            if url not in self.urls:
+                self.urls.append(url)
+            if variants is not None:
+                self.masters[url] = variants
+            if self.first_match_at is None and self.match(url):
+                self.first_match_at = time.monotonic()
+            self._cond.notify_all()
+
+    def _complete(self):
+        if any(self.match(u) for u in self.masters):
+            return True
+        return (self.first_match_at is not None
+                and time.monotonic() - self.first_match_at >= SETTLE_SECONDS)
+
+    def wait(self, timeout):
+        """等待直到 master 與其畫質列表齊全 (或逾時)，回傳是否捕捉到主要串流"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._complete():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if self.first_match_at is not None:
+                    remaining = min(remaining, SETTLE_SECONDS)
+                self._cond.wait(remaining)
+            return self.first_match_at is not None
+
+    def candidates(self):
+        """master 優先，接著其畫質列表，再加上其他看到的 .m3u8 (去重)"""
+        with self._cond:
+            ordered = []
+            for master, variants in self.masters.items():
+                ordered.append(master)
+                ordered.extend(variants)
+            ordered.extend(self.urls)
+        seen = set()
+        return [u for u in ordered if not (u in seen or seen.add(u))]
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+m3u_model.py
+--------------------------------------------
+M3U 解析模型與合併引擎：
+- 逐行解析為 M3UEntry (含屬性) 與原樣保留的註解 / 空行
+- 依 tvg-name 與 group-title 建立索引
+- upsert_group() 以「取代整個群組」的方式合併，重複執行結果相同 (冪等)；
+  只移除該群組自己的標題框與說明行，其他群組與上游的註解保持原樣
+- 以 generator 逐行輸出並串流寫入磁碟
+"""
+
+import re
+
+from atomic_io import atomic_open
+
+ATTR_RE = re.compile(r'([\w-]+)="([^"]*)"')
+# 舊版自動更新留下的說明行 (合併時一律清除，避免每次執行都多一段)
+AUTO_COMMENT_RE = re.compile(r"自動更新|自動新增|更新時間|更新頻道|保留頻道|合併時間|本次新增|Updated:")
+BANNER_RULE = "#" + "=" * 50
+OPTION_PREFIXES = ("#EXTVLCOPT", "#KODIPROP", "#EXTGRP")
+
+
+class M3UEntry:
+    """一條線路：#EXTINF 屬性、顯示名稱、網址與附屬選項行"""
+
+    __slots__ = ("duration", "attrs", "title", "url", "options", "raw")
+
+    def __init__(self, title, url, attrs=None, duration="-1", options=None, raw=None):
+        self.raw = raw  # 原始 #EXTINF 行；未修改屬性時原樣輸出
+        self.duration = duration
+        self.attrs = dict(attrs or {})
+        self.title = title
+        self.url = url
+        self.options = list(options or [])
+
+    @classmethod
+    def from_extinf(cls, extinf, url, options=None):
+        head, _, title = extinf.partition(",")
+        duration = head[len("#EXTINF:"):].split(" ", 1)[0] or "-1"
+        return cls(title.strip(), url.strip(), dict(ATTR_RE.findall(head)), duration, options, raw=extinf)
+
+    @property
+    def group(self):
+        return self.attrs.get("group-title", "")
+
+    @property
+    def name(self):
+        """頻道名稱：優先 tvg-name，其次顯示名稱 (去掉 [主線路] 等標記)"""
+        return self.attrs.get("tvg-name") or self.title.split(" [", 1)[0].strip()
+
+    def set_attr(self, key, value):
+        self.attrs[key] = value
+        self.raw = None
+
+    def extinf(self):
+        if self.raw is not None:
+            return self.raw
+        attrs = "".join(f' {k}="{v}"' for k, v in self.attrs.items())
+        return f"#EXTINF:{self.duration}{attrs},{self.title}"
+
+    def lines(self):
+        yield self.extinf()
+        yield from self.options
+        yield self.url
+
+
+class M3UPlaylist:
+    """items 依原順序保存 M3UEntry 與字串 (註解 / 空行 / 無 #EXTINF 的網址)"""
+
+    def __init__(self, header="#EXTM3U", items=None):
+        self.header = header
+        self.items = list(items or [])
+        self._by_name = None
+        self._by_group = None
+
+    @classmethod
+    def parse(cls, lines):
+        """逐行解析 (lines 可為檔案物件或任何可迭代的字串)"""
+        playlist = cls()
+        items = playlist.items
+        extinf, options = None, []
+        for raw in lines:
+            line = raw.rstrip("\r\n")
+            if line.startswith("#EXTM3U"):
+                playlist.header = line.strip()
+                continue
+            if line.startswith("#EXTINF"):
+                if extinf:
+                    items.append(extinf)
+                    items.extend(options)
+                extinf, options = line, []
+                continue
+            if extinf is not None:
+                if line.startswith(OPTION_PREFIXES):
+                    options.append(line)
+                    continue
+                if line.strip() and not line.startswith("#"):
+                    items.append(M3UEntry.from_extinf(extinf, line, options))
+                    extinf, options = None, []
+                    continue
+                items.append(extinf)
+                items.extend(options)
+                extinf, options = None, []
+            items.append(line)
+        if extinf:
+            items.append(extinf)
+            items.extend(options)
+        return playlist
+
+    def copy(self):
+        """淺複製：合併操作只會替換 items 列表，不會修改既有的 M3UEntry"""
+        return M3UPlaylist(self.header, self.items)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.parse(f)
+
+    # ---- 索引 ----
+    def entries(self):
+        return [it for it in self.items if isinstance(it, M3UEntry)]
+
+    def _build_index(self):
+        self._by_name, self._by_group = {}, {}
+        for e in self.entries():
+            self._by_name.setdefault(e.name, []).append(e)
+            self._by_group.setdefault(e.group, []).append(e)
+
+    def _invalidate(self):
+        self._by_name = self._by_group = None
+
+    def by_name(self, name):
+        if self._by_name is None:
+            self._build_index()
+        return self._by_name.get(name, [])
+
+    def by_group(self, group):
+        if self._by_group is None:
+            self._build_index()
+        return self._by_group.get(group, [])
+
+    def groups(self):
+        if self._by_group is None:
+            self._build_index()
+        return list(self._by_group)
+
+    def replace_items(self, items):
+        self.items = list(items)
+        self._invalidate()
+
+    # ---- 合併 ----
+    def remove_group(self, group):
+        self.items = [it for it in self.items if not (isinstance(it, M3UEntry) and it.group == group)]
+        self._invalidate()
+
+    def strip_auto_comments(self):
+        """清除舊版自動更新留下的標題框與說明行，並收斂連續空行"""
+        items = self.items
+        cleaned = []
+        i = 0
+        while i < len(items):
+            it = items[i]
+            if isinstance(it, str):
+                # 標題框：#=== / # 標題 / #===
+                if (it.startswith("#==") and i + 2 < len(items)
+                        and isinstance(items[i + 1], str) and isinstance(items[i + 2], str)
+                        and items[i + 2].startswith("#==") and AUTO_COMMENT_RE.search(items[i + 1])):
+                    i += 3
+                    continue
+                if it.startswith("#") and AUTO_COMMENT_RE.search(it):
+                    i += 1
+                    continue
+                if not it.strip() and cleaned and isinstance(cleaned[-1], str) and not cleaned[-1].strip():
+                    i += 1
+                    continue
+            cleaned.append(it)
+            i += 1
+        while cleaned and isinstance(cleaned[-1], str) and not cleaned[-1].strip():
+            cleaned.pop()
+        self.items = cleaned
+
+    def strip_group_banner(self, group, banner=None):
+        """移除 group 的自動更新標題框 (標題等於 banner，或含群組名稱的自動更新標題) 與緊接的說明行"""
+        titles = {f"# {banner or group}"}
+        items = self.items
+        cleaned = []
+        i = 0
+        while i < len(items):
+            it = items[i]
+            if (isinstance(it, str) and it.startswith("#==") and i + 2 < len(items)
+                    and isinstance(items[i + 1], str) and isinstance(items[i + 2], str)
+                    and items[i + 2].startswith("#==")
+                    and (items[i + 1] in titles or (group in items[i + 1] and AUTO_COMMENT_RE.search(items[i + 1])))):
+                i += 3
+                # 標題框後的說明行 (更新時間等)
+                while (i < len(items) and isinstance(items[i], str) and items[i].startswith("#")
+                       and not items[i].startswith("#==") and AUTO_COMMENT_RE.search(items[i])):
+                    i += 1
+                continue
+            if (isinstance(it, str) and not it.strip() and cleaned
+                    and isinstance(cleaned[-1], str) and not cleaned[-1].strip()):
+                i += 1
+                continue
+            cleaned.append(it)
+            i += 1
+        while cleaned and isinstance(cleaned[-1], str) and not cleaned[-1].strip():
+            cleaned.pop()
+        self.items = cleaned
+
+    def dedupe(self):
+        """移除完全相同 (群組、名稱、網址) 的重複線路"""
+        seen = set()
+        kept = []
+        for it in self.items:
+            if isinstance(it, M3UEntry):
+                key = (it.group, it.name, it.url)
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.append(it)
+        self.items = kept
+        self._invalidate()
+
+    def upsert_group(self, group, entries, banner=None, notes=()):
+        """以新線路取代整個群組 (冪等)：舊的同群組線路、重複線路與該群組的舊說明一併移除後，於末尾加入新區塊
+
+        entries 內重複的線路 (同名稱、同網址) 只保留第一條
+        """
+        self.remove_group(group)
+        self.dedupe()
+        self.strip_group_banner(group, banner)
+        block = ["", BANNER_RULE, f"# {banner or group}", BANNER_RULE]
+        block.extend(f"# {n}" for n in notes)
+        seen = set()
+        for e in entries:
+            if (e.name, e.url) in seen:
+                continue
+            seen.add((e.name, e.url))
+            if e.group != group:
+                e.set_attr("group-title", group)
+            block.append(e)
+        self.items.extend(block)
+        self._invalidate()
+
+    # ---- 輸出 ----
+    def iter_lines(self):
+        yield self.header
+        for it in self.items:
+            if isinstance(it, M3UEntry):
+                yield from it.lines()
+            else:
+                yield it
+
+    def write(self, path):
+        """串流寫入暫存檔後原子取代 (不在記憶體中組出整份字串，讀取端不會看到寫到一半的檔案)"""
+        with atomic_open(path, "w", encoding="utf-8", newline="\n") as f:
+            for line in self.iter_lines():
+                f.write(line)
+                f.write("\n")
+
+    def to_text(self):
+        return "\n".join(self.iter_lines()) + "\n"
@@ -2,20 +2,29 @@
 """
 merge_into_twtv_append.py
 -------------------------
-僅將新抓取的台灣頻道附加到 TWTV.m3u 末尾，不更動原有頻道。
+將新抓取的台灣頻道合併到 TWTV.m3u，不更動其他群組。
+台灣頻道以整個群組取代 (upsert)，重複執行不會累積重複區塊。
 完整版本包含備份、下載、驗證與 Git 推送。
 """
 
 import os
-import requests
 import sys
+import glob
 from datetime import datetime
+from m3u_model import M3UPlaylist
+from upstream_fetcher import UpstreamFetcher
+from publisher import Publisher
+from atomic_io import SnapshotBackups, atomic_write_text
+from run_coordinator import FileLock
 
 # === 配置設定 ===
 GITHUB_TWTV_RAW_URL = "https://raw.githubusercontent.com/15682116618/ML-MO-GOT-IPTV/main/TWTV.m3u"
 LOCAL_TWTV_PATH = "TWTV.m3u"
 SOURCE_DIR = "m3u-files"
 BACKUP_DIR = "backups"
+TAIWAN_GROUP = "台灣頻道"
+BACKUP_RETENTION = 5
+UPSTREAM = UpstreamFetcher(GITHUB_TWTV_RAW_URL)
 
 
 def setup_environment():
@@ -26,57 +35,48 @@ def setup_environment():
 
 def backup_twtv():
     """備份現有 TWTV.m3u"""
-    if os.path.exists(LOCAL_TWTV_PATH):
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_path = os.path.join(BACKUP_DIR, f"TWTV_backup_{timestamp}.m3u")
-        with open(LOCAL_TWTV_PATH, "r", encoding="utf-8") as src, \
-             open(backup_path, "w", encoding="utf-8") as dst:
-            dst.write(src.read())
+    backup_path = SnapshotBackups(BACKUP_DIR, BACKUP_RETENTION).snapshot(LOCAL_TWTV_PATH)
+    if backup_path:
         print(f"📦 已備份 TWTV.m3u 至 {backup_path}")
 
 
 def download_twtv():
-    """下載最新 TWTV.m3u"""
+    """下載最新 TWTV.m3u (條件式下載，未變更或失敗時使用本地快取副本)"""
     print("🌐 正在下載遠程 TWTV.m3u ...")
-    try:
-        r = requests.get(GITHUB_TWTV_RAW_URL, timeout=20)
-        r.raise_for_status()
-        with open(LOCAL_TWTV_PATH, "w", encoding="utf-8") as f:
-            f.write(r.text)
-        print("✅ 已下載最新 TWTV.m3u")
-        return True
-    except requests.exceptions.RequestException as e:
-        print(f"⚠️ 無法下載最新 TWTV.m3u: {e}")
+    text = UPSTREAM.fetch()
+    if text is None:
+        print("⚠️ 無法下載最新 TWTV.m3u")
         return False
+    atomic_write_text(LOCAL_TWTV_PATH, text)
+    print("✅ 已取得最新 TWTV.m3u")
+    return True
 
 
 def collect_taiwan_streams():
-    """收集新抓取的台灣頻道"""
+    """收集新抓取的台灣頻道 (m3u-files/台灣頻道/*.m3u)，回傳以網址去重的 M3UEntry 列表
+
+    根目錄的 all.m3u、auto_commit.py / LITV.py 的單頻道檔與其他群組的目錄不讀取，避免同一網址重複出現
+    """
     print("📁 正在收集台灣頻道資料...")
-    lines = ["#EXTM3U\n"]
-    count = 0
+    entries = []
+    seen = set()
     try:
-        for file in os.listdir(SOURCE_DIR):
-            if file.endswith(".m3u"):
-                path = os.path.join(SOURCE_DIR, file)
-                with open(path, "r", encoding="utf-8") as f:
-                    data = f.read().strip()
-                    if "#EXTINF" in data:
-                        count += data.count("#EXTINF")
-                        lines.append(data)
-        lines.append(f"# 台灣頻道更新時間：{datetime.now():%Y-%m-%d %H:%M:%S}\n")
-        lines.append(f"# 本次新增頻道數：{count} 個\n")
-        print(f"📊 收集到 {count} 個台灣頻道")
-        return "\n".join(lines)
+        for path in sorted(glob.glob(os.path.join(SOURCE_DIR, TAIWAN_GROUP, "*.m3u"))):
+            for entry in M3UPlaylist.from_file(path).entries():
+                if entry.url not in seen:
+                    seen.add(entry.url)
+                    entries.append(entry)
+        print(f"📊 收集到 {len(entries)} 個台灣頻道")
+        return entries
     except Exception as e:
         print(f"❌ 收集時出錯: {e}")
         return None
 
 
 def append_taiwan_to_twtv():
-    """將新台灣頻道附加到 TWTV.m3u"""
+    """將新台灣頻道合併到 TWTV.m3u (取代舊的台灣頻道區塊)"""
     print("=" * 60)
-    print("🔄 開始附加台灣頻道到 TWTV.m3u")
+    print("🔄 開始合併台灣頻道到 TWTV.m3u")
     print("=" * 60)
 
     setup_environment()
@@ -85,27 +85,24 @@ def append_taiwan_to_twtv():
 
     # 讀取現有內容
     try:
-        with open(LOCAL_TWTV_PATH, "r", encoding="utf-8") as f:
-            original = f.read().strip()
+        playlist = M3UPlaylist.from_file(LOCAL_TWTV_PATH)
     except Exception as e:
         print(f"❌ 無法讀取 TWTV.m3u: {e}")
         return False
 
-    new_section = collect_taiwan_streams()
-    if not new_section:
+    entries = collect_taiwan_streams()
+    if not entries:
         print("⚠️ 沒有找到可附加的台灣頻道")
         return False
 
-    new_text = original + "\n\n" + "#" + "=" * 50 + "\n"
-    new_text += "# 自動新增台灣頻道\n"
-    new_text += "#" + "=" * 50 + "\n"
-    new_text += new_section.strip() + "\n"
-    new_text += f"# 合併時間：{datetime.now():%Y-%m-%d %H:%M:%S}\n"
+    playlist.upsert_group(TAIWAN_GROUP, entries, banner="自動新增台灣頻道", notes=[
+        f"合併時間：{datetime.now():%Y-%m-%d %H:%M:%S}",
+        f"本次新增頻道數：{len(entries)} 個",
+    ])
 
     try:
-        with open(LOCAL_TWTV_PATH, "w", encoding="utf-8") as f:
-            f.write(new_text)
-        print("✅ 已成功附加新台灣頻道至 TWTV.m3u")
+        playlist.write(LOCAL_TWTV_PATH)
+        print("✅ 已成功合併新台灣頻道至 TWTV.m3u")
         return True
     except Exception as e:
         print(f"❌ 寫入 TWTV.m3u 失敗: {e}")
@@ -113,22 +110,26 @@ def append_taiwan_to_twtv():
 
 
 def git_push():
-    """Git 自動提交推送"""
+    """Git 自動提交推送 (內容沒有變更時不提交)"""
     print("🚀 正在執行 Git 操作...")
-    os.system("git add TWTV.m3u")
-    commit_msg = f'🆕 Append 台灣頻道 {datetime.now():%Y-%m-%d %H:%M:%S}'
-    os.system(f'git commit -m "{commit_msg}"')
-    os.system("git push origin main")
+    Publisher().publish([LOCAL_TWTV_PATH], message=f'🆕 Append 台灣頻道 {datetime.now():%Y-%m-%d %H:%M:%S}')
     print("✅ Git 推送完成")
 
 
-
 def main():
     start = datetime.now()
     print(f"🕒 開始時間: {start:%Y-%m-%d %H:%M:%S}")
 
-    if append_taiwan_to_twtv():
-        git_push()
+    # 與自動更新程式共用鎖檔，避免同時改寫 TWTV.m3u 或 git push
+    lock = FileLock()
+    if not lock.acquire():
+        print(f"🔒 另一個程序正在更新 ({lock.holder()})，請稍後再試")
+        return
+    try:
+        if append_taiwan_to_twtv():
+            git_push()
+    finally:
+        lock.release()
 
     end = datetime.now()
     print(f"🏁 結束時間: {end:%Y-%m-%d %H:%M:%S}")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+metrics.py
+--------------------------------------------
+每個更新週期的分段計時：
+- with span("page_load"): ... 量測一個階段，自動帶上目前執行緒的 channel / group 標籤
+- 每筆結果寫入 logs/metrics.jsonl (JSON lines)
+- 彙總值可由本機 HTTP 端點以 Prometheus 文字格式讀取 (/metrics)
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ====== 配置設定 ======
+METRICS_LOG_PATH = os.path.join("logs", "metrics.jsonl")
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+TAG_KEYS = ("stage", "channel", "group")
+
+_local = threading.local()
+_lock = threading.Lock()
+_aggregates = {}  # (stage, channel, group) -> {"count", "sum", "last", "failures"}
+_collectors = []  # 其他模組提供的額外指標，fn() -> [Prometheus 文字行]
+
+
+def _current_tags():
+    return dict(getattr(_local, "tags", {}))
+
+
+@contextmanager
+def context(**tags):
+    """為目前執行緒內的所有 span 加上預設標籤 (例如 channel / group)"""
+    old = _current_tags()
+    _local.tags = {**old, **tags}
+    try:
+        yield
+    finally:
+        _local.tags = old
+
+
+def record(stage, seconds, ok=True, **tags):
+    """記錄一筆已量測好的階段耗時"""
+    tags = {**_current_tags(), **tags}
+    key = (stage, tags.get("channel", ""), tags.get("group", ""))
+    with _lock:
+        agg = _aggregates.setdefault(key, {"count": 0, "sum": 0.0, "last": 0.0, "failures": 0})
+        agg["count"] += 1
+        agg["sum"] += seconds
+        agg["last"] = seconds
+        if not ok:
+            agg["failures"] += 1
+        try:
+            os.makedirs(os.path.dirname(METRICS_LOG_PATH) or ".", exist_ok=True)
+            with open(METRICS_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "time": f"{datetime.now():%Y-%m-%d %H:%M:%S}",
+                    "stage": stage,
+                    "seconds": round(seconds, 4),
+                    "ok": ok,
+                    **tags,
+                }, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+
+@contextmanager
+def span(stage, **tags):
+    """量測 with 區塊的耗時；區塊內拋出例外時記為失敗"""
+    t0 = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        record(stage, time.perf_counter() - t0, ok, **tags)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def add_collector(fn):
+    """登記額外指標來源 (例如 run_history 的滾動統計)，/metrics 每次讀取時呼叫"""
+    _collectors.append(fn)
+
+
+def prometheus_text():
+    """以 Prometheus 文字格式輸出彙總值"""
+    with _lock:
+        items = sorted(_aggregates.items())
+    lines = [
+        "# HELP litv_stage_duration_seconds Time spent per update stage.",
+        "# TYPE litv_stage_duration_seconds summary",
+    ]
+    for key, agg in items:
+        labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(TAG_KEYS, key))
+        lines.append(f"litv_stage_duration_seconds_sum{{{labels}}} {agg['sum']:.6f}")
+        lines.append(f"litv_stage_duration_seconds_count{{{labels}}} {agg['count']}")
+    lines += ["# HELP litv_stage_last_duration_seconds Duration of the most recent run of a stage.",
+              "# TYPE litv_stage_last_duration_seconds gauge"]
+    for key, agg in items:
+        labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(TAG_KEYS, key))
+        lines.append(f"litv_stage_last_duration_seconds{{{labels}}} {agg['last']:.6f}")
+    lines += ["# HELP litv_stage_failures_total Stage runs that raised an error.",
+              "# TYPE litv_stage_failures_total counter"]
+    for key, agg in items:
+        labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(TAG_KEYS, key))
+        lines.append(f"litv_stage_failures_total{{{labels}}} {agg['failures']}")
+    for fn in list(_collectors):
+        try:
+            lines += fn()
+        except Exception as e:  # 額外指標失敗不影響基本指標
+            lines.append(f"# collector error: {_escape(e)}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(host=METRICS_HOST, port=METRICS_PORT):
+    """於背景執行緒啟動 /metrics 端點，回傳 server (可呼叫 shutdown())"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"📈 Metrics 端點：http://{host}:{server.server_port}/metrics")
+    return server
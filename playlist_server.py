@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+playlist_server.py
+--------------------------------------------
+本機播放清單伺服器 (與排程同一個程序)：
+- 合併後的 TWTV.m3u 解析成記憶體索引 (全表 / 各群組 / 各頻道)，每次 merge_m3u 後整份原子替換
+- 內容預先產生 ETag 與 gzip；支援 If-None-Match (304) 與 Accept-Encoding: gzip
+- /ch/<頻道> 以 302 導向目前最佳的線路；設定 resolver 時 (隨選模式) 改為收到請求才解析，
+  抓取完成後才回應
+播放器直接連本機即可，新線路抓到後數秒內生效，不需等 git push 與 CDN 快取。
+
+路由：
+    /playlist.m3u  (或 /TWTV.m3u)   完整清單
+    /group/<群組>.m3u               單一群組
+    /channel/<頻道>.m3u             單一頻道的所有線路
+    /ch/<頻道>                      302 → 最佳線路
+"""
+
+import gzip
+import hashlib
+import threading
+from urllib.parse import unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ====== 配置設定 ======
+PLAYLIST_HOST = "0.0.0.0"  # 區網內的播放器都可連線；只給本機使用可改為 127.0.0.1
+PLAYLIST_PORT = 8088
+CONTENT_TYPE = "audio/x-mpegurl; charset=utf-8"
+
+
+class _Body:
+    """一份可直接回應的內容：原文、gzip 與 ETag"""
+
+    __slots__ = ("raw", "gz", "etag")
+
+    def __init__(self, text):
+        self.raw = text.encode("utf-8")
+        self.gz = gzip.compress(self.raw, compresslevel=6, mtime=0)
+        self.etag = '"' + hashlib.sha1(self.raw).hexdigest()[:20] + '"'
+
+
+class Snapshot:
+    """某一次合併結果的索引 (除 best 可由 set_best 即時更新外不再變動)"""
+
+    def __init__(self, playlist=None):
+        self.full = None
+        self.groups = {}
+        self.channels = {}
+        self.best = {}  # 頻道名稱 -> 最佳線路 (清單中的第一條)
+        if playlist is None:
+            return
+        self.full = _Body(playlist.to_text())
+        by_group, by_name = {}, {}
+        for entry in playlist.entries():
+            by_group.setdefault(entry.group, []).append(entry)
+            by_name.setdefault(entry.name, []).append(entry)
+            self.best.setdefault(entry.name, entry.url)
+        header = playlist.header or "#EXTM3U"
+        self.groups = {g: _Body(self._render(header, es)) for g, es in by_group.items() if g}
+        self.channels = {n: _Body(self._render(header, es)) for n, es in by_name.items() if n}
+
+    @staticmethod
+    def _render(header, entries):
+        lines = [header]
+        for entry in entries:
+            lines.extend(entry.lines())
+        return "\n".join(lines) + "\n"
+
+
+class PlaylistStore:
+    """持有目前的 Snapshot；update() 建好新索引後才一次替換，讀取端不會看到一半的狀態"""
+
+    def __init__(self, resolver=None):
+        self.snapshot = Snapshot()
+        self.resolver = resolver  # resolver(name) -> 線路或 None (抓取失敗)；不處理的頻道擲出 LookupError
+        self._lock = threading.Lock()
+
+    def update(self, playlist):
+        snapshot = Snapshot(playlist)
+        with self._lock:
+            self.snapshot = snapshot
+        print(f"    📡 播放清單伺服器已更新 ({len(snapshot.channels)} 個頻道、{len(snapshot.groups)} 個群組)")
+
+    def set_best(self, name, url):
+        """單一頻道抓到新線路時立即更新 /ch/<頻道> 的導向 (不需等下一次合併)"""
+        with self._lock:
+            self.snapshot.best[name] = url
+
+
+class _PlaylistHandler(BaseHTTPRequestHandler):
+    store = None  # start_server() 設定
+
+    def do_HEAD(self):
+        self._handle(head=True)
+
+    def do_GET(self):
+        self._handle(head=False)
+
+    def _handle(self, head):
+        path = unquote(self.path.split("?", 1)[0])
+        snapshot = self.store.snapshot
+
+        if path.startswith("/ch/"):
+            name = path[len("/ch/"):].strip("/")
+            try:
+                if self.store.resolver is None:
+                    raise LookupError(name)
+                url = self.store.resolver(name)  # 隨選頻道：等待抓取完成 (同頻道的並行請求共用一次抓取)
+                if url is None:
+                    self.send_error(502, "capture failed")
+                    return
+            except LookupError:
+                url = snapshot.best.get(name)
+            if url is None:
+                self.send_error(404, "channel not found")
+                return
+            self.send_response(302)
+            self.send_header("Location", url)
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if path in ("/", "/playlist.m3u", "/TWTV.m3u"):
+            body = snapshot.full
+        elif path.startswith("/group/") and path.endswith(".m3u"):
+            body = snapshot.groups.get(path[len("/group/"):-len(".m3u")])
+        elif path.startswith("/channel/") and path.endswith(".m3u"):
+            body = snapshot.channels.get(path[len("/channel/"):-len(".m3u")])
+        else:
+            body = None
+        if body is None:
+            self.send_error(404)
+            return
+        self._send_body(body, head)
+
+    def _send_body(self, body, head):
+        if body.etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(304)
+            self.send_header("ETag", body.etag)
+            self.end_headers()
+            return
+        use_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+        data = body.gz if use_gzip else body.raw
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("ETag", body.etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(store, host=PLAYLIST_HOST, port=PLAYLIST_PORT):
+    """於背景執行緒啟動播放清單伺服器，回傳 server (可呼叫 shutdown())"""
+    handler = type("PlaylistHandler", (_PlaylistHandler,), {"store": store})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="playlist-server", daemon=True).start()
+    print(f"📺 播放清單伺服器：http://{host}:{server.server_port}/playlist.m3u")
+    return server
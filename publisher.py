@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+publisher.py
+--------------------------------------------
+增量 Git 發布：
+- 以「去掉時間戳行」後的內容計算雜湊，只有實際內容變更的檔案才 git add
+- 沒有變更就不 commit、不 pull、不 push
+- push 可設定合併視窗 (debounce)，多次更新合併成一次推送
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import subprocess
+import threading
+from datetime import datetime
+
+import metrics
+from atomic_io import atomic_write_text
+
+# ====== 配置設定 ======
+STATE_PATH = os.path.join("cache", "publish_state.json")
+PUSH_DEBOUNCE_SECONDS = 0  # 兩次 push 之間的最短間隔；0 表示每次有 commit 就立刻 push
+
+# 發布內容中會隨每次執行改變、但不代表內容變更的行
+VOLATILE_LINE_RE = re.compile(r"^#.*(Updated:|更新時間|合併時間|更新頻道|保留頻道|本次新增)")
+
+
+def semantic_hash(path):
+    """忽略時間戳行後的內容雜湊；檔案不存在回傳 None"""
+    h = hashlib.sha1()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.rstrip("\r\n")
+                if VOLATILE_LINE_RE.match(line):
+                    continue
+                h.update(line.encode("utf-8"))
+                h.update(b"\n")
+    except OSError:
+        return None
+    return h.hexdigest()
+
+
+class Publisher:
+    """只提交實際變更的檔案，並依 debounce 視窗批次 push"""
+
+    def __init__(self, repo_dir=".", branch="main", remote="origin",
+                 debounce=PUSH_DEBOUNCE_SECONDS, state_path=None):
+        self.repo_dir = repo_dir
+        self.branch = branch
+        self.remote = remote
+        self.debounce = debounce
+        self.state_path = state_path or os.path.join(repo_dir, STATE_PATH)
+        self._lock = threading.Lock()
+
+    # ---- 狀態 ----
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"hashes": {}, "last_push": 0, "unpushed": False}
+
+    def _save_state(self, state):
+        atomic_write_text(self.state_path, json.dumps(state, ensure_ascii=False, indent=2))
+
+    def _git(self, *args, check=True):
+        with metrics.span(f"git_{args[0]}"):
+            return subprocess.run(["git", *args], cwd=self.repo_dir, check=check,
+                                  capture_output=True, text=True)
+
+    # ---- 發布 ----
+    def changed_files(self, paths, state=None):
+        """回傳 [(相對路徑, 新雜湊)]，只含內容實際變更的檔案"""
+        state = state or self._load_state()
+        changed = []
+        for path in paths:
+            rel = os.path.relpath(os.path.join(self.repo_dir, path), self.repo_dir).replace(os.sep, "/")
+            digest = semantic_hash(os.path.join(self.repo_dir, rel))
+            if digest is not None and state["hashes"].get(rel) != digest:
+                changed.append((rel, digest))
+        return changed
+
+    def publish(self, paths, message=None):
+        """提交變更的檔案並視 debounce 視窗推送，回傳本次提交的檔案列表"""
+        with self._lock:
+            if not os.path.exists(os.path.join(self.repo_dir, ".git")):
+                print("⚠️ 當前目錄不是 Git 倉庫，跳過 Git 操作")
+                return []
+
+            state = self._load_state()
+            changed = self.changed_files(paths, state)
+            if changed:
+                files = [rel for rel, _ in changed]
+                try:
+                    self._git("add", "--", *files)
+                    self._git("commit", "-m", message or f"📺 Auto Update {datetime.now():%Y-%m-%d %H:%M}",
+                              "--", *files)
+                except subprocess.CalledProcessError as e:
+                    if "nothing to commit" in (e.stdout or "") + (e.stderr or ""):
+                        print("    ℹ️ 沒有變更需要提交")
+                    else:
+                        print(f"    ❌ Git 指令錯誤 [{e.cmd[1]}]: {e.stderr}")
+                        return []
+                for rel, digest in changed:
+                    state["hashes"][rel] = digest
+                state["unpushed"] = True
+                print(f"    📝 已提交 {len(files)} 個變更檔案")
+            else:
+                print("    ℹ️ 內容沒有變更，略過提交")
+
+            if state.get("unpushed"):
+                wait = self.debounce - (time.time() - state.get("last_push", 0))
+                if wait > 0:
+                    print(f"    ⏳ 合併推送中，{wait:.0f} 秒後的下次發布一併推送")
+                elif self._push():
+                    state["unpushed"] = False
+                    state["last_push"] = time.time()
+
+            self._save_state(state)
+            return [rel for rel, _ in changed]
+
+    def _push(self):
+        """先拉取再推送；推送失敗 (衝突) 時改以 rebase 拉取後重試一次"""
+        self._git("pull", self.remote, self.branch, "--no-rebase", check=False)
+        try:
+            self._git("push", self.remote, self.branch)
+            print("    🚀 已推送到遠端")
+            return True
+        except subprocess.CalledProcessError as e:
+            if "non-fast-forward" in e.stderr or "rejected" in e.stderr:
+                print("    ⚠️ Git Push 衝突，嘗試重新拉取...")
+                self._git("pull", self.remote, self.branch, "--rebase", check=False)
+                if self._git("push", self.remote, self.branch, check=False).returncode == 0:
+                    return True
+            print(f"    ❌ Git 推送失敗: {e.stderr}")
+            return False
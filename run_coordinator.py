@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+run_coordinator.py
+--------------------------------------------
+排程執行的重疊保護：
+- FileLock：跨程序的鎖檔 (作業系統層級鎖，程序結束即自動釋放，不會留下過期的鎖)，
+  手動再開一次 Start_Update.bat 也不會與排程中的那一輪同時合併或 git push
+- RunCoordinator：執行中收到的觸發合併為「結束後再跑一輪」，不會堆積也不會重疊
+- SingleFlight：同一個頻道同時有多個抓取請求時，只執行一次並共用結果
+"""
+
+import os
+import socket
+import threading
+from datetime import datetime
+
+# ====== 配置設定 ======
+LOCK_PATH = os.path.join("cache", "update.lock")
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLock:
+    """非阻塞的跨程序鎖；acquire() 失敗時 holder() 可讀出持有者"""
+
+    def __init__(self, path=LOCK_PATH):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        f = open(self.path, "a+", encoding="utf-8")
+        try:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(f"{socket.gethostname()} pid={os.getpid()} since={datetime.now():%Y-%m-%d %H:%M:%S}\n")
+        f.flush()
+        self._file = f
+        return True
+
+    def release(self):
+        f, self._file = self._file, None
+        if f is None:
+            return
+        try:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        except OSError:
+            pass
+        f.close()
+
+    def holder(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return f.read().strip() or "未知"
+        except OSError:
+            return "未知"
+
+
+class RunCoordinator:
+    """包住一個排程任務：同時間只跑一輪，執行中的觸發合併成一次後續執行"""
+
+    def __init__(self, job, lock=None):
+        self.job = job
+        self.lock = lock or FileLock()
+        self._state = threading.Lock()
+        self._running = False
+        self._pending = False
+
+    def trigger(self, reason="排程"):
+        """要求執行一輪；已在執行中則只標記「結束後再跑一次」並立即返回。回傳是否由本次呼叫執行"""
+        with self._state:
+            if self._running:
+                if not self._pending:
+                    print(f"    ⏭️ 上一輪仍在執行，{reason}觸發將於結束後合併執行")
+                self._pending = True
+                return False
+            self._running = True
+
+        try:
+            while True:
+                if not self.lock.acquire():
+                    print(f"    🔒 另一個程序正在更新 ({self.lock.holder()})，略過本輪")
+                    return False
+                try:
+                    self.job()
+                finally:
+                    self.lock.release()
+                with self._state:
+                    if not self._pending:
+                        return True
+                    self._pending = False
+                print("    🔁 執行期間有新的觸發，再執行一輪")
+        finally:
+            with self._state:
+                self._running = False
+                self._pending = False
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """do(key, fn)：同一個 key 正在執行時，後來的呼叫等待並共用第一個呼叫的結果"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+run_history.py
+--------------------------------------------
+抓取歷史 (SQLite，只追加，取代每次整份重寫的 update_history.json)：
+- runs：每個頻道每次抓取一筆 (成功與否、解析層級、耗時、網址壽命)
+- buckets：寫入時同步累加的 5 分鐘桶 (次數、成功數、耗時直方圖、網址壽命總和)
+- summary：各頻道 1h / 24h / 7d 的成功率、p50 / p95 耗時，每次寫入後由桶重算，查詢只讀一列
+- compact()：超過保留期的原始紀錄刪除；超過最長統計區間的桶併入 totals (累計值) 後刪除
+資料庫在第一次使用時才建立，import 本模組沒有副作用。
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# ====== 配置設定 ======
+HISTORY_PATH = os.path.join("cache", "history.sqlite3")
+BUCKET_SECONDS = 300
+WINDOWS = {"1h": 3600, "24h": 24 * 3600, "7d": 7 * 24 * 3600}
+RAW_RETENTION = 2 * 24 * 3600  # 原始紀錄保留時間 (秒)；統計值已在寫入時累加進桶
+RUN_LOG_RETENTION = 90 * 24 * 3600  # 每輪摘要保留時間 (秒)
+COMPACT_INTERVAL = 3600  # maybe_compact() 兩次整理的最短間隔 (秒)
+
+# 耗時直方圖的各格上限 (毫秒)，最後一格之後為溢位格
+LATENCY_BOUNDS_MS = (50, 100, 200, 350, 500, 750, 1000, 1500, 2000, 3000, 5000, 7500,
+                     10000, 15000, 20000, 30000, 45000, 60000, 90000, 120000, 180000)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id         INTEGER PRIMARY KEY,
+    ts         REAL NOT NULL,
+    channel    TEXT NOT NULL,
+    ok         INTEGER NOT NULL,
+    tier       TEXT,
+    latency_ms REAL,
+    lifetime   REAL,
+    url        TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_ts ON runs (ts);
+CREATE TABLE IF NOT EXISTS buckets (
+    channel      TEXT NOT NULL,
+    start        REAL NOT NULL,
+    total        INTEGER NOT NULL,
+    ok           INTEGER NOT NULL,
+    hist         TEXT NOT NULL,
+    lifetime_sum REAL NOT NULL,
+    lifetime_n   INTEGER NOT NULL,
+    PRIMARY KEY (channel, start)
+);
+CREATE INDEX IF NOT EXISTS buckets_start ON buckets (start);
+CREATE TABLE IF NOT EXISTS totals (
+    channel      TEXT PRIMARY KEY,
+    total        INTEGER NOT NULL,
+    ok           INTEGER NOT NULL,
+    hist         TEXT NOT NULL,
+    lifetime_sum REAL NOT NULL,
+    lifetime_n   INTEGER NOT NULL,
+    since        REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS summary (
+    channel      TEXT NOT NULL,
+    window       TEXT NOT NULL,
+    total        INTEGER NOT NULL,
+    ok           INTEGER NOT NULL,
+    success_rate REAL,
+    p50_ms       REAL,
+    p95_ms       REAL,
+    lifetime_avg REAL,
+    updated_at   REAL NOT NULL,
+    PRIMARY KEY (channel, window)
+);
+CREATE TABLE IF NOT EXISTS run_log (
+    id            INTEGER PRIMARY KEY,
+    ts            REAL NOT NULL,
+    action        TEXT NOT NULL,
+    success_count INTEGER NOT NULL,
+    total_count   INTEGER NOT NULL
+);
+"""
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _bin(latency_ms):
+    for i, bound in enumerate(LATENCY_BOUNDS_MS):
+        if latency_ms <= bound:
+            return i
+    return len(LATENCY_BOUNDS_MS)
+
+
+def _merge_hist(a, b):
+    return [x + y for x, y in zip(a, b)]
+
+
+def percentile(hist, q):
+    """由直方圖估計百分位數 (毫秒，格內線性內插)；沒有資料回傳 None"""
+    count = sum(hist)
+    if not count:
+        return None
+    target = q * count
+    seen = 0
+    for i, n in enumerate(hist):
+        if n and seen + n >= target:
+            lower = LATENCY_BOUNDS_MS[i - 1] if i > 0 else 0
+            upper = LATENCY_BOUNDS_MS[i] if i < len(LATENCY_BOUNDS_MS) else LATENCY_BOUNDS_MS[-1]
+            return round(lower + (upper - lower) * (target - seen) / n, 1)
+        seen += n
+    return float(LATENCY_BOUNDS_MS[-1])
+
+
+class RunHistory:
+    """抓取歷史與滾動統計；多執行緒、多程序共用同一個資料庫檔案"""
+
+    def __init__(self, path=HISTORY_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._ready = False
+        self._last_compact = 0.0
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            with self._schema_lock:
+                if not self._ready:
+                    db.executescript(SCHEMA)
+                    self._ready = True
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _tx(self):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    # ---- 寫入 ----
+    def record(self, channel, ok, tier=None, latency=None, url=None, lifetime=None, now=None):
+        """記錄一次抓取 (latency / lifetime 單位為秒)，並更新該頻道的滾動統計"""
+        now = now or time.time()
+        latency_ms = round(latency * 1000, 1) if latency is not None else None
+        hist = [0] * (len(LATENCY_BOUNDS_MS) + 1)
+        if ok and latency_ms is not None:  # 只統計成功抓取的耗時 (失敗多為逾時，另以成功率呈現)
+            hist[_bin(latency_ms)] = 1
+        start = now - now % BUCKET_SECONDS
+        lifetime_n = 1 if lifetime is not None else 0
+        with self._tx() as db:
+            db.execute("INSERT INTO runs (ts, channel, ok, tier, latency_ms, lifetime, url) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       (now, channel, int(bool(ok)), tier, latency_ms, lifetime, url))
+            row = db.execute("SELECT hist FROM buckets WHERE channel = ? AND start = ?", (channel, start)).fetchone()
+            if row is not None:
+                hist = _merge_hist(json.loads(row["hist"]), hist)
+            db.execute("""
+                INSERT INTO buckets (channel, start, total, ok, hist, lifetime_sum, lifetime_n)
+                VALUES (?, ?, 1, ?, ?, ?, ?)
+                ON CONFLICT(channel, start) DO UPDATE SET
+                    total = total + 1, ok = ok + excluded.ok, hist = excluded.hist,
+                    lifetime_sum = lifetime_sum + excluded.lifetime_sum, lifetime_n = lifetime_n + excluded.lifetime_n
+            """, (channel, start, int(bool(ok)), json.dumps(hist), lifetime or 0.0, lifetime_n))
+            self._refresh_channel(db, channel, now)
+
+    def record_run(self, action, success_count, total_count, now=None):
+        """記錄一輪更新的摘要 (取代 update_history.json 的一筆)"""
+        with self._tx() as db:
+            db.execute("INSERT INTO run_log (ts, action, success_count, total_count) VALUES (?, ?, ?, ?)",
+                       (now or time.time(), action, success_count, total_count))
+
+    # ---- 統計 ----
+    def _refresh_channel(self, db, channel, now):
+        """由桶重算單一頻道各區間的統計 (最多 7d / 5 分鐘 = 2016 個桶)"""
+        oldest = now - max(WINDOWS.values())
+        rows = db.execute("""
+            SELECT start, total, ok, hist, lifetime_sum, lifetime_n FROM buckets
+            WHERE channel = ? AND start > ? ORDER BY start DESC
+        """, (channel, oldest - BUCKET_SECONDS)).fetchall()
+        for window, seconds in WINDOWS.items():
+            total = ok = lifetime_n = 0
+            lifetime_sum = 0.0
+            hist = [0] * (len(LATENCY_BOUNDS_MS) + 1)
+            for row in rows:
+                if row["start"] + BUCKET_SECONDS <= now - seconds:
+                    break
+                total += row["total"]
+                ok += row["ok"]
+                hist = _merge_hist(hist, json.loads(row["hist"]))
+                lifetime_sum += row["lifetime_sum"]
+                lifetime_n += row["lifetime_n"]
+            db.execute("""
+                INSERT OR REPLACE INTO summary
+                    (channel, window, total, ok, success_rate, p50_ms, p95_ms, lifetime_avg, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (channel, window, total, ok, round(ok / total, 4) if total else None,
+                  percentile(hist, 0.5), percentile(hist, 0.95),
+                  round(lifetime_sum / lifetime_n, 1) if lifetime_n else None, now))
+
+    def refresh(self, now=None):
+        """重算所有頻道的統計 (沒有新紀錄的頻道，舊資料也會隨時間移出各區間)"""
+        now = now or time.time()
+        with self._tx() as db:
+            channels = [r["channel"] for r in db.execute("SELECT DISTINCT channel FROM summary")]
+            for channel in channels:
+                self._refresh_channel(db, channel, now)
+
+    def summary(self, channel, window="24h"):
+        """單一頻道單一區間的統計 (主鍵查詢一列)，沒有資料回傳 None"""
+        row = self._db().execute("SELECT * FROM summary WHERE channel = ? AND window = ?",
+                                 (channel, window)).fetchone()
+        return dict(row) if row else None
+
+    def summaries(self, window=None):
+        """所有頻道的統計 (儀表板用)"""
+        if window is None:
+            rows = self._db().execute("SELECT * FROM summary ORDER BY channel, window")
+        else:
+            rows = self._db().execute("SELECT * FROM summary WHERE window = ? ORDER BY channel", (window,))
+        return [dict(r) for r in rows]
+
+    def totals(self, channel):
+        """已壓縮進累計值的歷史 (超過最長區間的部分)"""
+        row = self._db().execute("SELECT * FROM totals WHERE channel = ?", (channel,)).fetchone()
+        if row is None:
+            return None
+        data = dict(row)
+        hist = json.loads(data.pop("hist"))
+        data.update(p50_ms=percentile(hist, 0.5), p95_ms=percentile(hist, 0.95))
+        return data
+
+    def recent_runs(self, limit=20):
+        rows = self._db().execute("SELECT * FROM run_log ORDER BY ts DESC LIMIT ?", (limit,))
+        return [dict(r) for r in rows]
+
+    # ---- 保留與壓縮 ----
+    def compact(self, now=None):
+        """刪除過期的原始紀錄；超過最長區間的桶併入 totals 後刪除，回傳 (刪除紀錄數, 壓縮桶數)"""
+        now = now or time.time()
+        cutoff = now - max(WINDOWS.values()) - BUCKET_SECONDS
+        with self._tx() as db:
+            removed = db.execute("DELETE FROM runs WHERE ts < ?", (now - RAW_RETENTION,)).rowcount
+            db.execute("DELETE FROM run_log WHERE ts < ?", (now - RUN_LOG_RETENTION,))
+            old = db.execute("SELECT * FROM buckets WHERE start < ?", (cutoff,)).fetchall()
+            merged = {}
+            for row in old:
+                acc = merged.setdefault(row["channel"], {"total": 0, "ok": 0, "lifetime_sum": 0.0, "lifetime_n": 0,
+                                                         "hist": [0] * (len(LATENCY_BOUNDS_MS) + 1),
+                                                         "since": row["start"]})
+                for field in ("total", "ok", "lifetime_sum", "lifetime_n"):
+                    acc[field] += row[field]
+                acc["hist"] = _merge_hist(acc["hist"], json.loads(row["hist"]))
+                acc["since"] = min(acc["since"], row["start"])
+            for channel, acc in merged.items():
+                prev = db.execute("SELECT * FROM totals WHERE channel = ?", (channel,)).fetchone()
+                if prev is not None:
+                    for field in ("total", "ok", "lifetime_sum", "lifetime_n"):
+                        acc[field] += prev[field]
+                    acc["hist"] = _merge_hist(acc["hist"], json.loads(prev["hist"]))
+                    acc["since"] = min(acc["since"], prev["since"])
+                db.execute("""
+                    INSERT OR REPLACE INTO totals (channel, total, ok, hist, lifetime_sum, lifetime_n, since)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (channel, acc["total"], acc["ok"], json.dumps(acc["hist"]), acc["lifetime_sum"],
+                      acc["lifetime_n"], acc["since"]))
+            db.execute("DELETE FROM buckets WHERE start < ?", (cutoff,))
+        self.refresh(now)
+        return removed, len(old)
+
+    def maybe_compact(self, now=None):
+        """距離上次整理超過 COMPACT_INTERVAL 才執行 compact()"""
+        now = now or time.time()
+        if now - self._last_compact < COMPACT_INTERVAL:
+            return None
+        self._last_compact = now
+        return self.compact(now)
+
+    def prometheus_lines(self):
+        """各頻道 24h / 1h 統計的 Prometheus gauge (供 metrics.add_collector 使用)"""
+        lines = ["# HELP litv_channel_success_ratio Capture success ratio per channel and window.",
+                 "# TYPE litv_channel_success_ratio gauge"]
+        rows = self.summaries()
+        for r in rows:
+            if r["success_rate"] is not None:
+                lines.append(f'litv_channel_success_ratio{{channel="{_label(r["channel"])}",window="{r["window"]}"}} '
+                             f'{r["success_rate"]}')
+        lines += ["# HELP litv_channel_capture_ms Capture latency percentiles per channel and window.",
+                  "# TYPE litv_channel_capture_ms gauge"]
+        for r in rows:
+            for q, key in (("0.5", "p50_ms"), ("0.95", "p95_ms")):
+                if r[key] is not None:
+                    lines.append(f'litv_channel_capture_ms{{channel="{_label(r["channel"])}",window="{r["window"]}",'
+                                 f'quantile="{q}"}} {r[key]}')
+        return lines
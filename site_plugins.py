@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+site_plugins.py
+--------------------------------------------
+各網站的抓取外掛 (共用 LITV_TWTV_AutoUpdate 的瀏覽器池、快取與排程)：
+- 每個外掛宣告：網址比對規則、同意條款 / 播放按鈕的操作、m3u8 過濾條件、最便宜的解析層級
+- channels.json 的 "site" 欄位指定外掛；沒有對應名稱時依網址比對，都不符合則使用通用外掛
+- 新增來源只需寫一個 SitePlugin 子類別並以 @register 登記，不必再複製整支抓取腳本
+- selenium 只在實際操作瀏覽器時才載入
+
+範例：
+    @register
+    class MySitePlugin(SitePlugin):
+        name = "mysite"
+        hosts = ("mysite.com",)
+        consent_texts = ("同意",)
+        play_selectors = (".big-play",)
+"""
+
+import re
+import time
+
+import fast_resolver
+from m3u8_watch import is_main_stream
+
+# ====== 配置設定 ======
+PLAY_WAIT_SECONDS = 10  # 等待播放按鈕可點擊的時間 (秒)
+TIERS = ("http", "browser")  # 由便宜到昂貴的解析層級
+
+PLUGINS = {}  # name -> SitePlugin
+
+
+def click_if_exists(driver, text, timeout=3):
+    """嘗試點擊包含 text 的元素，若不存在則忽略"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException
+
+    try:
+        xpath = f"//*[contains(text(), '{text}')]"
+        btn = WebDriverWait(driver, timeout).until(EC.element_to_be_clickable((By.XPATH, xpath)))
+        btn.click()
+        print(f"    🖱️ 點擊：{text}")
+        time.sleep(1)
+        return True
+    except TimeoutException:
+        return False
+    except Exception as e:
+        print(f"    ⚠️ 點擊 {text} 異常: {e}")
+        return False
+
+
+class SitePlugin:
+    """網站外掛基底：預設為「任何 .m3u8 都收、頁面內找不到才開瀏覽器」的通用行為"""
+
+    name = "generic"
+    hosts = ()  # 頁面主機 (含子網域)
+    url_patterns = ()  # 額外的網址正規式，任一符合即視為本網站
+    consent_texts = ()  # 同意條款等彈窗的按鈕文字，每個瀏覽器只處理一次
+    play_selectors = ("button.vjs-big-play-button", "button[class*='play']")  # 播放按鈕 (CSS)
+    cheapest_tier = "http"  # tiered 策略的起點；"browser" 表示純 HTTP 解析不可能成功，直接開瀏覽器
+
+    def matches(self, url):
+        host = re.sub(r"^[a-z]+://", "", url.lower()).split("/", 1)[0].split(":", 1)[0]
+        if any(host == h or host.endswith("." + h) for h in self.hosts):
+            return True
+        return any(re.search(p, url) for p in self.url_patterns)
+
+    def manifest_filter(self, url):
+        """是否為要收集的主要串流 (廣告等其他 .m3u8 回傳 False)"""
+        return True
+
+    def resolve_http(self, url):
+        """第一層：不開瀏覽器解析，回傳 .m3u8 列表 (可能為空)"""
+        text = fast_resolver.fetch_text(url)
+        if not text:
+            return []
+        return [u for u in fast_resolver.extract_m3u8(text) if self.manifest_filter(u)]
+
+    def consent(self, driver):
+        for i, text in enumerate(self.consent_texts):
+            click_if_exists(driver, text, timeout=5 if i == 0 else 3)
+
+    def play(self, driver):
+        """點擊播放按鈕；找不到時視為自動播放"""
+        if not self.play_selectors:
+            return False
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import TimeoutException
+
+        try:
+            btn = WebDriverWait(driver, PLAY_WAIT_SECONDS).until(EC.any_of(
+                *(EC.element_to_be_clickable((By.CSS_SELECTOR, s)) for s in self.play_selectors)))
+            btn.click()
+            print(f"    ▶️ 觸發播放按鈕")
+            return True
+        except TimeoutException:
+            print(f"    ℹ️ 無需點擊播放或自動播放中")
+            return False
+
+    def __repr__(self):
+        return f"<SitePlugin {self.name}>"
+
+
+def register(cls):
+    """類別裝飾器：登記外掛 (同名後登記者取代先登記者)"""
+    if cls.cheapest_tier not in TIERS:
+        raise ValueError(f"[{cls.name}] 不支援的解析層級: {cls.cheapest_tier}")
+    PLUGINS[cls.name] = cls()
+    return cls
+
+
+GENERIC = SitePlugin()
+
+
+def plugin_for(site=None, url=None):
+    """依頻道的 site 名稱取得外掛；名稱未登記時依網址比對，都不符合回傳通用外掛"""
+    if site in PLUGINS:
+        return PLUGINS[site]
+    if url:
+        for plugin in PLUGINS.values():
+            if plugin.matches(url):
+                return plugin
+    return GENERIC
+
+
+# ====== 內建外掛 ======
+@register
+class OfiiiPlugin(SitePlugin):
+    """ofiii (LiTV) 的 litv-longturnXX 頻道：頁面內嵌 JSON 通常即含 master m3u8"""
+
+    name = "ofiii"
+    hosts = ("ofiii.com",)
+    url_patterns = (fast_resolver.CHANNEL_ID_RE.pattern,)
+    consent_texts = ("我同意", "確定")
+    play_selectors = ("button.vjs-big-play-button", ".play-icon", "button[class*='play']")
+    cheapest_tier = "http"
+
+    def manifest_filter(self, url):
+        return is_main_stream(url)
+
+    def resolve_http(self, url):
+        return [u for u in fast_resolver.resolve(url) if self.manifest_filter(u)]
+
+
+@register
+class ExamplePlugin(SitePlugin):
+    """update_all.py 範本的外掛版：頁面原始碼以正規式找 CDN 上的 m3u8，不需要瀏覽器"""
+
+    name = "example"
+    hosts = ("example.com",)
+    consent_texts = ()
+    play_selectors = ()
+    cheapest_tier = "http"
+    M3U8_RE = re.compile(r"https://cdn\.example\.com/.+?\.m3u8")
+
+    def manifest_filter(self, url):
+        return bool(self.M3U8_RE.match(url))
+
+    def resolve_http(self, url):
+        text = fast_resolver.fetch_text(url)
+        return self.M3U8_RE.findall(text) if text else []
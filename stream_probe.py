@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+stream_probe.py
+--------------------------------------------
+並行檢測 TWTV.m3u 內所有線路是否仍可播放：
+讀取 playlist 與第一個片段的前幾 KB，記錄首位元組時間 (TTFB)、HTTP 狀態與實測速度，
+失效線路降級 (或移除)，其餘線路維持原順序；TTFB 以跨輪次的平滑值比較，
+只有比前一條線路快上 LATENCY_REORDER_MS 以上才往前調整 (偶發的延遲抖動不會造成每輪重排與無謂的提交)，
+已依畫質排序的自動更新群組只降級失效線路。順序改變時 [主線路] / [備用線路N] 標記依新位置重新編號。
+
+用法：python stream_probe.py [TWTV.m3u]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from atomic_io import atomic_open, atomic_write_text
+from m3u_model import M3UEntry, M3UPlaylist
+
+# ====== 配置設定 ======
+PROBE_CONCURRENCY = 32  # 同時檢測的線路數
+PROBE_TIMEOUT = 8  # 單一請求逾時 (秒)
+PLAYLIST_MAX_BYTES = 256 * 1024
+SEGMENT_SAMPLE_BYTES = 8 * 1024  # 片段只讀前幾 KB 確認可播放 (全部線路每輪合計約數 MB)
+DEAD_POLICY = "demote"  # "demote"：失效線路移到該頻道最後；"drop"：直接移除
+LATENCY_REORDER_MS = 1000  # 平滑後的 TTFB 比前一條線路快超過此值才往前調整
+TTFB_EWMA_ALPHA = 0.3  # 跨輪次 TTFB 平滑係數 (單次突波不足以改變順序)
+REPORT_PATH = os.path.join("logs", "probe_report.json")
+LATENCY_STATE_PATH = os.path.join("cache", "probe_latency.json")
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=PROBE_CONCURRENCY, pool_maxsize=PROBE_CONCURRENCY, max_retries=0)
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+_session.headers.update({"User-Agent": USER_AGENT})
+
+
+def _read(url, limit, playlist=False):
+    """串流讀取 url，回傳 (status, ttfb 秒, 內容, 讀取耗時 秒, 最終網址)
+
+    playlist=True：第一段內容不是 #EXTM3U (直接的 TS / FLV 串流) 時只讀到 SEGMENT_SAMPLE_BYTES
+    """
+    t0 = time.perf_counter()
+    with _session.get(url, timeout=PROBE_TIMEOUT, stream=True) as r:
+        chunks = []
+        size = 0
+        ttfb = None
+        for chunk in r.iter_content(chunk_size=16 * 1024):
+            if ttfb is None:
+                ttfb = time.perf_counter() - t0
+            chunks.append(chunk)
+            size += len(chunk)
+            if playlist and len(chunks) == 1 and b"#EXTM3U" not in chunk[:1024]:
+                limit = SEGMENT_SAMPLE_BYTES
+            if size >= limit:
+                break
+        elapsed = time.perf_counter() - t0
+        if ttfb is None:
+            ttfb = elapsed
+        return r.status_code, ttfb, b"".join(chunks), elapsed, r.url
+
+
+def _first_uri(base_url, text):
+    """playlist 內第一個非註解行 (master 的畫質或 media 的片段)"""
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            return urljoin(base_url, line)
+    return None
+
+
+def probe(url):
+    """檢測單一線路，回傳結果 dict (alive / status / ttfb_ms / throughput_kbps)"""
+    result = {"url": url, "alive": False, "status": None, "ttfb_ms": None, "throughput_kbps": None}
+    try:
+        status, ttfb, body, elapsed, final_url = _read(url, PLAYLIST_MAX_BYTES, playlist=True)
+        result["status"] = status
+        result["ttfb_ms"] = round(ttfb * 1000, 1)
+        if status != 200:
+            return result
+
+        text = body.decode("utf-8", errors="ignore")
+        if "#EXTM3U" not in text[:1024]:
+            # 非 HLS (例如直接的 TS / FLV 串流)：以本次讀取的內容測速
+            sample = body
+            result["alive"] = bool(sample)
+            result["throughput_kbps"] = round(len(sample) * 8 / 1000 / max(elapsed, 1e-6), 1)
+            return result
+
+        # master playlist：往下一層取第一個畫質
+        target = _first_uri(final_url, text)
+        if target and "#EXT-X-STREAM-INF" in text:
+            status, _, body, _, final_url = _read(target, PLAYLIST_MAX_BYTES)
+            if status != 200:
+                return result
+            target = _first_uri(final_url, body.decode("utf-8", errors="ignore"))
+        if not target:
+            return result
+
+        status, _, sample, elapsed, _ = _read(target, SEGMENT_SAMPLE_BYTES)
+        result["alive"] = status == 200 and bool(sample)
+        result["throughput_kbps"] = round(len(sample) * 8 / 1000 / max(elapsed, 1e-6), 1)
+    except requests.RequestException as e:
+        result["error"] = type(e).__name__
+    return result
+
+
+def probe_all(urls):
+    """以有限並行數檢測所有網址 (重複網址只測一次)，回傳 {url: result}"""
+    urls = list(dict.fromkeys(urls))
+    with ThreadPoolExecutor(max_workers=PROBE_CONCURRENCY, thread_name_prefix="probe") as pool:
+        return dict(zip(urls, pool.map(probe, urls)))
+
+
+TAG_RE = re.compile(r" \[(?:主線路|備用線路\d+)\]$")
+
+
+def _is_dead(result):
+    """未檢測的線路 (result 為 None) 不算失效"""
+    return result is not None and not result["alive"]
+
+
+def _latency(result):
+    """平滑後的 TTFB (毫秒)；未檢測或沒有數據回傳 None"""
+    if not result:
+        return None
+    return result.get("ttfb_avg_ms", result["ttfb_ms"])
+
+
+def _by_latency(run, results):
+    """插入排序：只有比前一條線路快超過 LATENCY_REORDER_MS 才往前移，其餘維持原順序"""
+    ordered = []
+    for item in run:
+        mine = _latency(results.get(item[0].url))
+        pos = len(ordered)
+        while pos > 0 and mine is not None:
+            ahead = _latency(results.get(ordered[pos - 1][0].url))
+            if ahead is None or ahead - mine <= LATENCY_REORDER_MS:
+                break
+            pos -= 1
+        ordered.insert(pos, item)
+    return ordered
+
+
+def smooth_latency(results, path=LATENCY_STATE_PATH):
+    """以跨輪次的 EWMA 平滑 TTFB，寫入各結果的 ttfb_avg_ms (只保留本輪有檢測的網址)"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            history = json.load(f)
+    except (OSError, ValueError):
+        history = {}
+    smoothed = {}
+    for url, result in results.items():
+        if not result["alive"] or result["ttfb_ms"] is None:
+            continue
+        prev = history.get(url)
+        avg = result["ttfb_ms"] if prev is None else TTFB_EWMA_ALPHA * result["ttfb_ms"] + (1 - TTFB_EWMA_ALPHA) * prev
+        smoothed[url] = result["ttfb_avg_ms"] = round(avg, 1)
+    atomic_write_text(path, json.dumps(smoothed, ensure_ascii=False))
+    return results
+
+
+def _retag(entry, index):
+    """依新位置改寫 [主線路] / [備用線路N] 標記 (建立新 M3UEntry，不修改共用的原物件)"""
+    if not TAG_RE.search(entry.title):
+        return entry
+    tag = "主線路" if index == 0 else f"備用線路{index}"
+    title = TAG_RE.sub(f" [{tag}]", entry.title)
+    if title == entry.title:
+        return entry
+    return M3UEntry(title, entry.url, entry.attrs, entry.duration, entry.options)
+
+
+def optimize_playlist(playlist, results=None, keep_order_groups=()):
+    """依檢測結果調整 M3UPlaylist：失效線路降級 / 移除，同頻道連續線路只在延遲差距超過一級時往前調整
+
+    keep_order_groups: 已依畫質排序的群組 (例如自動更新群組)，只降級失效線路，其餘維持原順序
+    """
+    if results is None:
+        results = probe_all(e.url for e in playlist.entries())
+    keep_order_groups = set(keep_order_groups)
+
+    out = []
+    run = []  # [(entry, 其後的空行)]
+
+    def flush():
+        alive = [r for r in run if not _is_dead(results.get(r[0].url))]
+        if run and run[0][0].group not in keep_order_groups:
+            alive = _by_latency(alive, results)
+        ordered = alive + [r for r in run if _is_dead(results.get(r[0].url))]
+        if DEAD_POLICY == "drop":
+            ordered = [r for r in ordered if not _is_dead(results.get(r[0].url))]
+        changed = [r[0] for r in ordered] != [r[0] for r in run]
+        for i, (entry, tail) in enumerate(ordered):
+            out.append(_retag(entry, i) if changed else entry)
+            out.extend(tail)
+        run.clear()
+
+    for item in playlist.items:
+        if isinstance(item, M3UEntry):
+            if run and item.name != run[0][0].name:
+                flush()
+            run.append((item, []))
+        elif run and not item.strip():
+            # 頻道之間的空行不中斷同一頻道的連續線路
+            run[-1][1].append(item)
+        else:
+            flush()
+            out.append(item)
+    flush()
+    playlist.replace_items(out)
+    return playlist
+
+
+def save_report(results, path=REPORT_PATH):
+    alive = sum(1 for r in results.values() if r["alive"])
+    with atomic_open(path) as f:
+        json.dump({
+            "time": f"{datetime.now():%Y-%m-%d %H:%M:%S}",
+            "total": len(results),
+            "alive": alive,
+            "results": list(results.values()),
+        }, f, ensure_ascii=False, indent=2)
+    return alive
+
+
+def probe_playlist(playlist, skip_prefixes=()):
+    """檢測 M3UPlaylist 內所有線路並寫出報告，回傳 {url: result}
+
+    skip_prefixes: 不檢測的網址前綴 (例如隨選模式的本機 /ch/ 網址，檢測會觸發抓取)；
+                   未檢測的線路 optimize_playlist 不會移除
+    """
+    print(f"\n🩺 開始檢測線路 (並行 {PROBE_CONCURRENCY})...")
+    t0 = time.perf_counter()
+    skip_prefixes = tuple(skip_prefixes)
+    results = smooth_latency(probe_all(e.url for e in playlist.entries() if not e.url.startswith(skip_prefixes)))
+    alive = save_report(results)
+    print(f"    ✅ 檢測完成：{alive}/{len(results)} 可用，耗時 {time.perf_counter() - t0:.1f} 秒")
+    return results
+
+
+def probe_and_optimize(playlist):
+    """檢測並就地調整 M3UPlaylist"""
+    return optimize_playlist(playlist, probe_playlist(playlist))
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "TWTV.m3u"
+    playlist = probe_and_optimize(M3UPlaylist.from_file(path))
+    playlist.write(path)
+    print(f"💾 已更新 {path}")
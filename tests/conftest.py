@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+共用 fixture：benchmark.py 的本機假站，以及含 bare 遠端的暫存 Git 倉庫 (全部不連外網)
+"""
+
+import os
+import sys
+import subprocess
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_cwd(tmp_path, monkeypatch):
+    """相對路徑的輸出 (logs/、cache/) 寫入暫存目錄，不弄髒專案"""
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture(scope="session")
+def fixture_site():
+    """回傳假站的 base url (http://127.0.0.1:<port>)"""
+    server, base_url = benchmark.start_fixture_server()
+    yield base_url
+    server.shutdown()
+
+
+def git(cwd, *args):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    """回傳 (工作目錄, bare 遠端目錄)；工作目錄的 origin 指向 bare 遠端，分支為 main"""
+    remote = tmp_path / "remote.git"
+    work = tmp_path / "work"
+    git(tmp_path, "init", "--bare", "-b", "main", str(remote))
+    git(tmp_path, "init", "-b", "main", str(work))
+    git(work, "config", "user.name", "tester")
+    git(work, "config", "user.email", "tester@example.com")
+    git(work, "config", "commit.gpgsign", "false")
+    git(work, "remote", "add", "origin", str(remote))
+    return work, remote
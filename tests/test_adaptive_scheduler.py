@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""adaptive_scheduler.AdaptiveScheduler：失敗退避、失效網址處理與壽命估計"""
+
+import threading
+
+import pytest
+
+import adaptive_scheduler as sched
+from channel_registry import Channel
+
+NOW = 1_700_000_000
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    return sched.AdaptiveScheduler(path=str(tmp_path / "schedule_state.json"))
+
+
+def test_failures_back_off_exponentially_up_to_the_cap(scheduler):
+    delays = [scheduler.record_failure("g", "c", now=NOW) for _ in range(8)]
+    assert delays[:3] == [sched.RETRY_BASE, sched.RETRY_BASE * 2, sched.RETRY_BASE * 4]
+    assert delays[-1] == sched.RETRY_MAX
+    assert scheduler.in_backoff("g", "c", now=NOW + 1)
+    assert not scheduler.in_backoff("g", "c", now=NOW + sched.RETRY_MAX + 1)
+
+
+def test_success_resets_backoff(scheduler):
+    scheduler.record_failure("g", "c", now=NOW)
+    interval = scheduler.record_success("g", "c", "https://a/1.m3u8", now=NOW)
+    assert interval == sched.DEFAULT_INTERVAL
+    assert not scheduler.in_backoff("g", "c", now=NOW + 1)
+
+
+def test_expiry_drives_interval(scheduler):
+    expires_at = NOW + 3 * 3600
+    interval = scheduler.record_success("g", "c", "https://a/1.m3u8", expires_at=expires_at, now=NOW)
+    assert interval == expires_at - sched.EXPIRY_MARGIN - NOW
+
+
+def test_dead_url_is_due_now_and_sampled_as_lifetime(scheduler):
+    scheduler.record_success("g", "c", "https://a/1.m3u8", now=NOW)
+    scheduler.mark_dead("g", "c", "https://a/1.m3u8", now=NOW + 3600)
+    entry = scheduler.state["g/c"]
+    assert entry["lifetime"] == 3600
+    assert entry["next_run"] == NOW + 3600
+    assert entry["dead_url"] == "https://a/1.m3u8"
+
+
+def test_recapturing_the_same_dead_url_backs_off(scheduler):
+    scheduler.record_success("g", "c", "https://a/1.m3u8", now=NOW)
+    scheduler.mark_dead("g", "c", "https://a/1.m3u8", now=NOW + 60)
+    assert scheduler.record_success("g", "c", "https://a/1.m3u8", now=NOW + 120) == sched.RETRY_BASE
+
+    # 下一輪檢測仍判定失效：維持退避，不再立即排入
+    scheduler.mark_dead("g", "c", "https://a/1.m3u8", now=NOW + 180)
+    assert scheduler.state["g/c"]["next_run"] == NOW + 120 + sched.RETRY_BASE
+
+    # 換到新網址才算成功
+    scheduler.record_success("g", "c", "https://a/2.m3u8", now=NOW + 600)
+    assert scheduler.state["g/c"]["failures"] == 0 and scheduler.state["g/c"]["dead_url"] is None
+
+
+def test_alive_probe_only_raises_lifetime(scheduler):
+    scheduler.record_success("g", "c", "https://a/1.m3u8", now=NOW)
+    scheduler.mark_dead("g", "c", "https://a/1.m3u8", now=NOW + 3600)
+    scheduler.record_success("g", "c", "https://a/2.m3u8", now=NOW + 3600)
+    scheduler.mark_alive("g", "c", "https://a/2.m3u8", now=NOW + 3600 + 600)
+    assert scheduler.state["g/c"]["lifetime"] == 3600  # 存活 10 分鐘不會拉低估計
+    scheduler.mark_alive("g", "c", "https://a/2.m3u8", now=NOW + 3600 + 7200)
+    assert scheduler.state["g/c"]["lifetime"] == 7200
+
+
+def test_state_round_trips_through_save_and_load(scheduler):
+    scheduler.record_success("g", "c", "https://a/1.m3u8", now=NOW)
+    scheduler.save()
+    reloaded = sched.AdaptiveScheduler(path=scheduler.path)
+    assert reloaded.state == scheduler.state
+    assert reloaded.due([Channel("g", "c", "https://example.com")], now=NOW) == []
+
+
+def test_concurrent_updates_and_saves(scheduler):
+    channels = [Channel("g", f"c{i}", "https://example.com") for i in range(50)]
+
+    def worker(i):
+        for n in range(20):
+            scheduler.record_success("g", f"c{i}", f"https://a/{i}-{n % 3}.m3u8", now=NOW + n)
+            scheduler.due(channels, now=NOW)
+        scheduler.save()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(channels))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(scheduler.state) == len(channels)
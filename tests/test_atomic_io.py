@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""atomic_io：原子寫入 (例外時保留舊檔、不留暫存檔) 與快照備份 (硬連結、去重、保留數量)"""
+
+import os
+
+import pytest
+
+from atomic_io import SnapshotBackups, atomic_open, atomic_write_text
+
+
+def test_atomic_write_replaces_content(tmp_path):
+    path = tmp_path / "out" / "TWTV.m3u"
+    atomic_write_text(str(path), "#EXTM3U\nold\n")
+    atomic_write_text(str(path), "#EXTM3U\nnew\n")
+    assert path.read_text(encoding="utf-8") == "#EXTM3U\nnew\n"
+    assert os.listdir(path.parent) == ["TWTV.m3u"]
+
+
+def test_exception_keeps_old_file_and_removes_temp(tmp_path):
+    path = tmp_path / "TWTV.m3u"
+    atomic_write_text(str(path), "#EXTM3U\nold\n")
+    with pytest.raises(RuntimeError):
+        with atomic_open(str(path)) as f:
+            f.write("#EXTM3U\nhalf")
+            raise RuntimeError("寫到一半當機")
+    assert path.read_text(encoding="utf-8") == "#EXTM3U\nold\n"
+    assert os.listdir(tmp_path) == ["TWTV.m3u"]
+
+
+def _write(path, text, mtime):
+    atomic_write_text(str(path), text)
+    os.utime(path, (mtime, mtime))
+
+
+def test_snapshot_hardlinks_and_dedupes(tmp_path):
+    path = tmp_path / "TWTV.m3u"
+    backups = SnapshotBackups(str(tmp_path / "backups"), retention=5)
+    assert backups.snapshot(str(path)) is None  # 檔案不存在
+
+    _write(path, "#EXTM3U\nv1\n", 1_700_000_000)
+    first = backups.snapshot(str(path))
+    if hasattr(os, "link"):
+        assert os.path.samefile(first, path)  # 硬連結，不複製內容
+    assert backups.snapshot(str(path)) == first  # 同一個 inode：不再建立
+
+    _write(path, "#EXTM3U\nv1\n", 1_700_000_100)  # 內容相同的新檔
+    assert backups.snapshot(str(path)) == first
+    assert len(backups.snapshots(str(path))) == 1
+
+    _write(path, "#EXTM3U\nv2\n", 1_700_000_200)  # 新內容不影響既有快照
+    second = backups.snapshot(str(path))
+    assert second != first
+    with open(first, encoding="utf-8") as f:
+        assert f.read() == "#EXTM3U\nv1\n"
+
+
+def test_snapshot_retention_keeps_newest(tmp_path):
+    path = tmp_path / "TWTV.m3u"
+    backups = SnapshotBackups(str(tmp_path / "backups"), retention=3)
+    made = []
+    for i in range(6):
+        _write(path, f"#EXTM3U\nv{i}\n", 1_700_000_000 + i * 100)
+        made.append(backups.snapshot(str(path)))
+    assert backups.snapshots(str(path)) == made[-3:]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""cdp_capture.CDPCaptureEngine：以假站頁面 (需點擊同意與播放) 抓取 master m3u8；沒有 Chrome 時略過"""
+
+import pytest
+
+pytest.importorskip("websockets")
+
+import cdp_capture  # noqa: E402
+from m3u8_watch import is_main_stream  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def engine():
+    try:
+        cdp_capture.find_chrome()
+    except FileNotFoundError:
+        pytest.skip("找不到 Chrome")
+    engine = cdp_capture.CDPCaptureEngine()
+    yield engine
+    engine.close()
+
+
+def test_captures_master_playlist_after_clicks(engine, fixture_site):
+    channel = "litv-longturn01"
+    candidates = engine.capture(f"{fixture_site}/channel/watch/{channel}", match=is_main_stream, timeout=20)
+
+    master = f"{fixture_site}/hls/{channel}/master.m3u8"
+    assert candidates[0] == master
+    assert f"{fixture_site}/hls/{channel}/avc1_1080p.m3u8" in candidates  # 由 master 內容展開的各畫質
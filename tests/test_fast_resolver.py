@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""fast_resolver.resolve_tiered：第一層找不到、或找到的 m3u8 讀不到時改走瀏覽器 (第二層)"""
+
+import fast_resolver
+
+DEAD_M3U8 = "http://127.0.0.1:9/expired/master.m3u8"  # discard 埠，連線立即被拒
+
+
+class FakeBrowser:
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.result
+
+
+def test_page_without_m3u8_falls_back_to_browser(fixture_site):
+    # 假站觀看頁的 .m3u8 由 JS 於點擊播放後組出，純 HTTP 解析找不到
+    page = f"{fixture_site}/channel/watch/litv-longturn01"
+    browser = FakeBrowser(["https://browser.example.com/master.m3u8"])
+    stats = fast_resolver.TierStats(path=None)
+
+    tier, candidates = fast_resolver.resolve_tiered("龍華電影", page, browser, stats)
+    assert (tier, candidates, browser.calls) == ("selenium", browser.result, 1)
+    assert stats.snapshot()["龍華電影"]["last_tier"] == "selenium"
+
+
+def test_unreachable_candidates_fall_back_to_browser():
+    browser = FakeBrowser(["https://browser.example.com/master.m3u8"])
+    tier, candidates = fast_resolver.resolve_tiered("龍華電影", "page", browser,
+                                                    http_resolve=lambda url: [DEAD_M3U8])
+    assert (tier, candidates, browser.calls) == ("selenium", browser.result, 1)
+
+
+def test_verified_candidates_skip_browser_and_rank_by_quality(fixture_site):
+    master = f"{fixture_site}/hls/litv-longturn99/master.m3u8"
+    browser = FakeBrowser([])
+    tier, candidates = fast_resolver.resolve_tiered("龍華電影", "page", browser,
+                                                    http_resolve=lambda url: [DEAD_M3U8, master])
+    assert tier == "http" and browser.calls == 0
+    assert candidates[0].endswith("avc1_1080p.m3u8")
+    assert master in candidates
+
+
+def test_http_miss_is_recorded_before_fallback():
+    stats = fast_resolver.TierStats(path=None)
+    fast_resolver.resolve_tiered("龍華電影", "page", FakeBrowser(["https://browser.example.com/master.m3u8"]),
+                                 stats, http_resolve=lambda url: [DEAD_M3U8])
+    s = stats.snapshot()["龍華電影"]
+    assert (s["http"], s["http_failed"], s["selenium"], s["selenium_failed"]) == (0, 1, 1, 0)
+    assert s["http_ms"] > 0
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""job_queue：租約到期重新排入、重試上限，以及協調者佇列端點 (RemoteQueue)"""
+
+import pytest
+
+import job_queue
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(job_queue.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return job_queue.JobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=60)
+
+
+def test_expired_lease_is_requeued_for_another_worker(queue, clock):
+    queue.enqueue("run1", "g/c", {"name": "c"})
+    assert queue.claim("w1") == ("g/c", {"name": "c"})
+    assert queue.claim("w2") is None  # 租約有效期間不會重複派送
+
+    clock.now += 61
+    assert queue.requeue_expired() == 1
+    assert queue.claim("w2") == ("g/c", {"name": "c"})
+
+    # 原工作者的租約已被接手：續約與回報都被忽略
+    assert not queue.renew("g/c", "w1")
+    assert not queue.complete("g/c", "w1", ["https://old/1.m3u8"])
+    assert queue.complete("g/c", "w2", ["https://new/1.m3u8"])
+    assert queue.results("run1") == ({"g/c": ["https://new/1.m3u8"]}, 0)
+
+
+def test_renew_keeps_the_lease(queue, clock):
+    queue.enqueue("run1", "g/c", {})
+    queue.claim("w1")
+    clock.now += 50
+    assert queue.renew("g/c", "w1")
+    clock.now += 50
+    assert queue.requeue_expired() == 0
+    assert queue.claim("w2") is None
+
+
+def test_job_fails_after_max_attempts(queue, clock):
+    queue.enqueue("run1", "g/c", {})
+    for _ in range(job_queue.MAX_ATTEMPTS):
+        assert queue.claim("w") is not None
+        clock.now += 61
+    assert queue.requeue_expired() == 0
+    assert queue.claim("w") is None
+    assert queue.results("run1") == ({"g/c": None}, 0)
+
+
+def test_enqueue_keeps_an_active_lease(queue, clock):
+    queue.enqueue("run1", "g/c", {})
+    queue.claim("w1")
+    queue.enqueue("run2", "g/c", {})  # 下一輪又到期：不搶走執行中的工作
+    assert queue.claim("w2") is None
+    assert queue.complete("g/c", "w1", ["https://a/1.m3u8"])
+    assert queue.results("run2") == ({"g/c": ["https://a/1.m3u8"]}, 0)
+
+
+@pytest.fixture
+def endpoint(queue):
+    server = job_queue.start_queue_server(queue, host="127.0.0.1", port=0, token="secret")
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_remote_worker_claims_renews_and_completes(queue, endpoint):
+    queue.enqueue("run1", "g/c", {"name": "c"}, priority=10)
+    remote = job_queue.RemoteQueue(endpoint, token="secret", lease_seconds=1)
+
+    assert remote.claim("remote-1") == ("g/c", {"name": "c"})
+    assert remote.lease_seconds == queue.lease_seconds
+    assert remote.claim("remote-2") is None
+    assert remote.renew("g/c", "remote-1")
+    assert not remote.renew("g/c", "remote-2")
+    assert remote.complete("g/c", "remote-1", ["https://a/1.m3u8"])
+    assert queue.results("run1") == ({"g/c": ["https://a/1.m3u8"]}, 0)
+
+
+def test_remote_worker_needs_the_token(queue, endpoint):
+    queue.enqueue("run1", "g/c", {})
+    assert job_queue.RemoteQueue(endpoint, token="wrong").claim("remote") is None
+    assert queue.results("run1") == ({}, 1)
+
+
+def test_unreachable_coordinator_is_not_fatal(monkeypatch):
+    monkeypatch.setattr(job_queue.time, "sleep", lambda s: None)
+    remote = job_queue.RemoteQueue("http://127.0.0.1:9")
+    assert remote.claim("w") is None
+    assert remote.renew("g/c", "w")  # 連不上時視為仍持有租約，由協調者的租約到期處理
+    assert not remote.complete("g/c", "w", [])
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""m3u_model.M3UPlaylist.upsert_group 與 merge_into_twtv.collect_taiwan_streams"""
+
+import merge_into_twtv
+from m3u_model import M3UPlaylist
+
+BASE = """#EXTM3U
+#EXTINF:-1 group-title="新聞" tvg-name="新聞台",新聞台
+https://news.example.com/live.m3u8
+#EXTINF:-1 group-title="台灣頻道" tvg-name="舊頻道",舊頻道
+https://old.example.com/live.m3u8
+# 更新時間: 2024-01-01 00:00:00
+"""
+
+FRESH = """#EXTINF:-1 group-title="台灣頻道" tvg-name="龍華電影",龍華電影 [主線路]
+https://cdn.example.com/movie/avc1_1080p.m3u8
+#EXTINF:-1 group-title="台灣頻道" tvg-name="龍華電影",龍華電影 [備用線路1]
+https://cdn.example.com/movie/master.m3u8
+"""
+
+
+def merge(text):
+    playlist = M3UPlaylist.parse(text.splitlines())
+    playlist.upsert_group("台灣頻道", M3UPlaylist.parse(FRESH.splitlines()).entries(),
+                          banner="台灣頻道 (自動更新)", notes=["更新時間: 2024-01-01 00:15:00"])
+    return playlist.to_text()
+
+
+def test_upsert_group_is_idempotent():
+    once = merge(BASE)
+    twice = merge(once)
+    assert twice == once
+    assert merge(twice) == once
+
+
+def test_upsert_group_replaces_whole_group():
+    playlist = M3UPlaylist.parse(merge(BASE).splitlines())
+    urls = [e.url for e in playlist.entries()]
+    assert "https://old.example.com/live.m3u8" not in urls
+    assert "https://news.example.com/live.m3u8" in urls
+    assert [e.url for e in playlist.entries() if e.group == "台灣頻道"] == [
+        "https://cdn.example.com/movie/avc1_1080p.m3u8", "https://cdn.example.com/movie/master.m3u8"]
+    assert merge(BASE).count("# 更新時間: 2024-01-01 00:00:00") == 1  # 上游自己的註解保持原樣
+
+
+def test_upsert_keeps_other_groups_banner_and_notes():
+    playlist = M3UPlaylist.parse(BASE.splitlines())
+    for group, url in (("台灣頻道", "https://a.example.com/1.m3u8"), ("測試群組", "https://b.example.com/1.m3u8")):
+        entry = M3UPlaylist.parse([f'#EXTINF:-1 group-title="{group}" tvg-name="{group}台",{group}台', url])
+        playlist.upsert_group(group, entry.entries(), banner=f"{group} (自動更新)",
+                              notes=[f"更新時間: {group}"])
+    text = playlist.to_text()
+    for group in ("台灣頻道", "測試群組"):
+        assert text.count(f"# {group} (自動更新)") == 1
+        assert text.count(f"# 更新時間: {group}") == 1
+
+
+def test_upsert_dedupes_new_entries():
+    doubled = M3UPlaylist.parse((FRESH + FRESH).splitlines()).entries()
+    playlist = M3UPlaylist.parse(BASE.splitlines())
+    playlist.upsert_group("台灣頻道", doubled)
+    assert len(playlist.by_group("台灣頻道")) == 2
+
+
+def write_channel(path, url):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f'#EXTM3U\n#EXTINF:-1 group-title="台灣頻道" tvg-name="{path.stem}",{path.stem}\n{url}\n',
+                    encoding="utf-8")
+
+
+def test_collect_taiwan_streams_reads_only_group_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(merge_into_twtv, "SOURCE_DIR", str(tmp_path))
+    write_channel(tmp_path / "台灣頻道" / "龍華電影.m3u", "https://cdn.example.com/movie.m3u8")
+    write_channel(tmp_path / "台灣頻道" / "龍華電影-備份.m3u", "https://cdn.example.com/movie.m3u8")
+    write_channel(tmp_path / "龍華電影.m3u", "https://cdn.example.com/movie.m3u8")  # auto_commit.py 的單頻道檔
+    write_channel(tmp_path / "all.m3u", "https://cdn.example.com/movie.m3u8")
+    write_channel(tmp_path / "其他群組" / "新聞台.m3u", "https://cdn.example.com/news.m3u8")
+    assert [e.url for e in merge_into_twtv.collect_taiwan_streams()] == ["https://cdn.example.com/movie.m3u8"]
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""playlist_server：索引路由、ETag / 304、gzip 與合併後整份替換"""
+
+import gzip
+import http.client
+from urllib.parse import quote
+
+import pytest
+
+import playlist_server
+from m3u_model import M3UPlaylist
+
+TEXT = """#EXTM3U
+#EXTINF:-1 tvg-name="民視" group-title="台灣頻道",民視
+https://a/ftv/master.m3u8
+#EXTINF:-1 tvg-name="民視" group-title="台灣頻道",民視
+https://b/ftv/master.m3u8
+#EXTINF:-1 tvg-name="CCTV1" group-title="央視",CCTV1
+https://c/cctv1.m3u8
+"""
+
+
+@pytest.fixture
+def served():
+    store = playlist_server.PlaylistStore()
+    store.update(M3UPlaylist.parse(TEXT.splitlines()))
+    server = playlist_server.start_server(store, host="127.0.0.1", port=0)
+    yield store, server.server_port
+    server.shutdown()
+
+
+def get(port, path, headers=None, method="GET"):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.request(method, quote(path), headers=headers or {})
+    r = conn.getresponse()
+    body = r.read()
+    conn.close()
+    return r, body
+
+
+def test_routes(served):
+    _, port = served
+    r, body = get(port, "/playlist.m3u")
+    assert r.status == 200 and body.decode("utf-8").count("#EXTINF") == 3
+    r, body = get(port, "/group/台灣頻道.m3u")
+    assert body.decode("utf-8").count("#EXTINF") == 2
+    r, body = get(port, "/channel/CCTV1.m3u")
+    assert "https://c/cctv1.m3u8" in body.decode("utf-8")
+    assert get(port, "/group/不存在.m3u")[0].status == 404
+
+
+def test_etag_returns_304(served):
+    _, port = served
+    r, _ = get(port, "/playlist.m3u")
+    etag = r.getheader("ETag")
+    r, body = get(port, "/playlist.m3u", {"If-None-Match": etag})
+    assert r.status == 304 and body == b""
+    assert get(port, "/playlist.m3u", {"If-None-Match": '"other"'})[0].status == 200
+
+
+def test_gzip_when_accepted(served):
+    _, port = served
+    plain_r, plain = get(port, "/playlist.m3u")
+    r, body = get(port, "/playlist.m3u", {"Accept-Encoding": "gzip"})
+    assert r.getheader("Content-Encoding") == "gzip"
+    assert r.getheader("Vary") == "Accept-Encoding"
+    assert gzip.decompress(body) == plain
+    assert r.getheader("ETag") == plain_r.getheader("ETag")
+    assert plain_r.getheader("Content-Encoding") is None
+
+
+def test_head_has_no_body(served):
+    _, port = served
+    r, body = get(port, "/playlist.m3u", method="HEAD")
+    assert r.status == 200 and body == b"" and int(r.getheader("Content-Length")) > 0
+
+
+def test_update_swaps_snapshot_and_etag(served):
+    store, port = served
+    old = get(port, "/playlist.m3u")[0].getheader("ETag")
+    store.update(M3UPlaylist.parse(TEXT.replace("https://c/cctv1.m3u8", "https://d/cctv1.m3u8").splitlines()))
+    r, body = get(port, "/playlist.m3u", {"If-None-Match": old})
+    assert r.status == 200 and b"https://d/cctv1.m3u8" in body
+
+
+def test_ch_redirects_to_best_line(served):
+    _, port = served
+    r, _ = get(port, "/ch/民視")
+    assert r.status == 302 and r.getheader("Location") == "https://a/ftv/master.m3u8"
+    assert get(port, "/ch/不存在")[0].status == 404
+
+
+def test_ch_on_demand_resolver(served):
+    store, port = served
+    calls = []
+
+    def resolver(name):
+        calls.append(name)
+        if name == "民視":
+            return "https://fresh/ftv/master.m3u8"
+        if name == "壞掉":
+            return None
+        raise LookupError(name)  # 不在頻道清單：沿用合併結果
+
+    store.resolver = resolver
+    assert get(port, "/ch/民視")[0].getheader("Location") == "https://fresh/ftv/master.m3u8"
+    assert get(port, "/ch/壞掉")[0].status == 502
+    assert get(port, "/ch/CCTV1")[0].getheader("Location") == "https://c/cctv1.m3u8"
+    assert calls == ["民視", "壞掉", "CCTV1"]
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""publisher.Publisher：只有時間戳不同不提交；debounce 視窗內的提交不推送"""
+
+from conftest import git
+from publisher import Publisher
+
+
+def write_playlist(path, url, stamp):
+    path.write_text(f"#EXTM3U\n#EXTINF:-1 group-title=\"台灣頻道\",測試台\n{url}\n# Updated: {stamp}\n",
+                    encoding="utf-8")
+
+
+def commit_count(repo):
+    return int(git(repo, "rev-list", "--count", "HEAD"))
+
+
+def test_timestamp_only_change_makes_no_commit(git_repo):
+    work, _ = git_repo
+    publisher = Publisher(str(work), branch="main")
+    playlist = work / "TWTV.m3u"
+
+    write_playlist(playlist, "https://cdn.example.com/a.m3u8", "2024-01-01 00:00:00")
+    assert publisher.publish(["TWTV.m3u"]) == ["TWTV.m3u"]
+    assert commit_count(work) == 1
+
+    write_playlist(playlist, "https://cdn.example.com/a.m3u8", "2024-01-01 00:15:00")
+    assert publisher.publish(["TWTV.m3u"]) == []
+    assert commit_count(work) == 1
+
+    write_playlist(playlist, "https://cdn.example.com/b.m3u8", "2024-01-01 00:30:00")
+    assert publisher.publish(["TWTV.m3u"]) == ["TWTV.m3u"]
+    assert commit_count(work) == 2
+
+
+def test_debounce_holds_push(git_repo):
+    work, remote = git_repo
+    publisher = Publisher(str(work), branch="main", debounce=3600)
+    playlist = work / "TWTV.m3u"
+
+    # 第一次發布：距離上次推送已超過視窗，立即推送
+    write_playlist(playlist, "https://cdn.example.com/a.m3u8", "2024-01-01 00:00:00")
+    publisher.publish(["TWTV.m3u"])
+    assert git(remote, "rev-parse", "main") == git(work, "rev-parse", "HEAD")
+
+    # 視窗內的第二次發布：只提交，遠端維持不變
+    first_push = git(remote, "rev-parse", "main")
+    write_playlist(playlist, "https://cdn.example.com/b.m3u8", "2024-01-01 00:15:00")
+    assert publisher.publish(["TWTV.m3u"]) == ["TWTV.m3u"]
+    assert commit_count(work) == 2
+    assert git(remote, "rev-parse", "main") == first_push
+    assert publisher._load_state()["unpushed"]
+
+    # 視窗結束後的發布：沒有新變更也會推送累積的提交
+    publisher.debounce = 0
+    assert publisher.publish(["TWTV.m3u"]) == []
+    assert git(remote, "rev-parse", "main") == git(work, "rev-parse", "HEAD")
+    assert not publisher._load_state()["unpushed"]
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""run_coordinator：跨程序鎖檔、執行中觸發的合併與同頻道抓取共用 (SingleFlight)"""
+
+import time
+import threading
+
+from run_coordinator import FileLock, RunCoordinator, SingleFlight
+
+
+def test_file_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / "update.lock")
+    first, second = FileLock(path), FileLock(path)
+    assert first.acquire()
+    assert not second.acquire()
+    assert "pid=" in second.holder()
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_triggers_during_a_run_coalesce_into_one_follow_up(tmp_path):
+    started, release = threading.Event(), threading.Event()
+    runs = []
+
+    def job():
+        runs.append(len(runs))
+        if len(runs) == 1:
+            started.set()
+            release.wait(5)
+
+    run = RunCoordinator(job, FileLock(str(tmp_path / "update.lock")))
+    first = threading.Thread(target=run.trigger, args=("啟動",))
+    first.start()
+    assert started.wait(5)
+    assert [run.trigger("排程") for _ in range(3)] == [False, False, False]  # 執行中：只標記，立即返回
+    release.set()
+    first.join(5)
+    assert runs == [0, 1]  # 三次觸發只合併成一輪後續執行
+
+    assert run.trigger("排程")
+    assert runs == [0, 1, 2]
+
+
+def test_skips_when_another_process_holds_the_lock(tmp_path):
+    path = str(tmp_path / "update.lock")
+    other = FileLock(path)
+    assert other.acquire()
+    runs = []
+    try:
+        assert not RunCoordinator(lambda: runs.append(1), FileLock(path)).trigger()
+    finally:
+        other.release()
+    assert runs == []
+
+
+def _concurrent(flight, key, fn, n):
+    """n 個執行緒同時呼叫 flight.do(key, fn)；回傳 (threads, results, entered)"""
+    results, entered = [None] * n, threading.Semaphore(0)
+
+    def call(i):
+        entered.release()
+        try:
+            results[i] = flight.do(key, fn)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for _ in range(n):
+        entered.acquire()
+    return threads, results
+
+
+def _finish(threads, gate):
+    time.sleep(0.1)  # 讓所有呼叫都進入 do() 等待第一個呼叫
+    gate.set()
+    for t in threads:
+        t.join(5)
+
+
+def test_single_flight_runs_once_and_shares_result():
+    flight, gate, calls = SingleFlight(), threading.Event(), []
+
+    def capture():
+        calls.append(1)
+        gate.wait(5)
+        return ["https://a/master.m3u8"]
+
+    threads, results = _concurrent(flight, "台灣頻道/民視", capture, 5)
+    _finish(threads, gate)
+    assert len(calls) == 1
+    assert results == [["https://a/master.m3u8"]] * 5
+
+    # 上一次結束後的呼叫重新執行，不沿用舊結果
+    assert flight.do("台灣頻道/民視", lambda: ["https://b/master.m3u8"]) == ["https://b/master.m3u8"]
+
+
+def test_single_flight_shares_errors():
+    flight, gate, calls = SingleFlight(), threading.Event(), []
+
+    def capture():
+        calls.append(1)
+        gate.wait(5)
+        raise RuntimeError("瀏覽器啟動失敗")
+
+    threads, results = _concurrent(flight, "台灣頻道/民視", capture, 3)
+    _finish(threads, gate)
+    assert len(calls) == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flight.do("台灣頻道/民視", lambda: "ok") == "ok"  # 失敗後不殘留進行中的狀態
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""stream_probe：以假站實測線路，失效線路降級 / 移除，可用線路維持原順序"""
+
+import pytest
+
+import stream_probe
+from m3u_model import M3UPlaylist
+
+
+def channel_playlist(base_url):
+    """同一頻道三條線路：主線路已失效 (404)，兩條備用線路可播放"""
+    lines = ["#EXTM3U"]
+    urls = [f"{base_url}/gone", f"{base_url}/hls/litv-longturn01/master.m3u8",
+            f"{base_url}/hls/litv-longturn01/avc1_720p.m3u8"]
+    for i, url in enumerate(urls):
+        tag = "主線路" if i == 0 else f"備用線路{i}"
+        lines += [f'#EXTINF:-1 group-title="台灣頻道" tvg-name="龍華電影",龍華電影 [{tag}]', url]
+    return M3UPlaylist.parse(lines), urls
+
+
+@pytest.fixture
+def probed(fixture_site):
+    playlist, urls = channel_playlist(fixture_site)
+    results = stream_probe.probe_playlist(playlist)
+    return playlist, urls, results
+
+
+def test_probe_detects_dead_and_alive(probed):
+    _, urls, results = probed
+    assert not results[urls[0]]["alive"]
+    assert results[urls[1]]["alive"] and results[urls[2]]["alive"]
+
+
+def test_demote_moves_dead_last_and_retags(probed, monkeypatch):
+    playlist, urls, results = probed
+    monkeypatch.setattr(stream_probe, "DEAD_POLICY", "demote")
+    stream_probe.optimize_playlist(playlist, results, keep_order_groups=["台灣頻道"])
+    entries = list(playlist.entries())
+    assert [e.url for e in entries] == [urls[1], urls[2], urls[0]]
+    assert [e.title for e in entries] == ["龍華電影 [主線路]", "龍華電影 [備用線路1]", "龍華電影 [備用線路2]"]
+
+
+def test_drop_removes_dead(probed, monkeypatch):
+    playlist, urls, results = probed
+    monkeypatch.setattr(stream_probe, "DEAD_POLICY", "drop")
+    stream_probe.optimize_playlist(playlist, results, keep_order_groups=["台灣頻道"])
+    assert [e.url for e in playlist.entries()] == [urls[1], urls[2]]
+
+
+def test_unprobed_entries_are_kept(probed, monkeypatch):
+    playlist, urls, results = probed
+    monkeypatch.setattr(stream_probe, "DEAD_POLICY", "drop")
+    stream_probe.optimize_playlist(playlist, {urls[2]: results[urls[2]]})
+    assert [e.url for e in playlist.entries()] == urls
+
+
+def latency_playlist(ttfbs):
+    lines = ["#EXTM3U"]
+    for i in range(len(ttfbs)):
+        lines += ['#EXTINF:-1 group-title="其他" tvg-name="測試台",測試台', f"https://cdn{i}.example.com/live.m3u8"]
+    playlist = M3UPlaylist.parse(lines)
+    results = {f"https://cdn{i}.example.com/live.m3u8": {"alive": True, "ttfb_ms": t, "ttfb_avg_ms": t}
+               for i, t in enumerate(ttfbs)}
+    return playlist, results
+
+
+def test_small_latency_gaps_keep_order():
+    playlist, results = latency_playlist([900, 300, 100])
+    before = [e.url for e in playlist.entries()]
+    stream_probe.optimize_playlist(playlist, results)
+    assert [e.url for e in playlist.entries()] == before
+
+
+def test_large_latency_gap_moves_entry_ahead():
+    playlist, results = latency_playlist([2500, 300, 1000])
+    stream_probe.optimize_playlist(playlist, results)
+    # cdn1、cdn2 都比 cdn0 快超過門檻而往前；cdn2 與 cdn1 的差距未超過門檻，維持兩者原順序
+    assert [e.url for e in playlist.entries()] == [
+        "https://cdn1.example.com/live.m3u8", "https://cdn2.example.com/live.m3u8", "https://cdn0.example.com/live.m3u8"]
+
+
+def test_single_spike_is_smoothed_across_runs():
+    url = "https://cdn.example.com/live.m3u8"
+    stream_probe.smooth_latency({url: {"alive": True, "ttfb_ms": 200.0}})
+    spike = stream_probe.smooth_latency({url: {"alive": True, "ttfb_ms": 3000.0}})
+    assert spike[url]["ttfb_avg_ms"] < 200 + stream_probe.LATENCY_REORDER_MS
+
+
+def test_non_hls_stream_is_probed_with_a_single_read(fixture_site):
+    result = stream_probe.probe(f"{fixture_site}/hls/litv-longturn01/seg1.ts")
+    assert result["alive"] and result["throughput_kbps"] > 0
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+upstream_fetcher.py
+--------------------------------------------
+遠端 TWTV.m3u 的條件式下載：
+保存 ETag / Last-Modified 與本地副本 (cache/)，以 If-None-Match / If-Modified-Since 請求；
+304 時直接使用本地副本，暫時性失敗時沿用最後一次成功的副本。
+內容未變時也沿用已解析的 M3UPlaylist，合併階段只需替換台灣頻道群組。
+"""
+
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from m3u_model import M3UPlaylist
+from atomic_io import atomic_write_text
+
+# ====== 配置設定 ======
+CACHE_DIR = "cache"
+HTTP_TIMEOUT = 15
+
+
+class UpstreamFetcher:
+    """單一遠端檔案的條件式下載器"""
+
+    def __init__(self, url, cache_dir=CACHE_DIR, name="TWTV.upstream"):
+        self.url = url
+        self.copy_path = os.path.join(cache_dir, f"{name}.m3u")
+        self.meta_path = os.path.join(cache_dir, f"{name}.json")
+        self.changed = False
+        self._lock = threading.Lock()
+        self._parsed = None
+        self._parsed_sha = None
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=2))
+        self._session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=2))
+
+    def _load_meta(self):
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _read_copy(self):
+        try:
+            with open(self.copy_path, "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _save(self, text, meta):
+        atomic_write_text(self.copy_path, text, newline="")
+        atomic_write_text(self.meta_path, json.dumps(meta, ensure_ascii=False, indent=2))
+
+    def fetch(self):
+        """回傳遠端內容 (或本地副本)；self.changed 表示內容是否與上次不同。皆不可用時回傳 None"""
+        with self._lock:
+            meta = self._load_meta()
+            local = self._read_copy()
+            headers = {}
+            if local is not None:
+                if meta.get("etag"):
+                    headers["If-None-Match"] = meta["etag"]
+                if meta.get("last_modified"):
+                    headers["If-Modified-Since"] = meta["last_modified"]
+
+            try:
+                r = self._session.get(self.url, headers=headers, timeout=HTTP_TIMEOUT)
+            except requests.RequestException as e:
+                print(f"    ⚠️ 下載遠端 TWTV 失敗，沿用本地副本: {e}")
+                self.changed = False
+                return local
+
+            if r.status_code == 304 and local is not None:
+                print("    💤 遠端 TWTV 未變更 (304)，使用本地副本")
+                self.changed = False
+                return local
+            if r.status_code != 200:
+                print(f"    ⚠️ 遠端 TWTV 回應 {r.status_code}，沿用本地副本")
+                self.changed = False
+                return local
+
+            text = r.text
+            sha = hashlib.sha1(text.encode("utf-8")).hexdigest()
+            self.changed = sha != meta.get("sha1")
+            self._save(text, {
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+                "sha1": sha,
+                "fetched_at": f"{datetime.now():%Y-%m-%d %H:%M:%S}",
+            })
+            print(f"    🌐 已下載遠端 TWTV ({len(r.content) // 1024} KB{'，內容有變更' if self.changed else ''})")
+            return text
+
+    def playlist(self):
+        """回傳遠端 TWTV 的 M3UPlaylist 副本；內容未變時不重新解析"""
+        text = self.fetch()
+        if text is None:
+            return None
+        sha = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            if self._parsed is None or sha != self._parsed_sha:
+                self._parsed = M3UPlaylist.parse(text.splitlines())
+                self._parsed_sha = sha
+            return self._parsed.copy()